@@ -0,0 +1,95 @@
+"""Concurrency benchmark for the memory repository: read throughput while reviews are written, copy-on-write versus
+one lock around every repository call.
+
+Reader threads loop over what a page view does (a genre page, the neighbor ids of its track, a user lookup) while a
+writer thread registers users and adds reviews as fast as it can. Both modes run on the same catalog.
+
+Usage: python -m benchmarks.bench_concurrency [--rows 20000] [--readers 1 4 8] [--seconds 3]
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import GENRE_TITLES, write_tracks_csv
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.csv_reader import populate
+from music.domainmodel.user import User
+from music.utilities.services import make_review
+
+
+class CoarseLockRepository:
+    """ The baseline: every call to the wrapped repository holds one lock, reads included. """
+
+    def __init__(self, repo: MemoryRepository):
+        self.__repo = repo
+        self.__lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self.__repo, name)
+
+        def locked(*args, **kwargs):
+            with self.__lock:
+                return method(*args, **kwargs)
+        return locked
+
+
+def run(repo, readers: int, seconds: float):
+    running = threading.Event()
+    running.set()
+    reads = [0] * readers
+    writes = [0]
+
+    def read(reader):
+        rng = random.Random(reader)
+        while running.is_set():
+            genre = rng.choice(GENRE_TITLES)
+            page = repo.get_tracks_page_by_genre(genre, rng.randrange(100), 1)
+            if page:
+                repo.get_neighbor_track_ids_by_genre(genre, page[0].track_id)
+            repo.get_user(f'user{rng.randrange(1000)}')
+            reads[reader] += 1
+
+    def write():
+        tracks = repo.get_tracks_page(0, 1000)
+        while running.is_set():
+            user = User(f'user{writes[0]}', 'password123')
+            repo.add_user(user)
+            repo.add_review(make_review(tracks[writes[0] % len(tracks)], user, 1 + writes[0] % 5))
+            writes[0] += 1
+
+    threads = [threading.Thread(target=read, args=(reader,)) for reader in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    running.clear()
+    for thread in threads:
+        thread.join()
+    return sum(reads) / seconds, writes[0] / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--readers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_tracks_csv(Path(tmp), args.rows)
+        print(f"{'mode':>14} {'readers':>8} {'reads/s':>10} {'writes/s':>10}")
+        for readers in args.readers:
+            for mode in ('coarse_lock', 'copy_on_write'):
+                repo = MemoryRepository(concurrency='copy_on_write' if mode == 'copy_on_write' else 'none')
+                populate(Path(tmp), repo)
+                if mode == 'coarse_lock':
+                    repo = CoarseLockRepository(repo)
+                reads_per_second, writes_per_second = run(repo, readers, args.seconds)
+                print(f"{mode:>14} {readers:>8} {reads_per_second:>10.0f} {writes_per_second:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Reader benchmark for the 39-column tracks dump: csv.DictReader versus the column-projected reader.
+
+For each reader it reports rows/s, the peak traced memory while streaming the file, and the peak traced
+memory of a full populate() into a MemoryRepository that uses it.
+
+By default the bundled excerpt is replicated, so rows carry the long free-text columns of the real dump;
+--synthetic uses the sparse rows of benchmarks.synthetic instead.
+
+Usage: python -m benchmarks.bench_csv_readers [--copies 100] [--synthetic ROWS]
+"""
+import argparse
+import csv
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.synthetic import write_tracks_csv, write_replicated_excerpt
+from music.adapters import csv_reader
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.csv_reader import populate, read_projected_rows, TRACK_COLUMNS
+
+
+def dict_reader_rows(track_csv):
+    # The reader used by read_tracks_file before projection: a dict of all 39 columns per row.
+    for track_row in csv.DictReader(track_csv):
+        yield tuple(track_row[column] for column in TRACK_COLUMNS)
+
+
+def projected_reader_rows(track_csv):
+    return read_projected_rows(track_csv, TRACK_COLUMNS)
+
+
+def stream(track_file, reader):
+    with open(track_file, encoding='unicode_escape') as track_csv:
+        for _ in reader(track_csv):
+            pass
+
+
+def ingest(data_path, reader):
+    # Swaps the reader inside read_tracks_file so populate() runs unchanged on top of it.
+    with mock.patch.object(csv_reader, 'read_projected_rows', lambda track_csv, columns: reader(track_csv)):
+        populate(data_path, MemoryRepository())
+
+
+def traced_peak(function, *args):
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--copies', type=int, default=100)
+    parser.add_argument('--synthetic', type=int, metavar='ROWS')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = Path(tmp)
+        if args.synthetic:
+            track_file = write_tracks_csv(data_path, args.synthetic)
+            rows = args.synthetic
+        else:
+            track_file = write_replicated_excerpt(data_path, args.copies)
+            rows = 2000 * args.copies
+        print(f"rows: {rows}")
+        print(f"{'reader':>10} {'rows/s':>10} {'stream peak MB':>15} {'ingest peak MB':>15}")
+        for name, reader in (('dict', dict_reader_rows), ('projected', projected_reader_rows)):
+            start = time.perf_counter()
+            stream(track_file, reader)
+            rows_per_second = rows / (time.perf_counter() - start)
+            stream_peak = traced_peak(stream, track_file, reader)
+            ingest_peak = traced_peak(ingest, data_path, reader)
+            print(f"{name:>10} {rows_per_second:>10.0f} {stream_peak / 1e6:>15.2f} {ingest_peak / 1e6:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Database load benchmark: requests/s and latency percentiles of track listing pages under concurrent load, per
+engine profile.
+
+Client threads request random pages of /all and /tracks_by_genre through the Flask app while a writer thread adds
+users and reviews through the repository. Each profile gets its own SQLite file holding the same synthetic catalog.
+The 'nullpool' profile is the default engine: a new connection per request and no pragmas; '+cache' puts the
+read-through CachingRepository in front of it.
+
+Usage: python -m benchmarks.bench_db_load [--rows 20000] [--clients 1 4 8] [--seconds 5] [--no-writer]
+"""
+import argparse
+import itertools
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import music.adapters.Repository as repo
+from benchmarks.synthetic import GENRE_TITLES, write_tracks_csv
+from music import create_app
+from music.domainmodel.user import User
+from music.utilities import services
+
+PROFILES = {
+    'nullpool': {},
+    'queue+wal': {
+        'DATABASE_POOL': 'queue', 'DATABASE_POOL_SIZE': 8, 'SQLITE_JOURNAL_MODE': 'wal', 'SQLITE_SYNCHRONOUS': 'normal',
+        'SQLITE_CACHE_SIZE': -65536, 'SQLITE_MMAP_SIZE': 1 << 28, 'SQLITE_BUSY_TIMEOUT': 5000,
+    },
+    'nullpool+cache': {'REPOSITORY_CACHE_SIZE': 4096},
+}
+
+
+def make_app(data_path: Path, database_path: Path, profile: dict):
+    return create_app({
+        'TESTING': True,
+        'REPOSITORY': 'database',
+        'TEST_DATA_PATH': data_path,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}',
+        'WTF_CSRF_ENABLED': False,
+        **profile,
+    })
+
+
+# User names stay unique across the runs sharing a database.
+_user_numbers = itertools.count()
+
+
+def run(app, rows: int, clients: int, seconds: float, writer: bool):
+    running = threading.Event()
+    running.set()
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+    writes = [0]
+
+    def read(client_index):
+        rng = random.Random(client_index)
+        client = app.test_client()
+        pages = max(rows // 10, 1)
+        while running.is_set():
+            if rng.random() < 0.5:
+                url = f'/all?page_num={rng.randrange(pages)}'
+            else:
+                url = f'/tracks_by_genre?genre={rng.choice(GENRE_TITLES)}&page_num={rng.randrange(pages // 10 + 1)}'
+            start = time.perf_counter()
+            response = client.get(url)
+            latencies[client_index].append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors[client_index] += 1
+
+    def write():
+        rng = random.Random(-1)
+        while running.is_set():
+            user_name = f'loaduser{next(_user_numbers)}'
+            repo.repo_instance.add_user(User(user_name, 'password123'))
+            services.add_review(rng.randrange(1, rows + 1), rng.randint(1, 5), user_name, repo.repo_instance)
+            repo.repo_instance.close_session()
+            writes[0] += 1
+
+    threads = [threading.Thread(target=read, args=(client_index,)) for client_index in range(clients)]
+    if writer:
+        threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    running.clear()
+    for thread in threads:
+        thread.join()
+
+    all_latencies = sorted(latency for client_latencies in latencies for latency in client_latencies)
+    p99 = all_latencies[min(int(len(all_latencies) * 0.99), len(all_latencies) - 1)]
+    return len(all_latencies) / seconds, statistics.median(all_latencies), p99, sum(errors), writes[0] / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--no-writer', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_tracks_csv(Path(tmp), args.rows)
+        print(f"{'profile':>14} {'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'writes/s':>9}")
+        for name, profile in PROFILES.items():
+            app = make_app(Path(tmp), Path(tmp) / f'{name}.db', profile)
+            for clients in args.clients:
+                requests_per_second, p50, p99, errors, writes_per_second = run(
+                    app, args.rows, clients, args.seconds, not args.no_writer)
+                print(f"{name:>14} {clients:>8} {requests_per_second:>8.0f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f} "
+                      f"{errors:>7} {writes_per_second:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
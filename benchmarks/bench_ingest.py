@@ -0,0 +1,41 @@
+"""Ingest scaling benchmark: time populate() into a MemoryRepository for growing synthetic catalogs.
+
+With --many-artists the catalog has one artist per 8 tracks and one album per 5, so the number of distinct artists
+grows with the catalog; time per row should stay flat.
+
+Usage: python -m benchmarks.bench_ingest [--sizes 2000 10000 50000 100000 500000] [--many-artists]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_tracks_csv
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.csv_reader import populate
+
+
+def time_ingest(data_path: Path) -> float:
+    repo = MemoryRepository()
+    start = time.perf_counter()
+    populate(data_path, repo)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 10000, 50000, 100000, 500000])
+    parser.add_argument('--many-artists', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'artists':>8} {'seconds':>10} {'rows/s':>12} {'us/row':>10}")
+    for rows in args.sizes:
+        artists, albums = (max(rows // 8, 1), max(rows // 5, 1)) if args.many_artists else (250, 400)
+        with tempfile.TemporaryDirectory() as tmp:
+            write_tracks_csv(Path(tmp), rows, artists=artists, albums=albums)
+            elapsed = time_ingest(Path(tmp))
+        print(f"{rows:>10} {artists:>8} {elapsed:>10.2f} {rows / elapsed:>12.0f} {elapsed / rows * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Lookup benchmark for the memory repository: tracks by artist, album and genre, indexed versus a scan of every track.
+
+Artists and albums grow with the catalog (rows / 50 and rows / 20), so each holds about the same number of tracks at
+every size; an indexed lookup should then take the same time however large the catalog is. Genres are fixed, so
+their posting lists grow with the catalog; two-genre intersections are timed as well.
+
+Usage: python -m benchmarks.bench_memory_lookups [--sizes 10000 50000 200000] [--lookups 2000]
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_tracks_csv
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.csv_reader import populate
+
+
+def scan_by_artist(repo: MemoryRepository, target_artist: str):
+    # The lookup as it was before the repository kept indexes.
+    return [track for track in repo.get_tracks() if track.artist.full_name == target_artist.replace("_", " ")]
+
+
+def microseconds_per_lookup(lookup, names) -> float:
+    start = time.perf_counter()
+    for name in names:
+        lookup(name)
+    return (time.perf_counter() - start) / len(names) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000])
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'tracks':>8} {'artist us':>10} {'album us':>10} {'genre us':>10} {'2 genres us':>12} {'scan us':>10}")
+    for rows in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_tracks_csv(Path(tmp), rows, artists=rows // 50, albums=rows // 20)
+            repo = MemoryRepository()
+            populate(Path(tmp), repo)
+
+        artist_names = [artist.full_name.replace(" ", "_") for artist in rng.choices(repo.get_artists(), k=args.lookups)]
+        album_titles = [album.title.replace(" ", "_") for album in rng.choices(repo.get_albums(), k=args.lookups)]
+        genre_names = [genre.name for genre in rng.choices(repo.get_genres(), k=args.lookups)]
+        genre_pairs = [genre_names[i:i + 2] for i in range(0, len(genre_names) - 1)]
+        artist_us = microseconds_per_lookup(repo.get_tracks_by_artist, artist_names)
+        album_us = microseconds_per_lookup(repo.get_tracks_by_album, album_titles)
+        genre_us = microseconds_per_lookup(repo.get_track_ids_for_genre, genre_names)
+        pair_us = microseconds_per_lookup(repo.get_track_ids_for_genres, genre_pairs)
+        # The scan is timed on fewer lookups; it is orders of magnitude slower.
+        scan_us = microseconds_per_lookup(lambda name: scan_by_artist(repo, name), artist_names[:20])
+        print(f"{rows:>8} {artist_us:>10.1f} {album_us:>10.1f} {genre_us:>10.1f} {pair_us:>12.1f} {scan_us:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
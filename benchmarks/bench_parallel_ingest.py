@@ -0,0 +1,37 @@
+"""Parallel ingest scaling benchmark: populate() a MemoryRepository with 1, 2, 4 and 8 parsing workers.
+
+Usage: python -m benchmarks.bench_parallel_ingest [--rows 200000] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_tracks_csv
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.csv_reader import populate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(f"rows: {args.rows}, cpus available: {os.cpu_count()}")
+    print(f"{'workers':>8} {'seconds':>10} {'rows/s':>12} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        write_tracks_csv(Path(tmp), args.rows)
+        baseline = None
+        for workers in args.workers:
+            repo = MemoryRepository()
+            start = time.perf_counter()
+            populate(Path(tmp), repo, workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>10.2f} {args.rows / elapsed:>12.0f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Start-up benchmark for the memory repository: populate() from CSV versus loading a catalog snapshot.
+
+Usage: python -m benchmarks.bench_snapshot [--sizes 50000 500000]
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_tracks_csv
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.csv_reader import populate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50000, 500000])
+    args = parser.parse_args()
+
+    print(f"{'tracks':>8} {'csv s':>8} {'snapshot s':>11} {'ratio':>7} {'csv MB':>8} {'snapshot MB':>12}")
+    for rows in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            data_path = Path(tmp)
+            track_file = write_tracks_csv(data_path, rows)
+            snapshot_path = data_path / 'catalog.snapshot'
+
+            start = time.perf_counter()
+            repo = MemoryRepository()
+            populate(data_path, repo)
+            csv_seconds = time.perf_counter() - start
+            repo.save_snapshot(snapshot_path, data_path)
+            del repo
+
+            start = time.perf_counter()
+            MemoryRepository.from_snapshot(snapshot_path, data_path)
+            snapshot_seconds = time.perf_counter() - start
+
+            print(f"{rows:>8} {csv_seconds:>8.2f} {snapshot_seconds:>11.2f} {snapshot_seconds / csv_seconds:>7.2f}"
+                  f" {os.path.getsize(track_file) / 1e6:>8.1f} {os.path.getsize(snapshot_path) / 1e6:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
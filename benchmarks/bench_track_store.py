@@ -0,0 +1,54 @@
+"""Memory benchmark for the memory repository's track storage: bytes held per track, objects versus columnar.
+
+The tracks of a populated repository are measured with tracemalloc; artists, albums and genres are shared by both
+storages and are counted as well, so the difference between the two rows is the saving of the columnar layout.
+
+Usage: python -m benchmarks.bench_track_store [--rows 100000] [--lookups 100000]
+"""
+import argparse
+import gc
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.synthetic import write_tracks_csv
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.csv_reader import populate
+
+
+def measure(data_path: Path, storage: str, lookups: int):
+    gc.collect()
+    tracemalloc.start()
+    repo = MemoryRepository(storage)
+    populate(data_path, repo)
+    gc.collect()
+    held_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    track_ids = random.Random(0).choices([track.track_id for track in repo.get_tracks()], k=lookups)
+    start = time.perf_counter()
+    for track_id in track_ids:
+        track = repo.get_track(track_id)
+        track.title, track.artist, track.genres
+    lookup_seconds = time.perf_counter() - start
+    return held_bytes, lookup_seconds / lookups * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_tracks_csv(Path(tmp), args.rows)
+        print(f"{'storage':>10} {'MB':>8} {'bytes/track':>12} {'get_track us':>13}")
+        for storage in ('objects', 'columnar'):
+            held_bytes, lookup_us = measure(Path(tmp), storage, args.lookups)
+            print(f"{storage:>10} {held_bytes / 2**20:>8.1f} {held_bytes / args.rows:>12.0f} {lookup_us:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""User store benchmark for the memory repository: registration and login lookups with a large user base.
+
+Usage: python -m benchmarks.bench_user_store [--users 1000000] [--lookups 100000]
+"""
+import argparse
+import random
+import time
+
+from music.adapters.MemoryRepository import MemoryRepository
+from music.domainmodel.user import User
+
+
+def scan_for_user(users, user_name):
+    # The lookup as it was when users were kept in a list.
+    return next((user for user in users if user.user_name == user_name), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    args = parser.parse_args()
+
+    users = [User(f'user{i}', 'password123') for i in range(args.users)]
+    repo = MemoryRepository()
+    start = time.perf_counter()
+    for user in users:
+        # As services.add_user does: check that the name is free, then add.
+        if repo.get_user(user.user_name) is None:
+            repo.add_user(user)
+    register_seconds = time.perf_counter() - start
+
+    rng = random.Random(0)
+    names = [f'User{rng.randrange(args.users)} ' for _ in range(args.lookups)]
+    start = time.perf_counter()
+    for name in names:
+        repo.get_user(name)
+    lookup_seconds = time.perf_counter() - start
+
+    # The scan is timed on a handful of lookups of names spread over the list.
+    scan_names = [f'user{i * args.users // 10}' for i in range(10)]
+    start = time.perf_counter()
+    for name in scan_names:
+        scan_for_user(users, name)
+    scan_seconds = time.perf_counter() - start
+
+    print(f"users: {args.users}")
+    print(f"register: {args.users / register_seconds:>12.0f} users/s")
+    print(f"login lookup: {lookup_seconds / args.lookups * 1e6:>8.2f} us")
+    print(f"list scan lookup: {scan_seconds / len(scan_names) * 1e6:>8.0f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Write-ahead log benchmark: reviews/s added to a memory repository with an fsync per write versus group commit.
+
+Each review is preceded by the registration of its user, so every review writes two log records. The log lives in
+--dir (default: a temporary directory), which should be on the disk the application would use.
+
+Usage: python -m benchmarks.bench_wal [--reviews 5000] [--intervals 0 0.01 0.05] [--dir PATH]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.wal import WriteAheadLog
+from music.domainmodel.track import Track
+from music.domainmodel.user import User
+from music.utilities.services import make_review
+
+
+def reviews_per_second(log_path: Path, reviews: int, fsync_interval) -> float:
+    repo = MemoryRepository()
+    tracks = [Track(track_id, f'Track {track_id}') for track_id in range(1000)]
+    for track in tracks:
+        repo.add_track(track)
+    if fsync_interval is not None:
+        write_ahead_log = WriteAheadLog(log_path, fsync_interval, compact_records=reviews * 2 + 1)
+        repo.attach_write_ahead_log(write_ahead_log)
+
+    start = time.perf_counter()
+    for i in range(reviews):
+        user = User(f'user{i}', 'password123')
+        repo.add_user(user)
+        repo.add_review(make_review(tracks[i % len(tracks)], user, 1 + i % 5))
+    if fsync_interval is not None:
+        write_ahead_log.close()
+    return reviews / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reviews', type=int, default=5000)
+    parser.add_argument('--intervals', type=float, nargs='+', default=[0, 0.01, 0.05])
+    parser.add_argument('--dir', type=Path, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        print(f"{'log':>24} {'reviews/s':>10}")
+        print(f"{'none':>24} {reviews_per_second(Path(tmp) / 'none.wal', args.reviews, None):>10.0f}")
+        for interval in args.intervals:
+            label = 'fsync per write' if interval == 0 else f'group commit {interval * 1000:g} ms'
+            log_path = Path(tmp) / f'{interval}.wal'
+            print(f"{label:>24} {reviews_per_second(log_path, args.reviews, interval):>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Write cost benchmark for the memory repository: microseconds per registration, review and new track against the
+size of the structure each one grows, with and without copy-on-write.
+
+Each size starts from a repository holding that many users, reviews and tracks, then times further writes of each
+kind. Tracks are added in id order, as new catalog rows are; with copy-on-write a write should cost about the same at
+every size.
+
+Usage: python -m benchmarks.bench_write_cost [--sizes 10000 100000 300000] [--writes 2000]
+"""
+import argparse
+import gc
+import itertools
+import time
+
+from music.adapters.MemoryRepository import MemoryRepository
+from music.domainmodel.artist import Artist
+from music.domainmodel.album import Album
+from music.domainmodel.genre import Genre
+from music.domainmodel.track import Track
+from music.domainmodel.user import User
+from music.utilities.services import make_review
+
+ARTISTS = [Artist(artist_id, f'Artist {artist_id}') for artist_id in range(1, 251)]
+ALBUMS = [Album(album_id, f'Album {album_id}') for album_id in range(1, 401)]
+GENRES = [Genre(genre_id, f'Genre {genre_id}') for genre_id in range(1, 21)]
+
+
+def make_track(track_id: int) -> Track:
+    track = Track(track_id, f'Track {track_id}')
+    track.artist = ARTISTS[track_id % len(ARTISTS)]
+    track.album = ALBUMS[track_id % len(ALBUMS)]
+    track.add_genre(GENRES[track_id % len(GENRES)])
+    return track
+
+
+def filled_repository(size: int, storage: str, concurrency: str) -> MemoryRepository:
+    repo = MemoryRepository(storage, concurrency)
+    with repo.bulk_loading():
+        for track_id in range(1, size + 1):
+            repo.add_track(make_track(track_id))
+        for user_number in range(size):
+            repo.add_user(User(f'user{user_number}', 'password123'))
+        tracks = repo.get_tracks()
+        for review_number in range(size):
+            # One review per track and user: a Track checks its own reviews for duplicates, which is not timed here.
+            repo.add_review(make_review(tracks[review_number], repo.get_user(f'user{review_number}'),
+                                        1 + review_number % 5))
+    return repo
+
+
+def microseconds_per_write(write, count: int) -> float:
+    # Collect the garbage of filling the repository first, so that a collection does not land in one timing.
+    gc.collect()
+    start = time.perf_counter()
+    for number in range(count):
+        write(number)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 300000])
+    parser.add_argument('--writes', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'storage':>9} {'concurrency':>14} {'user us':>9} {'review us':>10} {'track us':>9}")
+    for size, storage, concurrency in itertools.product(args.sizes, ('objects', 'columnar'),
+                                                        ('none', 'copy_on_write')):
+        repo = filled_repository(size, storage, concurrency)
+        user_us = microseconds_per_write(lambda number: repo.add_user(User(f'new{number}', 'password123')),
+                                         args.writes)
+        # Every new user reviews another track.
+        review_us = microseconds_per_write(lambda number: repo.add_review(
+            make_review(repo.get_track(1 + number % size), repo.get_user(f'new{number}'), 3)), args.writes)
+        track_us = microseconds_per_write(lambda number: repo.add_track(make_track(size + 1 + number)), args.writes)
+        print(f"{size:>8} {storage:>9} {concurrency:>14} {user_us:>9.1f} {review_us:>10.1f} {track_us:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
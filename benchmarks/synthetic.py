@@ -0,0 +1,86 @@
+"""Synthetic catalog dumps in the raw_tracks_excerpt.csv layout, used by the ingest benchmarks."""
+import csv
+import random
+from pathlib import Path
+
+TRACK_COLUMNS = [
+    'track_id', 'album_id', 'album_title', 'album_url', 'artist_id', 'artist_name', 'artist_url', 'artist_website',
+    'license_image_file', 'license_image_file_large', 'license_parent_id', 'license_title', 'license_url', 'tags',
+    'track_bit_rate', 'track_comments', 'track_composer', 'track_copyright_c', 'track_copyright_p',
+    'track_date_created', 'track_date_recorded', 'track_disc_number', 'track_duration', 'track_explicit',
+    'track_explicit_notes', 'track_favorites', 'track_file', 'track_genres', 'track_image_file', 'track_information',
+    'track_instrumental', 'track_interest', 'track_language_code', 'track_listens', 'track_lyricist', 'track_number',
+    'track_publisher', 'track_title', 'track_url',
+]
+
+GENRE_TITLES = [
+    'Rock', 'Electronic', 'Folk', 'Hip-Hop', 'Experimental', 'Pop', 'Jazz', 'Punk', 'Noise', 'Ambient',
+    'Indie-Rock', 'Lo-Fi', 'Blues', 'Soul-RnB', 'Classical', 'Country', 'International', 'Spoken', 'Techno', 'House',
+]
+
+
+def genre_field(genre_ids):
+    return str([
+        {'genre_id': str(genre_id), 'genre_title': GENRE_TITLES[genre_id % len(GENRE_TITLES)],
+         'genre_url': f'http://freemusicarchive.org/genre/{GENRE_TITLES[genre_id % len(GENRE_TITLES)]}/'}
+        for genre_id in genre_ids
+    ])
+
+
+def write_tracks_csv(data_path: Path, rows: int, artists: int = 250, albums: int = 400, seed: int = 0) -> Path:
+    """ Writes a raw_tracks_excerpt.csv with the given number of rows into data_path and returns its path. """
+    rng = random.Random(seed)
+    data_path = Path(data_path)
+    data_path.mkdir(parents=True, exist_ok=True)
+    track_file = data_path / 'raw_tracks_excerpt.csv'
+    # A small vocabulary of genre lists, as in real dumps where the same strings repeat thousands of times.
+    genre_fields = [genre_field(sorted(rng.sample(range(len(GENRE_TITLES)), rng.randint(1, 3)))) for _ in range(80)]
+
+    with open(track_file, 'w', newline='', encoding='utf-8') as track_csv:
+        writer = csv.writer(track_csv)
+        writer.writerow(TRACK_COLUMNS)
+        for track_id in range(1, rows + 1):
+            artist_id = rng.randrange(1, artists + 1)
+            album_id = rng.randrange(1, albums + 1)
+            row = dict.fromkeys(TRACK_COLUMNS, '')
+            row.update({
+                'track_id': track_id,
+                'album_id': album_id,
+                'album_title': f'Album {album_id}',
+                'artist_id': artist_id,
+                'artist_name': f'Artist {artist_id}',
+                'license_title': 'Attribution-NonCommercial-ShareAlike 3.0 International',
+                'track_duration': rng.randint(30, 600),
+                'track_genres': rng.choice(genre_fields),
+                'track_information': '<p>synthetic track</p>',
+                'track_title': f'Track {track_id}',
+                'track_url': f'http://freemusicarchive.org/music/synthetic/{track_id}',
+            })
+            writer.writerow(row.values())
+    return track_file
+
+
+def write_replicated_excerpt(data_path: Path, copies: int) -> Path:
+    """ Writes the bundled raw_tracks_excerpt.csv, repeated copies times with fresh track ids, into data_path.
+    Unlike write_tracks_csv this keeps the long free-text columns of the real dump.
+    """
+    from utils import get_project_root
+
+    source = get_project_root() / 'music' / 'adapters' / 'data' / 'raw_tracks_excerpt.csv'
+    data_path = Path(data_path)
+    data_path.mkdir(parents=True, exist_ok=True)
+    track_file = data_path / 'raw_tracks_excerpt.csv'
+    # latin-1 maps every byte to one character, so escape sequences pass through untouched.
+    with open(source, encoding='latin-1', newline='') as source_csv:
+        reader = csv.reader(source_csv)
+        header = next(reader)
+        rows = list(reader)
+    with open(track_file, 'w', encoding='latin-1', newline='') as track_csv:
+        writer = csv.writer(track_csv)
+        writer.writerow(header)
+        track_id = 0
+        for _ in range(copies):
+            for row in rows:
+                track_id += 1
+                writer.writerow([str(track_id)] + row[1:])
+    return track_file
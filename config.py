@@ -19,9 +19,55 @@ class Config:
 
     REPOSITORY = environ.get('REPOSITORY')
 
+    # Number of processes used to parse the catalog CSV files while populating a repository (1 = serial).
+    INGEST_WORKERS = int(environ.get('INGEST_WORKERS') or 1)
+
+    # Catalog snapshot used to start a memory repository without parsing the CSV files (empty = disabled).
+    MEMORY_SNAPSHOT_PATH = environ.get('MEMORY_SNAPSHOT_PATH')
+
+    # 'objects' keeps a Track object per track in the memory repository, 'columnar' packs them into typed arrays.
+    MEMORY_STORAGE = environ.get('MEMORY_STORAGE') or 'objects'
+
+    # 'copy_on_write' makes the memory repository safe to share between the threads of a threaded server,
+    # 'none' leaves it unsynchronized.
+    MEMORY_CONCURRENCY = environ.get('MEMORY_CONCURRENCY') or 'none'
+
+    # Write-ahead log that keeps the users and reviews of the memory repository across restarts (empty = disabled).
+    WAL_PATH = environ.get('WAL_PATH')
+    # Seconds between fsyncs of the log; writes in between are committed as a group. 0 = fsync every write.
+    WAL_FSYNC_INTERVAL = float(environ.get('WAL_FSYNC_INTERVAL') or 0.05)
+    # Records after which the log is compacted.
+    WAL_COMPACT_RECORDS = int(environ.get('WAL_COMPACT_RECORDS') or 10000)
+
+    # Results of repository reads kept in the read-through cache in front of the repository (0 = no cache).
+    REPOSITORY_CACHE_SIZE = int(environ.get('REPOSITORY_CACHE_SIZE') or 0)
+
+    # File the timings of the start-up catalog ingest are written to as JSON (empty = only logged).
+    INGEST_STATS_PATH = environ.get('INGEST_STATS_PATH')
+
     # Database configuration
     SQLALCHEMY_DATABASE_URI = environ.get('SQLALCHEMY_DATABASE_URI')
 
+    # Engine profile. DATABASE_POOL is 'null' (a new connection per session) or 'queue' (up to DATABASE_POOL_SIZE
+    # connections shared by all threads).
+    DATABASE_POOL = environ.get('DATABASE_POOL') or 'null'
+    DATABASE_POOL_SIZE = int(environ.get('DATABASE_POOL_SIZE') or 5)
+    # Pragmas set on every new SQLite connection; empty or 0 keeps SQLite's default. 'wal' lets readers run
+    # alongside the writer, and synchronous 'normal' then only fsyncs at checkpoints.
+    SQLITE_JOURNAL_MODE = environ.get('SQLITE_JOURNAL_MODE') or ''
+    SQLITE_SYNCHRONOUS = environ.get('SQLITE_SYNCHRONOUS') or ''
+    # Page cache in pages, or in KiB if negative, and bytes of the database file read through mmap.
+    SQLITE_CACHE_SIZE = int(environ.get('SQLITE_CACHE_SIZE') or 0)
+    SQLITE_MMAP_SIZE = int(environ.get('SQLITE_MMAP_SIZE') or 0)
+    # Milliseconds a connection waits for a locked database before failing.
+    SQLITE_BUSY_TIMEOUT = int(environ.get('SQLITE_BUSY_TIMEOUT') or 0)
+
+    # 'full' reloads the catalog only into an empty database, 'incremental' also applies changed csv rows on start-up.
+    CATALOG_SYNC = environ.get('CATALOG_SYNC') or 'full'
+
+    # 'startup' loads the catalog into an empty database in create_app, 'offline' leaves it to `flask ingest`.
+    CATALOG_INGEST = environ.get('CATALOG_INGEST') or 'startup'
+
     echo_string = environ.get('SQLALCHEMY_ECHO')
     SQLALCHEMY_ECHO = False
     if echo_string.lower().strip() == "true":
@@ -1,17 +1,26 @@
 """Initialize Flask app."""
 
 
+import atexit
+import json
+import logging
+import os
+
 from flask import Flask
 from pathlib import Path
 import music.adapters.Repository as repo
 from music.adapters.MemoryRepository import MemoryRepository
 from music.adapters.database_repository import SqlAlchemyRepository
 from music.adapters.csv_reader import populate
-from sqlalchemy import create_engine
+from music.adapters.snapshot import snapshot_is_fresh, SnapshotError
+from music.adapters.catalog_sync import sync_catalog
+from music.adapters.migrations import upgrade_schema
+from music.adapters.ingest_stats import IngestStats
+from music.adapters.wal import WriteAheadLog
+from music.adapters.engine import create_database_engine
+from music.adapters.caching_repository import CachingRepository, unwrap
 from sqlalchemy.orm import sessionmaker, clear_mappers
-from sqlalchemy.pool import NullPool
 from music.adapters.orm import metadata, map_model_to_tables
-import traceback
 
 
 
@@ -29,47 +38,117 @@ def create_app(test_config=None):
         # Load test configuration, and override any configuration settings.
         app.config.from_mapping(test_config)
         data_path = app.config['TEST_DATA_PATH']
+    ingest_workers = int(app.config['INGEST_WORKERS'])
+    if app.logger.level == logging.NOTSET:
+        # Start-up progress and ingest timings are logged at INFO level.
+        app.logger.setLevel(logging.INFO)
+    ingest_stats = None
+
     if app.config['REPOSITORY'] == 'memory':
         # Create the MemoryRepository implementation for a memory-based repository.
-        repo.repo_instance = MemoryRepository()
         database_mode = False
-        # fill the content of the repository from the provided csv files
-        populate(data_path, repo.repo_instance)
+        snapshot_path = app.config.get('MEMORY_SNAPSHOT_PATH')
+        storage = app.config.get('MEMORY_STORAGE') or 'objects'
+        concurrency = app.config.get('MEMORY_CONCURRENCY') or 'none'
+        repo.repo_instance = None
+        if snapshot_path and snapshot_is_fresh(snapshot_path, data_path):
+            # The snapshot is newer than the csv files, so it holds the same catalog and is much faster to load.
+            try:
+                ingest_stats = IngestStats('snapshot')
+                with ingest_stats.phase('snapshot_load'):
+                    repo.repo_instance = MemoryRepository.from_snapshot(snapshot_path, data_path, storage, concurrency)
+                ingest_stats.rows = len(repo.repo_instance.get_tracks())
+                ingest_stats.finish(ingest_stats.phases['snapshot_load'])
+            except SnapshotError:
+                app.logger.exception('Could not load the catalog snapshot %s', snapshot_path)
+        if repo.repo_instance is None:
+            repo.repo_instance = MemoryRepository(storage, concurrency)
+            # fill the content of the repository from the provided csv files
+            ingest_stats = populate(data_path, repo.repo_instance, ingest_workers)
+            if snapshot_path:
+                repo.repo_instance.save_snapshot(snapshot_path, data_path)
+        wal_path = app.config.get('WAL_PATH')
+        if wal_path:
+            # Bring back the users and reviews of earlier runs, then log the new ones.
+            write_ahead_log = WriteAheadLog(wal_path, float(app.config['WAL_FSYNC_INTERVAL']),
+                                            int(app.config['WAL_COMPACT_RECORDS']))
+            replayed = write_ahead_log.replay(repo.repo_instance)
+            repo.repo_instance.attach_write_ahead_log(write_ahead_log)
+            atexit.register(write_ahead_log.close)
+            app.extensions['write_ahead_log'] = write_ahead_log
+            app.logger.info('Replayed %d users and reviews from %s', replayed, wal_path)
     elif app.config['REPOSITORY'] == 'database':
         # Configure database.
-        database_uri = app.config['SQLALCHEMY_DATABASE_URI']
-
         # We create a comparatively simple SQLite database, which is based on a single file (see .env for URI).
         # For example the file database could be located locally and relative to the application in covid-19.db,
         # leading to a URI of "sqlite:///covid-19.db".
-        # Note that create_engine does not establish any actual DB connection directly!
+        # Note that creating the engine does not establish any actual DB connection directly!
         database_echo = app.config['SQLALCHEMY_ECHO']
-        # Please do not change the settings for connect_args and poolclass!
-        database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=NullPool,
-                                        echo=database_echo)
+        # The pool and SQLite pragmas come from the engine profile in config.Config; by default every session gets
+        # a fresh connection from a NullPool.
+        database_engine = create_database_engine(app.config, echo=database_echo)
 
         # Create the database session factory using sessionmaker (this has to be done once, in a global manner)
         session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine)
         # Create the SQLAlchemy DatabaseRepository instance for an sqlite3-based repository.
         repo.repo_instance = SqlAlchemyRepository(session_factory)
+        incremental_sync = app.config['CATALOG_SYNC'] == 'incremental'
+        # With offline ingest the catalog is only ever loaded by `flask ingest`, so concurrently starting workers
+        # cannot race to populate the same database file.
+        offline_ingest = app.config['CATALOG_INGEST'] == 'offline'
 
-        if app.config['TESTING'] == 'True' or len(database_engine.table_names()) == 0:
-            print("REPOPULATING DATABASE...")
+        if app.config['TESTING'] == 'True' or (len(database_engine.table_names()) == 0 and not offline_ingest):
+            app.logger.info("REPOPULATING DATABASE...")
             # For testing, or first-time use of the web application, reinitialise the database.
             clear_mappers()
 
-            metadata.create_all(database_engine)  # Conditionally create database tables.
+            # Create missing tables, and add the columns and indexes that tables of an older database file lack.
+            upgrade_schema(database_engine)
 
             for table in reversed(metadata.sorted_tables):  # Remove any data from the tables.
                 database_engine.execute(table.delete())
 
             # Generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
-            populate(data_path, repo.repo_instance)
-            print("REPOPULATING DATABASE... FINISHED")
+            if incremental_sync:
+                # Loading through the sync records the content hashes that later incremental runs compare against.
+                ingest_stats = _sync_stats(sync_catalog(data_path, database_engine, ingest_workers))
+            else:
+                ingest_stats = populate(data_path, repo.repo_instance, ingest_workers)
+            # Recorded so that a later `flask ingest` of the same files adopts this catalog instead of refusing it.
+            repo.repo_instance.save_ingest_state(os.path.abspath(data_path), ingest_stats.rows, 'startup')
+            app.logger.info("REPOPULATING DATABASE... FINISHED")
         else:
+            # Database files created by an older version of the application may lack tables or columns.
+            upgrade_schema(database_engine)
             # Solely generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
+            ingest_state = repo.repo_instance.get_ingest_state()
+            if (ingest_state is not None and ingest_state['status'] != 'startup') or offline_ingest:
+                # The catalog is managed by `flask ingest`; start-up leaves it alone.
+                if ingest_state is None or ingest_state['status'] != 'complete':
+                    app.logger.warning('The catalog has not been fully ingested yet, run "flask ingest".')
+            elif incremental_sync:
+                # Apply only the csv rows that were added, changed or removed since the last sync.
+                ingest_stats = _sync_stats(sync_catalog(data_path, database_engine, ingest_workers))
+
+    cache_size = int(app.config.get('REPOSITORY_CACHE_SIZE') or 0)
+    if cache_size > 0:
+        # Serve repeated reads of the catalog from memory; writes through the app invalidate what they change.
+        repo.repo_instance = CachingRepository(repo.repo_instance, cache_size)
+        app.extensions['repository_cache'] = repo.repo_instance
+
+    if ingest_stats is not None:
+        app.logger.info('Catalog ingest: %s', json.dumps(ingest_stats.as_dict()))
+        # Kept on the app so the timings of this start-up can be inspected afterwards.
+        app.extensions['ingest_stats'] = ingest_stats.as_dict()
+        if app.config.get('INGEST_STATS_PATH'):
+            with open(app.config['INGEST_STATS_PATH'], 'w') as stats_file:
+                json.dump(ingest_stats.as_dict(), stats_file, indent=2)
+
+    from .cli import ingest_command, rebuild_ratings_command
+    app.cli.add_command(ingest_command)
+    app.cli.add_command(rebuild_ratings_command)
 
     # Build the application - these steps require an application context.
     with app.app_context():
@@ -88,13 +167,25 @@ def create_app(test_config=None):
 
         @app.before_request
         def before_flask_http_request_function():
-            if isinstance(repo.repo_instance, SqlAlchemyRepository):
+            if isinstance(unwrap(repo.repo_instance), SqlAlchemyRepository):
                 repo.repo_instance.reset_session()
 
         # Register a tear-down method that will be called after each request has been processed.
         @app.teardown_appcontext
         def shutdown_session(exception=None):
-            if isinstance(repo.repo_instance, SqlAlchemyRepository):
+            if isinstance(unwrap(repo.repo_instance), SqlAlchemyRepository):
                 repo.repo_instance.close_session()
 
-    return app
\ No newline at end of file
+    return app
+
+
+def _sync_stats(report) -> IngestStats:
+    # Reports an incremental catalog sync in the same shape as a full ingest.
+    stats = IngestStats('incremental_sync')
+    stats.add_time('csv_read', report.read_seconds)
+    stats.add_time('repository_write', report.write_seconds)
+    stats.rows = report.added + report.changed + report.unchanged
+    for outcome in ('added', 'changed', 'removed', 'unchanged'):
+        stats.add_entities(f'tracks_{outcome}', getattr(report, outcome))
+    stats.finish(report.total_seconds)
+    return stats
@@ -1,152 +1,377 @@
-from typing import List
-from bisect import bisect, bisect_left, insort_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from array import array
+from bisect import bisect, bisect_left
+from contextlib import contextmanager, nullcontext
+from copy import copy
+from threading import RLock
 from music.adapters.Repository import AbstractRepository, RepositoryException
+from music.adapters.sorted_ids import contains_id, intersect_sorted, neighbor_ids, union_sorted
+from music.adapters.track_store import ObjectTrackStore, ColumnarTrackStore
 from music.domainmodel.user import User
 from music.domainmodel.review import Review
 from music.domainmodel.artist import Artist
 from music.domainmodel.album import Album
 from music.domainmodel.track import Track
 from music.domainmodel.genre import Genre
+from music.adapters.snapshot import save_snapshot, load_snapshot
+from music.adapters.wal import WriteAheadLog
+
+
+# Storage engines for the tracks of a MemoryRepository: full Track objects, or columns with Track views on demand.
+TRACK_STORES = {'objects': ObjectTrackStore, 'columnar': ColumnarTrackStore}
+
+# How a MemoryRepository handles concurrent use: 'none' changes its structures in place and suits a single thread;
+# 'copy_on_write' lets writers take turns under a lock and publish changed copies, while readers take no lock.
+CONCURRENCY_MODES = ('none', 'copy_on_write')
 
 
 class MemoryRepository(AbstractRepository):
     # tracks ordered by date, not id. id is assumed unique.
 
-    def __init__(self):
-        self.__tracks = list()
-        self.__tracks_index = dict()
-        self.__albums = dict()
+    def __init__(self, storage: str = 'objects', concurrency: str = 'none'):
+        if storage not in TRACK_STORES:
+            raise ValueError(f'Unknown track storage {storage!r}, expected one of {", ".join(TRACK_STORES)}')
+        if concurrency not in CONCURRENCY_MODES:
+            raise ValueError(f'Unknown concurrency mode {concurrency!r}, expected one of {", ".join(CONCURRENCY_MODES)}')
+        # With copy-on-write, a structure that readers can reach is never changed once it is published: writers
+        # change a copy of it and then publish the copy by assigning it to its attribute. A read method takes each
+        # attribute it needs once, so it works on a consistent version of that structure without locking.
+        # Copying a structure costs time in its size, so writes that only grow a structure at its end change it in
+        # place instead: readers then see it grow by whole entries, its last part written last, and what they read
+        # before stays valid. New keys likewise go straight into the dicts that readers only get() from.
+        # Writers are serialized by __write_lock; structures that only writers read are changed in place.
+        self.__copy_on_write = concurrency == 'copy_on_write'
+        self.__write_lock = RLock() if self.__copy_on_write else nullcontext()
+        self.__bulk_loading = False
+        self.__tracks = TRACK_STORES[storage]()
+        self.__albums = list()
+        self.__albums_index = dict()
         self.__artists = list()
+        self.__artists_index = dict()
+        # Secondary indexes from normalized artist names / album titles and from ids to the ids of their tracks,
+        # each kept in track id order.
+        self.__artist_track_ids: Dict[str, array] = dict()
+        self.__artist_id_track_ids: Dict[int, array] = dict()
+        self.__album_track_ids: Dict[str, array] = dict()
+        self.__album_id_track_ids: Dict[int, array] = dict()
         self.__genres = list()
-        self.__users = list()
+        self.__genres_index = dict()
+        self.__genres_by_name = dict()
+        # Posting lists: the ids of the tracks tagged with each genre id, in track id order.
+        self.__genre_track_ids: Dict[int, array] = dict()
+        # Users keyed by their normalized user name, which is unique.
+        self.__users = dict()
+        # Reviews are appended in place; readers see the first __review_count of them.
         self.__reviews = list()
+        self.__review_count = 0
+        # (track id, user name) of every stored review; a user reviews a track once. Only read by writers.
+        self.__review_keys = set()
+        # Users and reviews added are logged here once applied, see attach_write_ahead_log().
+        self.__write_ahead_log = None
 
     def add_user(self, user: User):
-        self.__users.append(user)
+        with self.__write_lock:
+            if user.user_name in self.__users:
+                raise RepositoryException(f'User name {user.user_name} is already taken')
+            # Readers only get() users by name, and storing one key is atomic.
+            self.__users[user.user_name] = user
+            if self.__write_ahead_log is not None:
+                self.__write_ahead_log.log_user(user)
 
     def get_user(self, user_name) -> User:
-        return next((user for user in self.__users if user.user_name == user_name), None)
+        return self.__users.get(normalize_user_name(user_name))
 
     def add_track(self, track: Track):
-        insort_left(self.__tracks, track)
-        self.__tracks_index[track.track_id] = track
+        with self.__write_lock:
+            tracks = self.__tracks
+            if not tracks.appends(track.track_id):
+                # Only a track after every stored one can be added where readers see it; others go into a copy.
+                tracks = self.__writable(tracks)
+            tracks.add(track)
+            # The track is published before the index entries that lead to it.
+            self.__tracks = tracks
+            if track.artist is not None:
+                self.__index(self.__artist_track_ids, normalize_name(track.artist.full_name), track.track_id)
+                self.__index(self.__artist_id_track_ids, track.artist.artist_id, track.track_id)
+            if track.album is not None:
+                self.__index(self.__album_track_ids, normalize_name(track.album.title), track.track_id)
+                self.__index(self.__album_id_track_ids, track.album.album_id, track.track_id)
+            for genre in track.genres:
+                self.__index(self.__genre_track_ids, genre.genre_id, track.track_id)
 
     def add_album(self, album: Album):
-        if album != None:
-            self.__albums[album.album_id] = album
+        with self.__write_lock:
+            if album != None and album.album_id not in self.__albums_index:
+                albums = self.__writable(self.__albums)
+                albums.append(album)
+                albums_index = self.__writable(self.__albums_index)
+                albums_index[album.album_id] = album
+                self.__albums, self.__albums_index = albums, albums_index
+            if album != None:
+                # add_track() indexes a track under the album it already links to; stored tracks put on the album
+                # since then are indexed here.
+                for track_id in self.__stored_track_ids(album.tracks):
+                    self.__index(self.__album_track_ids, normalize_name(album.title), track_id)
+                    self.__index(self.__album_id_track_ids, album.album_id, track_id)
 
     def add_artist(self, artist: Artist):
-        if artist not in self.__artists and artist != None:
-            self.__artists.append(artist)
+        with self.__write_lock:
+            if artist != None and artist.artist_id not in self.__artists_index:
+                artists = self.__writable(self.__artists)
+                artists.append(artist)
+                artists_index = self.__writable(self.__artists_index)
+                artists_index[artist.artist_id] = artist
+                self.__artists, self.__artists_index = artists, artists_index
+            if artist != None:
+                # As in add_album(), for the stored tracks put on the artist after they were added.
+                for track_id in self.__stored_track_ids(artist.tracks):
+                    self.__index(self.__artist_track_ids, normalize_name(artist.full_name), track_id)
+                    self.__index(self.__artist_id_track_ids, artist.artist_id, track_id)
 
     def get_track(self, id: int) -> Track:
-        track = None
+        # None if there is no track with this id.
+        return self.__tracks.get(id)
 
-        try:
-            track = self.__tracks_index[id]
-        except KeyError:
-            pass  # Ignore exception and return None.
+    def get_tracks(self) -> Sequence[Track]:
+        return self.__tracks.tracks()
 
-        return track
+    def get_tracks_by_artist(self, target_artist: str) -> List[Track]:
+        # Return an empty list if there are no matches.
+        track_ids = self.__artist_track_ids.get(normalize_name(target_artist), ())
+        return self.__page(track_ids, 0, len(track_ids))
 
-    def get_tracks(self) -> List[Track]:
-        return self.__tracks
+    def get_tracks_by_album(self, target_album: str) -> List[Track]:
+        # Albums are keyed by album_id, so the tracks of every album with this title are returned.
+        track_ids = self.__album_track_ids.get(normalize_name(target_album), ())
+        return self.__page(track_ids, 0, len(track_ids))
 
-    def get_tracks_by_artist(self, target_artist: str) -> List[Track]:
-        
-        matching_tracks = list()
+    def get_track_ids_for_artist_id(self, artist_id: int) -> List[int]:
+        return list(self.__artist_id_track_ids.get(artist_id, ()))
 
-        try:
-            for track in self.__tracks:
-                
-                if track.artist.full_name == target_artist.replace("_"," "):
-                    matching_tracks.append(track)
-        except ValueError:
-            # No tracks for specified date. Simply return an empty list.
-            pass
+    def get_track_ids_for_album_id(self, album_id: int) -> List[int]:
+        return list(self.__album_id_track_ids.get(album_id, ()))
 
-        return matching_tracks
 
-    def get_tracks_by_album(self, target_album: Album) -> List[Track]:
-        
-        matching_tracks = list()
+    def get_number_of_tracks(self):
+        return len(self.__tracks)
 
-        try:
-            for track in self.__tracks:
-                if track.album != None and track.album.title == target_album.replace("_"," "):
-                    matching_tracks.append(track)
-        except ValueError:
-            # No tracks for specified date. Simply return an empty list.
-            pass
+    def get_tracks_page(self, offset: int, limit: int) -> List[Track]:
+        return list(self.__tracks.tracks()[offset:offset + limit])
 
-        return matching_tracks
+    def get_tracks_page_by_artist(self, target_artist: str, offset: int, limit: int) -> List[Track]:
+        return self.__page(self.__artist_track_ids.get(normalize_name(target_artist), ()), offset, limit)
 
+    def get_number_of_tracks_by_artist(self, target_artist: str) -> int:
+        return len(self.__artist_track_ids.get(normalize_name(target_artist), ()))
 
-    def get_number_of_tracks(self):
-        return len(self.__tracks)
+    def get_tracks_page_by_album(self, target_album: str, offset: int, limit: int) -> List[Track]:
+        return self.__page(self.__album_track_ids.get(normalize_name(target_album), ()), offset, limit)
+
+    def get_number_of_tracks_by_album(self, target_album: str) -> int:
+        return len(self.__album_track_ids.get(normalize_name(target_album), ()))
+
+    def get_tracks_page_by_genre(self, genre_name: str, offset: int, limit: int) -> List[Track]:
+        return self.__page(self.__genre_posting_list(genre_name), offset, limit)
+
+    def get_number_of_tracks_by_genre(self, genre_name: str) -> int:
+        return len(self.__genre_posting_list(genre_name))
+
+    def get_neighbor_track_ids(self, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return neighbor_ids(self.__tracks.track_ids(), track_id)
+
+    def get_neighbor_track_ids_by_artist(self, target_artist: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return neighbor_ids(self.__artist_track_ids.get(normalize_name(target_artist), ()), track_id)
+
+    def get_neighbor_track_ids_by_album(self, target_album: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return neighbor_ids(self.__album_track_ids.get(normalize_name(target_album), ()), track_id)
+
+    def get_neighbor_track_ids_by_genre(self, genre_name: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return neighbor_ids(self.__genre_posting_list(genre_name), track_id)
+
+    def has_track_by_artist(self, target_artist: str, track_id: int) -> bool:
+        return contains_id(self.__artist_track_ids.get(normalize_name(target_artist), ()), track_id)
+
+    def has_track_by_album(self, target_album: str, track_id: int) -> bool:
+        return contains_id(self.__album_track_ids.get(normalize_name(target_album), ()), track_id)
+
+    def has_track_by_genre(self, genre_name: str, track_id: int) -> bool:
+        return contains_id(self.__genre_posting_list(genre_name), track_id)
+
+    def __page(self, track_ids, offset: int, limit: int) -> List[Track]:
+        # The indexes hold track ids in track id order, so a page is a slice of them. The index was read before the
+        # store, and tracks are published before their index entries, so every id is found.
+        store = self.__tracks
+        return [store.get(track_id) for track_id in track_ids[offset:offset + limit]]
 
     def get_first_track(self):
         track = None
 
         if len(self.__tracks) > 0:
-            track = self.__tracks[0]
+            track = self.__tracks.tracks()[0]
         return track
 
     def get_last_track(self):
         track = None
 
         if len(self.__tracks) > 0:
-            track = self.__tracks[-1]
+            track = self.__tracks.tracks()[-1]
         return track
 
     def get_tracks_by_id(self, id_list):
         # Strip out any ids in id_list that don't represent track ids in the repository.
-        existing_ids = [id for id in id_list if id in self.__tracks_index]
+        store = self.__tracks
+        existing_ids = [id for id in id_list if id in store]
 
         # Fetch the tracks.
-        tracks = [self.__tracks_index[id] for id in existing_ids]
+        tracks = [store.get(id) for id in existing_ids]
         return tracks
 
     def get_track_ids_for_genre(self, genre_name: str):
-        # Linear search, to find the first occurrence of a Tag with the name tag_name.
-        genre = next((genre for genre in self.__genres if genre.name == genre_name), None)
-
-        # Retrieve the ids of tracks associated with the Tag.
-        if genre is not None:
-            track_ids = []
-            for track in self.__tracks:
-                if genre in track.genres:
-                    track_ids.append(track.track_id)
-        else:
-            # No Tag with name tag_name, so return an empty list.
-            track_ids = list()
+        # No genre with name genre_name, or no tracks tagged with it, gives an empty list.
+        return list(self.__genre_posting_list(genre_name))
 
-        return track_ids
+    def get_track_ids_for_genres(self, genre_names: Iterable[str], match_all: bool = True) -> List[int]:
+        posting_lists = [self.__genre_posting_list(genre_name) for genre_name in genre_names]
+        if len(posting_lists) == 0:
+            return []
+        return intersect_sorted(*posting_lists) if match_all else union_sorted(*posting_lists)
 
     def add_genre(self, genre: Genre):
-        if genre not in self.__genres and genre != None:
-            self.__genres.append(genre)
+        with self.__write_lock:
+            if genre != None and genre.genre_id not in self.__genres_index:
+                genres = self.__writable(self.__genres)
+                genres.append(genre)
+                genres_index = self.__writable(self.__genres_index)
+                genres_index[genre.genre_id] = genre
+                genres_by_name = self.__writable(self.__genres_by_name)
+                # The first genre added with a name is the one found by that name.
+                genres_by_name.setdefault(genre.name, genre)
+                self.__genres, self.__genres_index, self.__genres_by_name = genres, genres_index, genres_by_name
+
+    def add_track_genre(self, track_id: int, genre: Genre):
+        with self.__write_lock:
+            if track_id not in self.__tracks:
+                raise RepositoryException(f'There is no track with id {track_id}')
+            self.add_genre(genre)
+            # A columnar store shifts the genre links of every later row, so with copy-on-write the genre is added
+            # in a copy of the store.
+            tracks = self.__writable(self.__tracks)
+            tracks.get(track_id).add_genre(genre)
+            self.__tracks = tracks
+            self.__index(self.__genre_track_ids, genre.genre_id, track_id)
 
     def get_genres(self) -> List[Genre]:
         return self.__genres
 
+    def get_genre(self, genre_id: int) -> Genre:
+        return self.__genres_index.get(genre_id)
+
     def get_artists(self) -> List[Artist]:
         return self.__artists
 
-    def get_albums(self):
+    def get_artist(self, artist_id: int) -> Artist:
+        return self.__artists_index.get(artist_id)
+
+    def get_albums(self) -> List[Album]:
         return self.__albums
 
     def add_review(self, review: Review):
         # call parent class first, add_review relies on implementation of code common to all derived classes
         super().add_review(review)
-        self.__reviews.append(review)
+        with self.__write_lock:
+            review_key = (review.track.track_id, review.user.user_name)
+            if review_key in self.__review_keys:
+                # Adding a review again must not count its rating twice.
+                return
+            self.__review_keys.add(review_key)
+            self.__reviews.append(review)
+            # The rating aggregates are two counters on the track rather than a published structure; a reader
+            # racing this update can see the new count with the old sum for an instant.
+            review.track.add_rating(review.rating)
+            self.__review_count = len(self.__reviews)
+            if self.__write_ahead_log is not None:
+                self.__write_ahead_log.log_review(review)
 
     def get_reviews(self):
-        return self.__reviews
+        review_count = self.__review_count
+        return self.__reviews[:review_count]
+
+    def rebuild_rating_aggregates(self) -> int:
+        with self.__write_lock:
+            for track in self.__tracks.tracks():
+                track.clear_ratings()
+            for review in self.__reviews:
+                review.track.add_rating(review.rating)
+            return len(self.__reviews)
+
+    @contextmanager
+    def bulk_loading(self):
+        # Bulk loads (populate, snapshots) fill the repository before it is shared with other threads, so writers
+        # change the structures in place rather than copying them for every track.
+        with self.__write_lock:
+            self.__bulk_loading = True
+            try:
+                yield self
+            finally:
+                self.__bulk_loading = False
+
+    def attach_write_ahead_log(self, write_ahead_log: WriteAheadLog):
+        """ Logs every user and review added from now on to write_ahead_log; replay it into the repository first. """
+        self.__write_ahead_log = write_ahead_log
+
+    def save_snapshot(self, snapshot_path, data_path=None):
+        # Persist the populated catalog so that later start-ups can skip parsing the CSV files.
+        save_snapshot(self, snapshot_path, data_path)
+
+    @classmethod
+    def from_snapshot(cls, snapshot_path, data_path=None, storage: str = 'objects',
+                      concurrency: str = 'none') -> 'MemoryRepository':
+        repo = cls(storage, concurrency)
+        load_snapshot(snapshot_path, repo, data_path)
+        return repo
+
+    def __genre_posting_list(self, genre_name: str):
+        genre = self.__genres_by_name.get(genre_name)
+        if genre is None:
+            return ()
+        return self.__genre_track_ids.get(genre.genre_id, ())
+
+    def __stored_track_ids(self, tracks: Iterable[Track]) -> List[int]:
+        # The index entries must lead to stored tracks, so tracks not added to the repository are left out.
+        store = self.__tracks
+        return [track.track_id for track in tracks if track.track_id in store]
+
+    def __writable(self, structure):
+        # The structure itself where writers may change it in place, otherwise a copy to publish once changed.
+        return copy(structure) if self.__copy_on_write and not self.__bulk_loading else structure
+
+    def __index(self, index: Dict, key, track_id: int):
+        # Adds track_id under key. Readers only get() id arrays from the index, so a new array goes straight into
+        # it, and an id past the end of an array is appended to it in place. An id that belongs before the end of
+        # an array readers can reach is inserted into a copy of the array, which then replaces it.
+        track_ids = index.get(key)
+        # As with the tracks themselves, ids usually arrive in increasing order.
+        if track_ids is None:
+            index[key] = array('q', [track_id])
+        elif track_ids[-1] < track_id:
+            track_ids.append(track_id)
+        else:
+            position = bisect_left(track_ids, track_id)
+            if track_ids[position] != track_id:
+                track_ids = self.__writable(track_ids)
+                track_ids.insert(position, track_id)
+                index[key] = track_ids
 
     # Helper method to return track index.
     def track_index(self, track: Track):
-        index = bisect_left(self.__tracks, track)
-        if index != len(self.__tracks) and self.__tracks[index].track_id == track.track_id:
-            return index
-        raise ValueError
\ No newline at end of file
+        return self.__tracks.position(track.track_id)
+
+
+def normalize_name(name: str) -> str:
+    # Artist names and album titles appear in urls with spaces replaced by underscores.
+    return name.replace("_", " ")
+
+
+def normalize_user_name(user_name: str) -> str:
+    # User stores its name lower-cased and stripped, so lookups are normalized the same way.
+    return user_name.lower().strip() if type(user_name) is str else None
@@ -1,5 +1,6 @@
 import abc
-from typing import List
+from contextlib import nullcontext
+from typing import Iterable, List, Optional, Tuple
 from datetime import date
 
 from music.domainmodel.user import User
@@ -8,6 +9,7 @@ from music.domainmodel.album import Album
 from music.domainmodel.genre import Genre
 from music.domainmodel.review import Review
 from music.domainmodel.artist import Artist
+from music.adapters.sorted_ids import intersect_sorted, union_sorted
 
 
 repo_instance = None
@@ -81,6 +83,85 @@ class AbstractRepository(abc.ABC):
         """ Returns the number of Articles in the repository. """
         raise NotImplementedError
 
+    # Paged access: each listing is in track id order, and a page holds the up to limit Tracks starting at position
+    # offset of the listing. Only the Tracks of the page are loaded.
+
+    @abc.abstractmethod
+    def get_tracks_page(self, offset: int, limit: int) -> List[Track]:
+        """ Returns a page of all the Tracks in the repository. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_tracks_page_by_artist(self, target_artist: str, offset: int, limit: int) -> List[Track]:
+        """ Returns a page of the Tracks that get_tracks_by_artist(target_artist) returns. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_number_of_tracks_by_artist(self, target_artist: str) -> int:
+        """ Returns the number of Tracks that get_tracks_by_artist(target_artist) returns. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_tracks_page_by_album(self, target_album: str, offset: int, limit: int) -> List[Track]:
+        """ Returns a page of the Tracks that get_tracks_by_album(target_album) returns. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_number_of_tracks_by_album(self, target_album: str) -> int:
+        """ Returns the number of Tracks that get_tracks_by_album(target_album) returns. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_tracks_page_by_genre(self, genre_name: str, offset: int, limit: int) -> List[Track]:
+        """ Returns a page of the Tracks whose ids get_track_ids_for_genre(genre_name) returns. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_number_of_tracks_by_genre(self, genre_name: str) -> int:
+        """ Returns the number of Tracks tagged with the genre named genre_name. """
+        raise NotImplementedError
+
+    # Neighbor navigation: the ids of the Tracks just before and just after track_id in a listing, in track id
+    # order, as a (previous_id, next_id) pair with None past either end. track_id need not be in the listing.
+
+    @abc.abstractmethod
+    def get_neighbor_track_ids(self, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        """ Returns the neighbors of track_id among all the Tracks in the repository. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_neighbor_track_ids_by_artist(self, target_artist: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        """ Returns the neighbors of track_id among the Tracks that get_tracks_by_artist(target_artist) returns. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_neighbor_track_ids_by_album(self, target_album: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        """ Returns the neighbors of track_id among the Tracks that get_tracks_by_album(target_album) returns. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_neighbor_track_ids_by_genre(self, genre_name: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        """ Returns the neighbors of track_id among the Tracks tagged with the genre named genre_name. """
+        raise NotImplementedError
+
+    # Membership of a listing, so that a track_id cursor taken from a url can be checked against the listing it is
+    # used with.
+
+    @abc.abstractmethod
+    def has_track_by_artist(self, target_artist: str, track_id: int) -> bool:
+        """ Returns whether get_tracks_by_artist(target_artist) returns the Track with track_id. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def has_track_by_album(self, target_album: str, track_id: int) -> bool:
+        """ Returns whether get_tracks_by_album(target_album) returns the Track with track_id. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def has_track_by_genre(self, genre_name: str, track_id: int) -> bool:
+        """ Returns whether the Track with track_id is tagged with the genre named genre_name. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_first_track(self) -> Track:
         """ Returns the first Article, ordered by date, from the repository.
@@ -109,21 +190,52 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    def get_track_ids_for_genres(self, genre_names: Iterable[str], match_all: bool = True) -> List[int]:
+        """ Returns the ids of the Tracks tagged with every genre in genre_names, or with any of them if match_all
+        is False, in track id order.
+        """
+        id_lists = [self.get_track_ids_for_genre(genre_name) for genre_name in genre_names]
+        if len(id_lists) == 0:
+            return []
+        return intersect_sorted(*id_lists) if match_all else union_sorted(*id_lists)
+
     @abc.abstractmethod
     def add_genre(self, genre: Genre):
         """ Adds a Tag to the repository. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def add_track_genre(self, track_id: int, genre: Genre):
+        """ Tags the stored Track with track_id with genre, adding genre to the repository if it is not in it yet.
+        Tracks gain genres through this method, so that the listings by genre include them. If there is no Track
+        with track_id, this method raises a RepositoryException.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_genres(self) -> List[Genre]:
         """ Returns the Tags stored in the repository. """
         raise NotImplementedError
     
+    @abc.abstractmethod
+    def get_genre(self, genre_id: int) -> Genre:
+        """ Returns the Genre with genre_id from the repository.
+        If there is no Genre with the given id, this method returns None.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_artists(self) -> List[Artist]:
         """ Returns the Tags stored in the repository. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_artist(self, artist_id: int) -> Artist:
+        """ Returns the Artist with artist_id from the repository.
+        If there is no Artist with the given id, this method returns None.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_albums(self):
         """ Returns the Tags stored in the repository. """
@@ -134,6 +246,7 @@ class AbstractRepository(abc.ABC):
         """ Adds a Comment to the repository.
         If the Comment doesn't have bidirectional links with an Article and a User, this method raises a
         RepositoryException and doesn't update the repository.
+        Implementations also add the review's rating to the rating_count and rating_sum of its track.
         """
         if review.user is None or review not in review.user.reviews:
             raise RepositoryException('Review not correctly attached to a User')
@@ -143,4 +256,37 @@ class AbstractRepository(abc.ABC):
     @abc.abstractmethod
     def get_reviews(self):
         """ Returns the Comments stored in the repository. """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def rebuild_rating_aggregates(self) -> int:
+        """ Recomputes the rating_count and rating_sum of every track from the stored reviews, and returns the
+        number of reviews counted.
+        """
+        raise NotImplementedError
+
+    def bulk_loading(self):
+        """ Returns a context manager that wraps a bulk load of the catalog, e.g. during populate().
+        Repositories that can batch their writes override this; by default it does nothing.
+        """
+        return nullcontext(self)
+
+    def bulk_add_tracks(self, tracks: Iterable[Track]):
+        """ Adds a batch of Tracks, including their links to Genres, to the repository. """
+        for track in tracks:
+            self.add_track(track)
+
+    def bulk_add_artists(self, artists: Iterable[Artist]):
+        """ Adds a batch of Artists to the repository. """
+        for artist in artists:
+            self.add_artist(artist)
+
+    def bulk_add_albums(self, albums: Iterable[Album]):
+        """ Adds a batch of Albums to the repository. """
+        for album in albums:
+            self.add_album(album)
+
+    def bulk_add_genres(self, genres: Iterable[Genre]):
+        """ Adds a batch of Genres to the repository. """
+        for genre in genres:
+            self.add_genre(genre)
\ No newline at end of file
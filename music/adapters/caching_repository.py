@@ -0,0 +1,354 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from music.adapters.MemoryRepository import normalize_name
+from music.adapters.Repository import AbstractRepository
+from music.domainmodel.album import Album
+from music.domainmodel.artist import Artist
+from music.domainmodel.genre import Genre
+from music.domainmodel.review import Review
+from music.domainmodel.track import Track
+from music.domainmodel.user import User
+
+# Seconds a result stays cached, per read method; methods left out are not cached. Writes made through the
+# CachingRepository invalidate the results they change right away, so the TTLs only bound how long writes made
+# elsewhere (another process, `flask ingest`) go unseen.
+#
+# get_track and get_user are left out: callers modify the Track and User they return when adding a review, which
+# must happen on the repository's own objects. get_tracks and get_reviews return whole tables.
+CACHE_TTLS = {
+    'get_genres': 300.0,
+    'get_genre': 300.0,
+    'get_artists': 300.0,
+    'get_artist': 300.0,
+    'get_albums': 300.0,
+    'get_tracks_by_artist': 60.0,
+    'get_tracks_by_album': 60.0,
+    'get_tracks_by_id': 60.0,
+    'get_first_track': 60.0,
+    'get_last_track': 60.0,
+    'get_number_of_tracks': 60.0,
+    'get_number_of_tracks_by_artist': 60.0,
+    'get_number_of_tracks_by_album': 60.0,
+    'get_number_of_tracks_by_genre': 60.0,
+    'get_tracks_page': 60.0,
+    'get_tracks_page_by_artist': 60.0,
+    'get_tracks_page_by_album': 60.0,
+    'get_tracks_page_by_genre': 60.0,
+    'get_neighbor_track_ids': 60.0,
+    'get_neighbor_track_ids_by_artist': 60.0,
+    'get_neighbor_track_ids_by_album': 60.0,
+    'get_neighbor_track_ids_by_genre': 60.0,
+    'has_track_by_artist': 60.0,
+    'has_track_by_album': 60.0,
+    'has_track_by_genre': 60.0,
+    'get_track_ids_for_genre': 60.0,
+    'get_track_ids_for_genres': 60.0,
+}
+
+# Cached results are tagged with what they depend on, and a write invalidates the results carrying its tags:
+# ALL_TRACKS for the listing of all tracks, ('artist', name), ('album', title) and ('genre', name) for the filtered
+# listings, ('track', track_id) for every Track a result holds, and the catalog lists.
+ALL_TRACKS = ('all_tracks',)
+GENRES = ('genres',)
+ARTISTS = ('artists',)
+ALBUMS = ('albums',)
+
+
+class CachingRepository(AbstractRepository):
+    """ Wraps any AbstractRepository in a bounded LRU cache of the results of its read methods.
+
+    A result is cached per method and arguments for the method's TTL in ttls, and at most max_entries results are
+    kept, the least recently used being evicted first. Every write goes to the wrapped repository and then
+    invalidates exactly the cached results it changes. Cached results are shared between callers, which must not
+    modify them. Methods outside AbstractRepository are passed through to the wrapped repository.
+    """
+
+    def __init__(self, repository: AbstractRepository, max_entries: int = 1024, ttls: Dict[str, float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.__repository = repository
+        self.__max_entries = max_entries
+        self.__ttls = CACHE_TTLS if ttls is None else ttls
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        # key -> (expiry time, result, tags), least recently used first.
+        self.__entries: OrderedDict = OrderedDict()
+        self.__keys_by_tag: Dict[Hashable, Set[Tuple]] = {}
+        # Incremented by every invalidation, so that a result read before a write is not cached after it.
+        self.__version = 0
+        self.__stats = dict.fromkeys(('hits', 'misses', 'evictions', 'expirations', 'invalidations'), 0)
+
+    @property
+    def repository(self) -> AbstractRepository:
+        return self.__repository
+
+    def __getattr__(self, name):
+        if name.startswith('_CachingRepository__'):
+            raise AttributeError(name)
+        return getattr(self.__repository, name)
+
+    def stats(self) -> dict:
+        """ Returns the hit, miss, eviction, expiration and invalidation counts and the number of cached results. """
+        with self.__lock:
+            return {**self.__stats, 'entries': len(self.__entries), 'max_entries': self.__max_entries}
+
+    def clear(self):
+        """ Drops every cached result. """
+        with self.__lock:
+            self.__version += 1
+            self.__stats['invalidations'] += len(self.__entries)
+            self.__entries.clear()
+            self.__keys_by_tag.clear()
+
+    # Writes.
+
+    def add_user(self, user: User):
+        # No cached result depends on the users.
+        self.__repository.add_user(user)
+
+    def add_track(self, track: Track):
+        self.__repository.add_track(track)
+        self.__invalidate(*_track_listing_tags(track))
+
+    def add_album(self, album: Album):
+        self.__repository.add_album(album)
+        self.__invalidate(ALBUMS)
+
+    def add_artist(self, artist: Artist):
+        self.__repository.add_artist(artist)
+        self.__invalidate(ARTISTS)
+
+    def add_genre(self, genre: Genre):
+        self.__repository.add_genre(genre)
+        self.__invalidate(GENRES)
+
+    def add_track_genre(self, track_id: int, genre: Genre):
+        # The track joins the listing of the genre, and the genre may be new.
+        self.__repository.add_track_genre(track_id, genre)
+        self.__invalidate(('genre', genre.name), ('track', track_id), GENRES)
+
+    def add_review(self, review: Review):
+        # The review changes the rating aggregates of its track, and so the results that hold the track.
+        self.__repository.add_review(review)
+        self.__invalidate(('track', review.track.track_id))
+
+    def rebuild_rating_aggregates(self) -> int:
+        try:
+            return self.__repository.rebuild_rating_aggregates()
+        finally:
+            self.clear()
+
+    @contextmanager
+    def bulk_loading(self):
+        try:
+            with self.__repository.bulk_loading():
+                yield self
+        finally:
+            self.clear()
+
+    def bulk_add_tracks(self, tracks: Iterable[Track]):
+        try:
+            self.__repository.bulk_add_tracks(tracks)
+        finally:
+            self.clear()
+
+    def bulk_add_artists(self, artists: Iterable[Artist]):
+        self.__repository.bulk_add_artists(artists)
+        self.__invalidate(ARTISTS)
+
+    def bulk_add_albums(self, albums: Iterable[Album]):
+        self.__repository.bulk_add_albums(albums)
+        self.__invalidate(ALBUMS)
+
+    def bulk_add_genres(self, genres: Iterable[Genre]):
+        self.__repository.bulk_add_genres(genres)
+        self.__invalidate(GENRES)
+
+    def clear_catalog(self):
+        try:
+            self.__repository.clear_catalog()
+        finally:
+            self.clear()
+
+    # Reads that are passed through.
+
+    def get_user(self, user_name) -> User:
+        return self.__repository.get_user(user_name)
+
+    def get_track(self, id: int) -> Track:
+        return self.__repository.get_track(id)
+
+    def get_tracks(self) -> List[Track]:
+        return self.__repository.get_tracks()
+
+    def get_reviews(self):
+        return self.__repository.get_reviews()
+
+    # Cached reads.
+
+    def get_genres(self) -> List[Genre]:
+        return self.__cached('get_genres', (), [GENRES])
+
+    def get_genre(self, genre_id: int) -> Genre:
+        return self.__cached('get_genre', (genre_id,), [GENRES])
+
+    def get_artists(self) -> List[Artist]:
+        return self.__cached('get_artists', (), [ARTISTS])
+
+    def get_artist(self, artist_id: int) -> Artist:
+        return self.__cached('get_artist', (artist_id,), [ARTISTS])
+
+    def get_albums(self):
+        return self.__cached('get_albums', (), [ALBUMS])
+
+    def get_tracks_by_artist(self, target_artist: str) -> List[Track]:
+        return self.__cached('get_tracks_by_artist', (target_artist,), [_artist_tag(target_artist)])
+
+    def get_tracks_by_album(self, target_album: str) -> List[Track]:
+        return self.__cached('get_tracks_by_album', (target_album,), [_album_tag(target_album)])
+
+    def get_tracks_by_id(self, id_list):
+        id_list = tuple(id_list)
+        # A track that does not exist yet is found once it is added.
+        return self.__cached('get_tracks_by_id', (id_list,), [('track', track_id) for track_id in id_list])
+
+    def get_first_track(self) -> Track:
+        return self.__cached('get_first_track', (), [ALL_TRACKS])
+
+    def get_last_track(self) -> Track:
+        return self.__cached('get_last_track', (), [ALL_TRACKS])
+
+    def get_number_of_tracks(self) -> int:
+        return self.__cached('get_number_of_tracks', (), [ALL_TRACKS])
+
+    def get_tracks_page(self, offset: int, limit: int) -> List[Track]:
+        return self.__cached('get_tracks_page', (offset, limit), [ALL_TRACKS])
+
+    def get_tracks_page_by_artist(self, target_artist: str, offset: int, limit: int) -> List[Track]:
+        return self.__cached('get_tracks_page_by_artist', (target_artist, offset, limit), [_artist_tag(target_artist)])
+
+    def get_number_of_tracks_by_artist(self, target_artist: str) -> int:
+        return self.__cached('get_number_of_tracks_by_artist', (target_artist,), [_artist_tag(target_artist)])
+
+    def get_tracks_page_by_album(self, target_album: str, offset: int, limit: int) -> List[Track]:
+        return self.__cached('get_tracks_page_by_album', (target_album, offset, limit), [_album_tag(target_album)])
+
+    def get_number_of_tracks_by_album(self, target_album: str) -> int:
+        return self.__cached('get_number_of_tracks_by_album', (target_album,), [_album_tag(target_album)])
+
+    def get_tracks_page_by_genre(self, genre_name: str, offset: int, limit: int) -> List[Track]:
+        return self.__cached('get_tracks_page_by_genre', (genre_name, offset, limit), [('genre', genre_name)])
+
+    def get_number_of_tracks_by_genre(self, genre_name: str) -> int:
+        return self.__cached('get_number_of_tracks_by_genre', (genre_name,), [('genre', genre_name)])
+
+    def get_neighbor_track_ids(self, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return self.__cached('get_neighbor_track_ids', (track_id,), [ALL_TRACKS])
+
+    def get_neighbor_track_ids_by_artist(self, target_artist: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return self.__cached('get_neighbor_track_ids_by_artist', (target_artist, track_id),
+                             [_artist_tag(target_artist)])
+
+    def get_neighbor_track_ids_by_album(self, target_album: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return self.__cached('get_neighbor_track_ids_by_album', (target_album, track_id), [_album_tag(target_album)])
+
+    def get_neighbor_track_ids_by_genre(self, genre_name: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return self.__cached('get_neighbor_track_ids_by_genre', (genre_name, track_id), [('genre', genre_name)])
+
+    def has_track_by_artist(self, target_artist: str, track_id: int) -> bool:
+        return self.__cached('has_track_by_artist', (target_artist, track_id), [_artist_tag(target_artist)])
+
+    def has_track_by_album(self, target_album: str, track_id: int) -> bool:
+        return self.__cached('has_track_by_album', (target_album, track_id), [_album_tag(target_album)])
+
+    def has_track_by_genre(self, genre_name: str, track_id: int) -> bool:
+        return self.__cached('has_track_by_genre', (genre_name, track_id), [('genre', genre_name)])
+
+    def get_track_ids_for_genre(self, genre_name: str):
+        return self.__cached('get_track_ids_for_genre', (genre_name,), [('genre', genre_name)])
+
+    def get_track_ids_for_genres(self, genre_names: Iterable[str], match_all: bool = True) -> List[int]:
+        genre_names = tuple(genre_names)
+        return self.__cached('get_track_ids_for_genres', (genre_names, match_all),
+                             [('genre', genre_name) for genre_name in genre_names])
+
+    def __cached(self, method: str, args: Tuple, tags: List[Hashable]):
+        ttl = self.__ttls.get(method)
+        if ttl is None:
+            return getattr(self.__repository, method)(*args)
+        key = (method, *args)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                expires_at, result, _ = entry
+                if expires_at > self.__clock():
+                    self.__entries.move_to_end(key)
+                    self.__stats['hits'] += 1
+                    return result
+                self.__remove(key)
+                self.__stats['expirations'] += 1
+            self.__stats['misses'] += 1
+            version = self.__version
+
+        result = getattr(self.__repository, method)(*args)
+
+        # Results holding Tracks also depend on the rating aggregates of each of them.
+        tags = set(tags)
+        if isinstance(result, list):
+            tags.update(('track', track.track_id) for track in result if hasattr(track, 'track_id'))
+        elif hasattr(result, 'track_id'):
+            tags.add(('track', result.track_id))
+        with self.__lock:
+            if version == self.__version and key not in self.__entries:
+                self.__entries[key] = (self.__clock() + ttl, result, tags)
+                for tag in tags:
+                    self.__keys_by_tag.setdefault(tag, set()).add(key)
+                while len(self.__entries) > self.__max_entries:
+                    self.__remove(next(iter(self.__entries)))
+                    self.__stats['evictions'] += 1
+        return result
+
+    def __invalidate(self, *tags: Hashable):
+        with self.__lock:
+            self.__version += 1
+            for tag in tags:
+                for key in list(self.__keys_by_tag.get(tag, ())):
+                    self.__remove(key)
+                    self.__stats['invalidations'] += 1
+
+    def __remove(self, key: Tuple):
+        _, _, tags = self.__entries.pop(key)
+        for tag in tags:
+            keys = self.__keys_by_tag[tag]
+            keys.discard(key)
+            if not keys:
+                del self.__keys_by_tag[tag]
+
+
+def unwrap(repository: AbstractRepository) -> AbstractRepository:
+    """ Returns the repository behind any CachingRepository wrappers of repository. """
+    while isinstance(repository, CachingRepository):
+        repository = repository.repository
+    return repository
+
+
+def _artist_tag(target_artist: str):
+    return ALL_TRACKS if target_artist is None else ('artist', normalize_name(target_artist))
+
+
+def _album_tag(target_album: str):
+    return ALL_TRACKS if target_album is None else ('album', normalize_name(target_album))
+
+
+def _track_listing_tags(track: Track):
+    # The listings a new track joins.
+    tags = [ALL_TRACKS, ('track', track.track_id)]
+    if track.artist is not None:
+        tags.append(_artist_tag(track.artist.full_name))
+    if track.album is not None:
+        tags.append(_album_tag(track.album.title))
+    tags.extend(('genre', genre.name) for genre in track.genres)
+    return tags
@@ -0,0 +1,212 @@
+import hashlib
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, select
+
+from music.adapters.csv_reader import (
+    TrackRecord, read_album_index, read_track_records, resolve_artist, resolve_album, resolve_genre
+)
+from music.adapters.database_repository import rating_aggregates_update
+from music.adapters.orm import (
+    artists_table, albums_table, genres_table, tracks_table, track_genres_table, track_hashes_table
+)
+from music.domainmodel.artist import Artist
+from music.domainmodel.album import Album
+from music.domainmodel.genre import Genre
+from music.utilities.services import get_random_video
+
+# Number of added or changed tracks written per transaction.
+SYNC_BATCH_SIZE = 1000
+
+
+class SyncReport:
+
+    def __init__(self):
+        self.added = 0
+        self.changed = 0
+        self.removed = 0
+        self.unchanged = 0
+        self.batches = 0
+        # Wall time in seconds spent reading and hashing the csv files, and writing to the database.
+        self.read_seconds = 0.0
+        self.write_seconds = 0.0
+        self.total_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'added': self.added,
+            'changed': self.changed,
+            'removed': self.removed,
+            'unchanged': self.unchanged,
+            'batches': self.batches,
+            'read_seconds': round(self.read_seconds, 3),
+            'write_seconds': round(self.write_seconds, 3),
+            'total_seconds': round(self.total_seconds, 3),
+        }
+
+    def __repr__(self):
+        return (f'<SyncReport added = {self.added}, changed = {self.changed}, removed = {self.removed}, '
+                f'unchanged = {self.unchanged}, {self.total_seconds:.2f}s>')
+
+
+class _ResolvedTrack:
+    # A track row with its artist, album and genres resolved by the same rules as populate().
+
+    def __init__(self, record: TrackRecord, artist: Optional[Artist], album: Optional[Album], genres: List[Genre]):
+        self.record = record
+        self.artist = artist
+        self.album = album
+        self.genres = genres
+        self.content_hash = hashlib.blake2b(repr((
+            record.track_id, record.title, record.track_url, record.track_duration,
+            (artist.artist_id, artist.full_name) if artist is not None else None,
+            (album.album_id, album.title, album.album_url, album.album_type, album.release_year)
+            if album is not None else None,
+            [(genre.genre_id, genre.name) for genre in genres],
+        )).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def sync_catalog(data_path: Path, database_engine, workers: int = 1, batch_size: int = SYNC_BATCH_SIZE) -> SyncReport:
+    """ Brings the catalog tables in line with the csv files in data_path, touching only the tracks whose content
+    hash has changed since the last sync. The users and reviews tables are never modified.
+    """
+    report = SyncReport()
+    start = time.perf_counter()
+
+    with database_engine.connect() as connection:
+        stored_hashes: Dict[int, str] = dict(connection.execute(
+            select(track_hashes_table.c.track_id, track_hashes_table.c.content_hash)
+        ).fetchall())
+        existing_ids = set(row[0] for row in connection.execute(select(tracks_table.c.track_id)))
+
+    artists, albums, genres = {}, {}, {}
+    album_index = read_album_index(data_path)
+    seen_ids = set()
+    added: List[_ResolvedTrack] = []
+    changed: List[_ResolvedTrack] = []
+
+    read_start = time.perf_counter()
+    for record in read_track_records(data_path, workers):
+        seen_ids.add(record.track_id)
+        track_genres = []
+        for genre_id, genre_title in record.genres:
+            genre = resolve_genre(genre_id, genre_title, genres)
+            if genre is not None and genre not in track_genres:
+                track_genres.append(genre)
+        artist = resolve_artist(record, artists)
+        album = resolve_album(record, albums, album_index=album_index)
+        track = _ResolvedTrack(record, artist, album, track_genres)
+
+        if record.track_id not in existing_ids:
+            added.append(track)
+        elif stored_hashes.get(record.track_id) != track.content_hash:
+            # Tracks without a stored hash (e.g. loaded by a full populate) are rewritten once.
+            changed.append(track)
+        else:
+            report.unchanged += 1
+
+        if len(added) + len(changed) >= batch_size:
+            report.read_seconds += time.perf_counter() - read_start
+            _write_batch(database_engine, added, changed, report)
+            read_start = time.perf_counter()
+    report.read_seconds += time.perf_counter() - read_start
+    _write_batch(database_engine, added, changed, report)
+
+    removed_ids = sorted(existing_ids - seen_ids)
+    for i in range(0, len(removed_ids), batch_size):
+        _remove_batch(database_engine, removed_ids[i:i + batch_size], report)
+
+    report.total_seconds = time.perf_counter() - start
+    return report
+
+
+def _write_batch(database_engine, added: List[_ResolvedTrack], changed: List[_ResolvedTrack], report: SyncReport):
+    if len(added) == 0 and len(changed) == 0:
+        return
+    write_start = time.perf_counter()
+    tracks = added + changed
+    artists = {track.artist.artist_id: track.artist for track in tracks if track.artist is not None}
+    albums = {track.album.album_id: track.album for track in tracks if track.album is not None}
+    genres = {genre.genre_id: genre for track in tracks for genre in track.genres}
+
+    with database_engine.begin() as connection:
+        # Referenced artists, albums and genres are upserted so that renamed entities are picked up as well.
+        _upsert(connection, artists_table, [
+            {'artist_id': artist.artist_id, 'full_name': artist.full_name} for artist in artists.values()
+        ])
+        _upsert(connection, albums_table, [
+            {'album_id': album.album_id, 'title': album.title, 'album_url': album.album_url,
+             'album_type': album.album_type, 'release_year': album.release_year} for album in albums.values()
+        ])
+        _upsert(connection, genres_table, [
+            {'genre_id': genre.genre_id, 'name': genre.name} for genre in genres.values()
+        ])
+
+        if len(added) > 0:
+            connection.execute(tracks_table.insert(), [
+                dict(_track_columns(track), track_id=track.record.track_id, video_hyperlink=get_random_video())
+                for track in added
+            ])
+            # A track removed and added again still has its reviews.
+            connection.execute(rating_aggregates_update(track.record.track_id for track in added))
+        if len(changed) > 0:
+            # Changed tracks are updated in place so they keep their video link.
+            connection.execute(
+                tracks_table.update().where(tracks_table.c.track_id == bindparam('changed_track_id')),
+                [dict(_track_columns(track), changed_track_id=track.record.track_id) for track in changed]
+            )
+            connection.execute(track_genres_table.delete().where(
+                track_genres_table.c.track_id.in_([track.record.track_id for track in changed])
+            ))
+
+        track_genre_rows = [
+            {'track_id': track.record.track_id, 'genre_id': genre.genre_id} for track in tracks for genre in track.genres
+        ]
+        if len(track_genre_rows) > 0:
+            connection.execute(track_genres_table.insert(), track_genre_rows)
+        _upsert(connection, track_hashes_table, [
+            {'track_id': track.record.track_id, 'content_hash': track.content_hash} for track in tracks
+        ])
+
+    report.added += len(added)
+    report.changed += len(changed)
+    report.batches += 1
+    report.write_seconds += time.perf_counter() - write_start
+    added.clear()
+    changed.clear()
+
+
+def _remove_batch(database_engine, track_ids: List[int], report: SyncReport):
+    write_start = time.perf_counter()
+    with database_engine.begin() as connection:
+        connection.execute(track_genres_table.delete().where(track_genres_table.c.track_id.in_(track_ids)))
+        connection.execute(track_hashes_table.delete().where(track_hashes_table.c.track_id.in_(track_ids)))
+        connection.execute(tracks_table.delete().where(tracks_table.c.track_id.in_(track_ids)))
+        # Artists, albums and genres are only ever added for a track, so they go with the last track using them.
+        connection.execute(artists_table.delete().where(artists_table.c.artist_id.notin_(
+            select(tracks_table.c.artist_id).where(tracks_table.c.artist_id.isnot(None))
+        )))
+        connection.execute(albums_table.delete().where(albums_table.c.album_id.notin_(
+            select(tracks_table.c.album_id).where(tracks_table.c.album_id.isnot(None))
+        )))
+        connection.execute(genres_table.delete().where(genres_table.c.genre_id.notin_(
+            select(track_genres_table.c.genre_id).where(track_genres_table.c.genre_id.isnot(None))
+        )))
+    report.removed += len(track_ids)
+    report.batches += 1
+    report.write_seconds += time.perf_counter() - write_start
+
+
+def _track_columns(track: _ResolvedTrack) -> dict:
+    return {
+        'title': track.record.title.strip(),
+        'artist_id': track.artist.artist_id if track.artist is not None else None,
+        'album_id': track.album.album_id if track.album is not None else None,
+    }
+
+
+def _upsert(connection, table, rows: List[dict]):
+    if len(rows) > 0:
+        connection.execute(table.insert().prefix_with('OR REPLACE'), rows)
@@ -2,7 +2,17 @@ import csv
 from pathlib import Path
 import os
 import ast
+import io
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 from music.adapters.Repository import AbstractRepository
+from music.adapters.ingest_stats import IngestStats
 from music.domainmodel.user import User
 from music.domainmodel.review import Review
 from music.domainmodel.artist import Artist
@@ -11,112 +21,412 @@ from music.domainmodel.track import Track
 from music.domainmodel.genre import Genre
 from music.utilities.services import get_random_video
 
+# Number of tracks handed to the repository's bulk_add_* methods at a time.
+BULK_BATCH_SIZE = 5000
 
-def create_track_object(track_row):
-    track = Track(int(track_row['track_id']), track_row['track_title'])
-    track.track_url = track_row['track_url']
-    track_duration = round(float(
-        track_row['track_duration'])) if track_row['track_duration'] is not None else None
-    if type(track_duration) is int:
-        track.track_duration = track_duration
+# Number of distinct raw track_genres strings whose parsed form is kept by parse_genres_field().
+GENRE_CACHE_SIZE = 4096
+
+# Approximate size of the byte ranges parsed by each worker when populate() runs with several workers.
+PARALLEL_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+# Columns of the tracks and albums files that the ingest reads; every other column is skipped.
+TRACK_COLUMNS = ('track_id', 'track_title', 'track_url', 'track_duration', 'artist_id', 'artist_name', 'album_id',
+                 'album_title', 'track_genres')
+ALBUM_COLUMNS = ('album_id', 'album_title', 'album_url', 'album_type', 'album_year_released')
+
+
+class TrackRecord(NamedTuple):
+    # The fields of a raw_tracks row that the ingest uses, in a form that can be sent between processes.
+    track_id: int
+    title: str
+    track_url: str
+    track_duration: Optional[int]
+    artist_id: str
+    artist_name: str
+    album_id: str
+    album_title: str
+    genres: Tuple[Tuple[str, str], ...]
+
+
+def create_track_object(record: TrackRecord):
+    track = Track(record.track_id, record.title)
+    track.track_url = record.track_url
+    if type(record.track_duration) is int:
+        track.track_duration = record.track_duration
     return track
 
-def extract_genres(track_row: dict):
-    # List of dictionaries inside the string.
-    track_genres_raw = track_row['track_genres']
+# The track_genres column holds the repr() of a list of dicts with a fixed key order, e.g.
+# [{'genre_id': '21', 'genre_title': 'Hip-Hop', 'genre_url': 'http://freemusicarchive.org/genre/Hip-Hop/'}]
+_QUOTED = r"""(?:'[^'\\]*'|"[^"\\]*")"""
+_GENRE_ITEM = r"\{'genre_id': '\d+', 'genre_title': " + _QUOTED + r", 'genre_url': " + _QUOTED + r"\}"
+_GENRE_LIST_PATTERN = re.compile(r"\[(?:" + _GENRE_ITEM + r"(?:, " + _GENRE_ITEM + r")*)?\]")
+_GENRE_ITEM_PATTERN = re.compile(r"""\{'genre_id': '(\d+)', 'genre_title': (?:'([^'\\]*)'|"([^"\\]*)")""")
+
+def parse_genres_field(track_genres_raw: str) -> Tuple[Tuple[str, str], ...]:
+    """ Parses a raw track_genres value into a tuple of (genre_id, genre_title) pairs.
+    Values that do not match the expected format are handed to ast.literal_eval instead.
+    """
+    if not track_genres_raw:
+        return ()
+    return _parse_genres_field(track_genres_raw)
+
+@lru_cache(maxsize=GENRE_CACHE_SIZE)
+def _parse_genres_field(track_genres_raw: str) -> Tuple[Tuple[str, str], ...]:
+    # Results are immutable so they can be shared by every row carrying the same raw string.
+    if _GENRE_LIST_PATTERN.fullmatch(track_genres_raw):
+        return tuple(
+            (match.group(1), match.group(2) if match.group(2) is not None else match.group(3))
+            for match in _GENRE_ITEM_PATTERN.finditer(track_genres_raw)
+        )
+    genre_dicts = ast.literal_eval(track_genres_raw)
+    return tuple((genre_dict['genre_id'], genre_dict['genre_title']) for genre_dict in genre_dicts)
+
+def extract_genres(track_row: dict) -> Tuple[Tuple[str, str], ...]:
     # Populate genres. track_genres can be empty (None)
-    if track_genres_raw:
-        try:
-            genre_dicts = ast.literal_eval(
-                track_genres_raw) if track_genres_raw != "" else []
-            return genre_dicts
-        except Exception as e:
-            print(track_genres_raw)
-            print(f'Exception occurred while parsing genres: {e}')
+    return _extract_genres(track_row['track_genres'])
+
+def _extract_genres(track_genres_raw: str) -> Tuple[Tuple[str, str], ...]:
+    try:
+        return parse_genres_field(track_genres_raw)
+    except Exception as e:
+        print(track_genres_raw)
+        print(f'Exception occurred while parsing genres: {e}')
+        return ()
 
     
-def read_tracks_file(data_path: Path):
-    track_file = str(Path(data_path) / "raw_tracks_excerpt.csv")
+def read_projected_rows(csv_file: Iterable[str], columns: Sequence[str]) -> Iterator[tuple]:
+    """ Yields a tuple with the values of the given columns for every row of csv_file, in the order of columns.
+    Header positions are resolved once, so no per-row dict of every column is built. Columns missing from a short
+    row are None, as with csv.DictReader.
+    """
+    reader = csv.reader(csv_file)
+    header = next(reader, None)
+    if header is None:
+        return
+    yield from project_rows(reader, header, columns)
+
+def project_rows(reader: Iterable[list], header: Sequence[str], columns: Sequence[str]) -> Iterator[tuple]:
+    # Raises ValueError if one of the columns is not in the header.
+    positions = [list(header).index(column) for column in columns]
+    project = itemgetter(*positions) if len(positions) > 1 else (lambda row: (row[positions[0]],))
+    width = max(positions) + 1
+    for row in reader:
+        if len(row) >= width:
+            yield project(row)
+        elif len(row) > 0:
+            # Blank lines are skipped, short rows are padded.
+            yield project(row + [None] * (width - len(row)))
+
+def parse_track_values(values: tuple) -> TrackRecord:
+    # values holds the TRACK_COLUMNS of a row, in that order.
+    # Extract track_genres attributes.
+    return _track_record(values, _extract_genres(values[-1]))
+
+def _track_record(values: tuple, genres: Tuple[Tuple[str, str], ...]) -> TrackRecord:
+    track_id, track_title, track_url, track_duration, artist_id, artist_name, album_id, album_title, _ = values
+    return TrackRecord(
+        int(track_id),
+        track_title,
+        track_url,
+        round(float(track_duration)) if track_duration is not None else None,
+        artist_id,
+        artist_name,
+        album_id,
+        album_title,
+        genres,
+    )
+
+def tracks_file_path(data_path: Path) -> str:
+    return str(Path(data_path) / "raw_tracks_excerpt.csv")
+
+def albums_file_path(data_path: Path) -> str:
+    return str(Path(data_path) / "raw_albums_excerpt.csv")
+
+def source_files(data_path: Path) -> List[str]:
+    # Every file under data_path that populate() reads the catalog from.
+    return [tracks_file_path(data_path), albums_file_path(data_path)]
+
+def create_album_object(values: tuple) -> Album:
+    # values holds the ALBUM_COLUMNS of a row, in that order.
+    album_id, album_title, album_url, album_type, album_year_released = values
+    album = Album(int(album_id), album_title)
+    album.album_url = album_url
+    album.album_type = album_type
+    try:
+        album.release_year = int(album_year_released)
+    except (TypeError, ValueError):
+        # album_year_released is empty for some albums.
+        album.release_year = None
+    return album
+
+def read_album_index(data_path: Path) -> Dict[int, Album]:
+    """ Streams the albums file and returns its albums keyed by album_id.
+    Only the Album objects are kept, so memory is bounded by the number of albums rather than the file size.
+    """
+    album_index = {}
+    album_file = albums_file_path(data_path)
+    if not os.path.exists(album_file):
+        # Without an albums file, albums are built from the fields of the track rows alone.
+        return album_index
+
+    # encoding of unicode_escape is required to decode successfully
+    with open(album_file, encoding='unicode_escape') as album_csv:
+        for values in read_projected_rows(album_csv, ALBUM_COLUMNS):
+            try:
+                album = create_album_object(values)
+            except (TypeError, ValueError):
+                continue
+            album_index.setdefault(album.album_id, album)
+    return album_index
+
+def read_tracks_file(data_path: Path, columns: Sequence[str] = TRACK_COLUMNS) -> Iterator[tuple]:
+    track_file = tracks_file_path(data_path)
     if not os.path.exists(track_file):
         print(f"path {track_file} does not exist!")
         return
 
-    track_rows = []
     # encoding of unicode_escape is required to decode successfully
     with open(track_file, encoding='unicode_escape') as track_csv:
-        reader = csv.DictReader(track_csv)
-        for track_row in reader:
-            track_rows.append(track_row)
-    return track_rows
-
-def read_csv_files(data_path: Path, repo: AbstractRepository):
-    genres = {}
-    artists = {}
-    albums = {}
-    # list of track csv rows, not track objects
-    track_rows: list = read_tracks_file(data_path)
-
-    # Make sure re-initialize to empty list, so that calling this function multiple times does not create
-    # duplicated dataset.
-    for track_row in track_rows:
-        track = create_track_object(track_row)
-        track.video_hyperlink = get_random_video()
-        repo.add_track(track)
-        # Extract track_genres attributes and assign genres to the track.
-        genre_dicts = extract_genres(track_row)
-        try:
-            for genre_dict in genre_dicts:
-                if genre_dict['genre_title'] not in list(genres.keys()):
-                    genres[genre_dict['genre_title']] = []
-                    genres[genre_dict['genre_title']].append(genre_dict['genre_id'])
-                genres[genre_dict['genre_title']].append(track.track_id)
-        except:
-            pass
-
-        if track_row['artist_name'] not in artists.keys():
-            artists[track_row['artist_name']] = []
-            artists[track_row['artist_name']].append(track_row['artist_id'])
-        artists[track_row['artist_name']].append(track.track_id)
-
-        if track_row['album_title'] not in albums.keys():
-            albums[track_row['album_title']] = []
-            albums[track_row['album_title']].append(track_row['album_id'])
-        albums[track_row['album_title']].append(track.track_id)
-
-    for artist_name in artists.keys():
+        # Rows are yielded one at a time so that large catalog dumps are never held in memory as a whole.
+        yield from read_projected_rows(track_csv, columns)
+
+def split_tracks_file(track_file: str, chunk_bytes: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """ Returns the header of track_file and the (start, end) byte ranges of chunks of roughly chunk_bytes
+    that begin and end on row boundaries.
+    """
+    # A newline ends a row unless it sits inside a quoted field, i.e. after an odd number of quote characters.
+    # Escaped quotes ("") come in pairs, so counting quotes per line is enough to track that state.
+    header_end = None
+    boundaries = []
+    offset = 0
+    in_quotes = False
+    with open(track_file, 'rb') as track_csv:
+        for line in track_csv:
+            offset += len(line)
+            if line.count(b'"') % 2 == 1:
+                in_quotes = not in_quotes
+            if in_quotes:
+                continue
+            if header_end is None:
+                header_end = offset
+                boundaries.append(offset)
+            elif offset - boundaries[-1] >= chunk_bytes:
+                boundaries.append(offset)
+    if header_end is None:
+        return [], []
+    if boundaries[-1] != offset:
+        boundaries.append(offset)
+
+    with open(track_file, 'rb') as track_csv:
+        header = track_csv.read(header_end)
+    fieldnames = next(csv.reader(io.TextIOWrapper(io.BytesIO(header), encoding='unicode_escape')))
+    return fieldnames, list(zip(boundaries, boundaries[1:]))
+
+def parse_tracks_chunk(track_file: str, fieldnames: List[str], start: int, end: int) -> List[TrackRecord]:
+    # Runs in a worker process; decodes exactly as read_tracks_file() does, just for one byte range.
+    with open(track_file, 'rb') as track_csv:
+        track_csv.seek(start)
+        chunk = track_csv.read(end - start)
+    reader = csv.reader(io.TextIOWrapper(io.BytesIO(chunk), encoding='unicode_escape'))
+    return [parse_track_values(values) for values in project_rows(reader, fieldnames, TRACK_COLUMNS)]
+
+def read_track_records(data_path: Path, workers: int = 1, chunk_bytes: int = PARALLEL_CHUNK_BYTES,
+                       stats: IngestStats = None) -> Iterator[TrackRecord]:
+    """ Yields a TrackRecord for every row of the tracks file, in file order.
+    With more than one worker the file is split into chunks that are parsed in a process pool.
+    If stats is given, the time spent decoding rows and parsing genres is added to its csv_decode and genre_parse
+    phases; with several workers genre parsing happens in the pool and is counted under csv_decode.
+    """
+    if stats is not None:
+        yield from _timed_track_records(data_path, workers, chunk_bytes, stats)
+        return
+
+    if workers <= 1:
+        for values in read_tracks_file(data_path):
+            yield parse_track_values(values)
+        return
+
+    track_file = tracks_file_path(data_path)
+    if not os.path.exists(track_file):
+        print(f"path {track_file} does not exist!")
+        return
+
+    fieldnames, chunks = split_tracks_file(track_file, chunk_bytes)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Results are consumed in submission order, which keeps the merge deterministic. Only a bounded number
+        # of chunks is in flight so parsed records never pile up far ahead of the consumer.
+        pending = deque()
+        for start, end in chunks:
+            pending.append(executor.submit(parse_tracks_chunk, track_file, fieldnames, start, end))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def _timed_track_records(data_path: Path, workers: int, chunk_bytes: int,
+                         stats: IngestStats) -> Iterator[TrackRecord]:
+    # Times are summed locally and handed to stats once, so the per-row cost is a few clock reads.
+    clock = time.perf_counter
+    decode_seconds = 0.0
+    genre_seconds = 0.0
+    try:
+        if workers <= 1:
+            rows = read_tracks_file(data_path)
+        else:
+            rows = read_track_records(data_path, workers, chunk_bytes)
+        while True:
+            start = clock()
+            values = next(rows, None)
+            if values is None:
+                decode_seconds += clock() - start
+                return
+            if workers <= 1:
+                decoded = clock()
+                genres = _extract_genres(values[-1])
+                parsed = clock()
+                record = _track_record(values, genres)
+                decode_seconds += (decoded - start) + (clock() - parsed)
+                genre_seconds += parsed - decoded
+            else:
+                record = values
+                decode_seconds += clock() - start
+            yield record
+    finally:
+        stats.add_time('csv_decode', decode_seconds)
+        if workers <= 1:
+            stats.add_time('genre_parse', genre_seconds)
+
+def resolve_artist(record: TrackRecord, artists: Dict[str, Optional[Artist]], created: list = None) -> Optional[Artist]:
+    # Artists are identified by name; the first artist_id seen for a name wins.
+    artist_name = record.artist_name
+    if artist_name not in artists:
         try:
-            artist = Artist(int(artists[artist_name][0]), artist_name)
-        
-            for track_id in artists[artist_name][1:]:
-                track = repo.get_track(int(track_id))
-                track.artist = artist
-            repo.add_artist(artist)
-        except:
-            pass
-       
-    for album_name in albums.keys():
+            artists[artist_name] = Artist(int(record.artist_id), artist_name)
+            if created is not None:
+                created.append(artists[artist_name])
+        except (TypeError, ValueError):
+            # Remember the failure so the row is not re-parsed for every track by this artist.
+            artists[artist_name] = None
+    return artists[artist_name]
+
+def resolve_album(record: TrackRecord, albums: Dict[str, Optional[Album]], created: list = None,
+                  album_index: Dict[int, Album] = None) -> Optional[Album]:
+    # Albums are identified by album_id and taken from the albums file when it lists them, so their release year,
+    # type and url are filled in. Albums missing from that file are built from the track row.
+    album_id = record.album_id
+    if album_id not in albums:
         try:
-            album = Album(int(albums[album_name][0]), album_name)
-        
-            for track_id in albums[album_name][1:]:
-                track = repo.get_track(int(track_id))
-                track.album = album
-            repo.add_album(album)
-        except:
-            pass
-
-    for genre_name in genres.keys():
+            album = album_index.get(int(album_id)) if album_index is not None else None
+            if album is None:
+                album = Album(int(album_id), record.album_title)
+            albums[album_id] = album
+            if created is not None:
+                created.append(album)
+        except (TypeError, ValueError):
+            albums[album_id] = None
+    return albums[album_id]
+
+def resolve_genre(genre_id: str, genre_title: str, genres: Dict[str, Optional[Genre]],
+                  created: list = None) -> Optional[Genre]:
+    # Genres are identified by title; the first genre_id seen for a title wins.
+    if genre_title not in genres:
         try:
-            genre = Genre(
-                int(genres[genre_name][0]), genre_name)
-            for track_id in genres[genre_name][1:]:
-                track = repo.get_track(int(track_id))
-                track.add_genre(genre)
-            repo.add_genre(genre)
-        except:
-            continue
-
-        
-def populate(data_path: Path, repo: AbstractRepository):
-    # Load tracks and genres into the repository.
-    read_csv_files(data_path, repo)
\ No newline at end of file
+            genres[genre_title] = Genre(int(genre_id), genre_title)
+            if created is not None:
+                created.append(genres[genre_title])
+        except (TypeError, ValueError):
+            genres[genre_title] = None
+    return genres[genre_title]
+
+def read_csv_files(data_path: Path, repo: AbstractRepository, workers: int = 1, stats: IngestStats = None,
+                   batch_size: int = BULK_BATCH_SIZE, checkpoint: Callable[[int], None] = None,
+                   skip_rows: int = 0) -> IngestStats:
+    # Without a checkpoint the whole load is one bulk_loading() transaction. With one, every batch is committed in
+    # its own transaction together with checkpoint(rows_done), so an interrupted load can be resumed by passing
+    # the last checkpointed rows_done as skip_rows.
+    if stats is None:
+        stats = IngestStats()
+    clock = time.perf_counter
+    start = clock()
+    build_seconds = 0.0
+    link_seconds = 0.0
+
+    genres: Dict[str, Optional[Genre]] = {}
+    artists: Dict[str, Optional[Artist]] = {}
+    albums: Dict[str, Optional[Album]] = {}
+
+    # Entities created since the last batch was written to the repository.
+    new_tracks, new_artists, new_albums, new_genres = [], [], [], []
+    rows_done = 0
+
+    def write_batch():
+        write_start = clock()
+        with repo.bulk_loading() if checkpoint is not None else nullcontext():
+            # Artists, albums and genres go first so that every track in the batch can reference them.
+            repo.bulk_add_artists(new_artists)
+            repo.bulk_add_albums(new_albums)
+            repo.bulk_add_genres(new_genres)
+            repo.bulk_add_tracks(new_tracks)
+            if checkpoint is not None:
+                checkpoint(rows_done)
+        for entity_type, batch in (('tracks', new_tracks), ('artists', new_artists), ('albums', new_albums),
+                                   ('genres', new_genres)):
+            stats.add_entities(entity_type, len(batch))
+            batch.clear()
+        stats.add_time('repository_write', clock() - write_start)
+
+    # The album index is built once; track rows are then joined to it by album_id.
+    with stats.phase('album_index'):
+        album_index = read_album_index(data_path)
+
+    # Single pass over the track records: every Track is linked to its artist, album and genres as soon as it is
+    # built, so no track has to be looked up in the repository again afterwards.
+    with repo.bulk_loading() if checkpoint is None else nullcontext():
+        for record in read_track_records(data_path, workers, stats=stats):
+            rows_done += 1
+            if rows_done <= skip_rows:
+                # Already written by the interrupted load. Its artist, album and genres are still resolved, without
+                # being recorded as new, so later rows keep resolving to the ids that load assigned.
+                resolve_artist(record, artists)
+                resolve_album(record, albums, album_index=album_index)
+                for genre_id, genre_title in record.genres:
+                    resolve_genre(genre_id, genre_title, genres)
+                continue
+            build_start = clock()
+            track = create_track_object(record)
+            track.video_hyperlink = get_random_video()
+            link_start = clock()
+            track.artist = resolve_artist(record, artists, new_artists)
+            track.album = resolve_album(record, albums, new_albums, album_index)
+            for genre_id, genre_title in record.genres:
+                genre = resolve_genre(genre_id, genre_title, genres, new_genres)
+                if genre is not None:
+                    track.add_genre(genre)
+            new_tracks.append(track)
+            build_seconds += link_start - build_start
+            link_seconds += clock() - link_start
+            if len(new_tracks) >= batch_size:
+                write_batch()
+        if len(new_tracks) > 0:
+            # A load whose last batch was full has nothing left to write or checkpoint.
+            write_batch()
+        # Taken last inside the block so that the commit made when bulk loading ends counts as a repository write.
+        commit_start = clock()
+    stats.add_time('repository_write', clock() - commit_start)
+
+    stats.add_time('track_build', build_seconds)
+    stats.add_time('linking', link_seconds)
+    stats.rows += stats.entities.get('tracks', 0)
+    stats.finish(clock() - start)
+    return stats
+
+def populate(data_path: Path, repo: AbstractRepository, workers: int = 1, stats: IngestStats = None,
+             batch_size: int = BULK_BATCH_SIZE, checkpoint: Callable[[int], None] = None,
+             skip_rows: int = 0) -> IngestStats:
+    """ Loads tracks, artists, albums and genres into the repository and returns the timings of the load.
+    With workers > 1 the tracks file is parsed in parallel. If checkpoint is given it is called with the number of
+    rows done after every batch, inside that batch's transaction; skip_rows resumes after that many rows.
+    """
+    return read_csv_files(data_path, repo, workers, stats, batch_size, checkpoint, skip_rows)
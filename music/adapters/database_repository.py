@@ -1,9 +1,10 @@
-from typing import List
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
-from sqlalchemy import desc, asc
+from sqlalchemy import desc, asc, func, select
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
-from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm import scoped_session, joinedload, selectinload
 
 from music.domainmodel.user import User
 from music.domainmodel.track import Track
@@ -11,7 +12,35 @@ from music.domainmodel.album import Album
 from music.domainmodel.genre import Genre
 from music.domainmodel.review import Review
 from music.domainmodel.artist import Artist
-from music.adapters.Repository import AbstractRepository
+from music.adapters.Repository import AbstractRepository, RepositoryException
+from music.adapters.orm import (
+    artists_table, albums_table, genres_table, tracks_table, track_genres_table, track_hashes_table, ingest_state_table,
+    reviews_table
+)
+
+
+# How the relationships of the Tracks returned by the read methods are loaded, by relationship name. These are the
+# ones track_to_dict() reads: many-to-one links are joined into the query of the tracks, and collections come from
+# one extra SELECT ... WHERE track_id IN (...) per query, so rendering a listing takes the same number of queries
+# whatever its size. Relationships left out are loaded lazily, one query per track, on first access.
+TRACK_LOADING = {'artist': joinedload, 'album': joinedload, 'genres': selectinload}
+
+
+def rating_aggregates_update(track_ids: Iterable[int] = None):
+    """ Returns an UPDATE statement that recomputes rating_count and rating_sum from the reviews, of every track or
+    of the tracks with track_ids.
+    """
+    track_reviews = reviews_table.c.track_id == tracks_table.c.track_id
+    update = tracks_table.update()
+    if track_ids is not None:
+        # Tracks without reviews keep the 0 they were inserted with.
+        track_ids = list(track_ids)
+        update = update.where(tracks_table.c.track_id.between(min(track_ids, default=0), max(track_ids, default=-1)))
+        update = update.where(tracks_table.c.track_id.in_(select(reviews_table.c.track_id)))
+    return update.values(
+        rating_count=select(func.count()).where(track_reviews).scalar_subquery(),
+        rating_sum=select(func.coalesce(func.sum(reviews_table.c.rating), 0)).where(track_reviews).scalar_subquery(),
+    )
 
 
 class SessionContextManager:
@@ -37,9 +66,9 @@ class SessionContextManager:
 
     def reset_session(self):
         # this method can be used e.g. to allow Flask to start a new session for each http request,
-        # via the 'before_request' callback
-        self.close_current_session()
-        self.__session = scoped_session(self.__session_factory)
+        # via the 'before_request' callback. Only the session of the calling thread is discarded, so that requests
+        # served by other threads keep theirs and return their connections to the pool.
+        self.__session.remove()
 
     def close_current_session(self):
         if not self.__session is None:
@@ -48,8 +77,11 @@ class SessionContextManager:
 
 class SqlAlchemyRepository(AbstractRepository):
 
-    def __init__(self, session_factory):
+    def __init__(self, session_factory, track_loading: Dict[str, Callable] = None):
         self._session_cm = SessionContextManager(session_factory)
+        self._bulk_loading = False
+        # Relationship name -> loader such as joinedload or selectinload; see TRACK_LOADING.
+        self._track_loading = TRACK_LOADING if track_loading is None else track_loading
 
     def close_session(self):
         self._session_cm.close_current_session()
@@ -91,7 +123,7 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_track(self, id: int) -> Track:
         track = None
         try:
-            track = self._session_cm.session.query(Track).filter(Track._Track__track_id == id).one()
+            track = self._tracks().filter(Track._Track__track_id == id).one()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
@@ -101,7 +133,7 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_tracks(self) -> List[Track]:
         tracks = None
         try:
-            tracks = self._session_cm.session.query(Track).all()
+            tracks = self._tracks().all()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
@@ -111,46 +143,143 @@ class SqlAlchemyRepository(AbstractRepository):
 
     def get_tracks_by_artist(self, target_artist: str) -> List[Track]:
         if target_artist is None:
-            tracks = self._session_cm.session.query(Track).all()
+            tracks = self._tracks().all()
             return tracks
         else:
             # Return tracks matching target_date; return an empty list if there are no matches.
             try:
                 artist_id = self._session_cm.session.query(Artist).filter(Artist._Artist__full_name == target_artist.replace("_"," ")).one().artist_id
             
-                tracks = self._session_cm.session.query(Track).filter(Track.artist_id == artist_id).all()
+                tracks = self._tracks().filter(Track.artist_id == artist_id).all()
             except:
                 tracks = []
             return tracks
 
     def get_tracks_by_album(self, target_album: Album) -> List[Track]:
         if target_album is None:
-            tracks = self._session_cm.session.query(Track).all()
+            tracks = self._tracks().all()
             return tracks
         else:
             # Return tracks matching target_date; return an empty list if there are no matches.
             try:
-                album_id = self._session_cm.session.query(Album).filter(Album._Album__title == target_album.replace("_"," ")).one().album_id
+                # Albums are keyed by album_id, so several albums can share a title.
+                album_ids = self._session_cm.session.query(Album._Album__album_id).filter(Album._Album__title == target_album.replace("_"," "))
             
-                tracks = self._session_cm.session.query(Track).filter(Track.album_id == album_id).all()
+                tracks = self._tracks().filter(Track.album_id.in_(album_ids)).order_by(Track._Track__track_id).all()
             except:
                 tracks = []
             return tracks
 
     def get_number_of_tracks(self):
-        number_of_tracks = self._session_cm.session.query(Track).count()
-        return number_of_tracks
+        return self._count(self._all_track_ids())
+
+    def get_tracks_page(self, offset: int, limit: int) -> List[Track]:
+        return self._page(self._all_track_ids(), offset, limit)
+
+    def get_tracks_page_by_artist(self, target_artist: str, offset: int, limit: int) -> List[Track]:
+        return self._page(self._artist_track_ids(target_artist), offset, limit)
+
+    def get_number_of_tracks_by_artist(self, target_artist: str) -> int:
+        return self._count(self._artist_track_ids(target_artist))
+
+    def get_tracks_page_by_album(self, target_album: str, offset: int, limit: int) -> List[Track]:
+        return self._page(self._album_track_ids(target_album), offset, limit)
+
+    def get_number_of_tracks_by_album(self, target_album: str) -> int:
+        return self._count(self._album_track_ids(target_album))
+
+    def get_tracks_page_by_genre(self, genre_name: str, offset: int, limit: int) -> List[Track]:
+        return self._page(self._genre_track_ids(genre_name), offset, limit)
+
+    def get_number_of_tracks_by_genre(self, genre_name: str) -> int:
+        return self._count(self._genre_track_ids(genre_name))
+
+    def get_neighbor_track_ids(self, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return self._neighbor_ids(self._all_track_ids(), track_id)
+
+    def get_neighbor_track_ids_by_artist(self, target_artist: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return self._neighbor_ids(self._artist_track_ids(target_artist), track_id)
+
+    def get_neighbor_track_ids_by_album(self, target_album: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return self._neighbor_ids(self._album_track_ids(target_album), track_id)
+
+    def get_neighbor_track_ids_by_genre(self, genre_name: str, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return self._neighbor_ids(self._genre_track_ids(genre_name), track_id)
+
+    def has_track_by_artist(self, target_artist: str, track_id: int) -> bool:
+        return self._contains(self._artist_track_ids(target_artist), track_id)
+
+    def has_track_by_album(self, target_album: str, track_id: int) -> bool:
+        return self._contains(self._album_track_ids(target_album), track_id)
+
+    def has_track_by_genre(self, genre_name: str, track_id: int) -> bool:
+        return self._contains(self._genre_track_ids(genre_name), track_id)
+
+    # Each listing is a query of the track ids in it, which the methods above narrow down in SQL: COUNT(*) over the
+    # ids, LIMIT / OFFSET over them, a keyset step from one id to the next, or EXISTS for a single id. The ids come
+    # from an index, so the only rows read from the tracks table are those of the tracks returned.
+
+    @staticmethod
+    def _id_column(track_ids):
+        return track_ids.column_descriptions[0]['expr']
+
+    def _count(self, track_ids) -> int:
+        return self._session_cm.session.query(func.count()).select_from(track_ids.subquery()).scalar()
+
+    def _page(self, track_ids, offset: int, limit: int) -> List[Track]:
+        page_ids = track_ids.order_by(self._id_column(track_ids)).offset(offset).limit(limit)
+        return self._tracks().filter(Track._Track__track_id.in_(page_ids)).order_by(Track._Track__track_id).all()
+
+    def _neighbor_ids(self, track_ids, track_id: int) -> Tuple[Optional[int], Optional[int]]:
+        # Each neighbor is a single step along an index: WHERE track_id < ? ORDER BY track_id DESC LIMIT 1, and the
+        # same upwards.
+        id_column = self._id_column(track_ids)
+        previous_id = track_ids.filter(id_column < track_id).order_by(desc(id_column)).limit(1)
+        next_id = track_ids.filter(id_column > track_id).order_by(asc(id_column)).limit(1)
+        return previous_id.scalar(), next_id.scalar()
+
+    def _contains(self, track_ids, track_id: int) -> bool:
+        member = track_ids.filter(self._id_column(track_ids) == track_id)
+        return self._session_cm.session.query(member.exists()).scalar()
+
+    def _tracks(self):
+        return self._session_cm.session.query(Track).options(*self._track_loader_options())
+
+    def _track_loader_options(self):
+        # Built per query, as the mapped attributes only exist once map_model_to_tables() has run.
+        return [loader(getattr(Track, f'_Track__{name}')) for name, loader in self._track_loading.items()]
+
+    def _all_track_ids(self):
+        return self._session_cm.session.query(tracks_table.c.track_id)
+
+    def _artist_track_ids(self, target_artist: str):
+        artist_ids = self._session_cm.session.query(Artist._Artist__artist_id).filter(
+            Artist._Artist__full_name == target_artist.replace("_", " "))
+        return self._all_track_ids().filter(tracks_table.c.artist_id.in_(artist_ids))
+
+    def _album_track_ids(self, target_album: str):
+        # Albums are keyed by album_id, so several albums can share a title.
+        album_ids = self._session_cm.session.query(Album._Album__album_id).filter(
+            Album._Album__title == target_album.replace("_", " "))
+        return self._all_track_ids().filter(tracks_table.c.album_id.in_(album_ids))
+
+    def _genre_track_ids(self, genre_name: str):
+        # As in get_track_ids_for_genre(), the first genre with the name is used. The ids are read from track_genres
+        # alone, through its (genre_id, track_id) index, without joining the tracks.
+        genre_id = select(genres_table.c.genre_id).where(genres_table.c.name == genre_name).limit(1).scalar_subquery()
+        return self._session_cm.session.query(track_genres_table.c.track_id).filter(
+            track_genres_table.c.genre_id == genre_id)
 
     def get_first_track(self):
-        track = self._session_cm.session.query(Track).first()
+        track = self._tracks().first()
         return track
 
     def get_last_track(self):
-        track = self._session_cm.session.query(Track).order_by(desc(Track._Track__track_id)).last()
+        track = self._tracks().order_by(desc(Track._Track__track_id)).last()
         return track
 
     def get_tracks_by_id(self, id_list: List[int]):
-        tracks = self._session_cm.session.query(Track).filter(Track._Track__track_id.in_(id_list)).all()
+        tracks = self._tracks().filter(Track._Track__track_id.in_(id_list)).all()
         return tracks
 
     def get_track_ids_for_genre(self, genre_name: str):
@@ -177,10 +306,16 @@ class SqlAlchemyRepository(AbstractRepository):
         genres = self._session_cm.session.query(Genre).all()
         return genres
 
+    def get_genre(self, genre_id: int) -> Genre:
+        return self._session_cm.session.query(Genre).filter(Genre._Genre__genre_id == genre_id).one_or_none()
+
     def get_artists(self) -> List[Artist]:
         artists = self._session_cm.session.query(Artist).all()
         return artists
 
+    def get_artist(self, artist_id: int) -> Artist:
+        return self._session_cm.session.query(Artist).filter(Artist._Artist__artist_id == artist_id).one_or_none()
+
     def get_albums(self) -> List[Album]:
         albums = self._session_cm.session.query(Album).all()
         return albums
@@ -190,6 +325,15 @@ class SqlAlchemyRepository(AbstractRepository):
             scm.session.add(genre)
             scm.commit()
 
+    def add_track_genre(self, track_id: int, genre: Genre):
+        with self._session_cm as scm:
+            track = self.get_track(track_id)
+            if track is None:
+                raise RepositoryException(f'There is no track with id {track_id}')
+            # The stored genre with the same id, or genre itself if it is new.
+            track.add_genre(scm.session.merge(genre))
+            scm.commit()
+
     def get_reviews(self) -> List[Review]:
         reviews = self._session_cm.session.query(Review).all()
         return reviews
@@ -198,5 +342,108 @@ class SqlAlchemyRepository(AbstractRepository):
         super().add_review(review)
         with self._session_cm as scm:
             scm.session.add(review)
+            scm.session.flush()
+            # The aggregates are incremented in SQL rather than from the loaded Track, so that reviews committed
+            # concurrently by other sessions are not lost, and in the review's transaction, so they match the reviews.
+            scm.session.execute(
+                tracks_table.update()
+                .where(tracks_table.c.track_id == review.track.track_id)
+                .values(rating_count=tracks_table.c.rating_count + 1,
+                        rating_sum=tracks_table.c.rating_sum + review.rating)
+            )
+            scm.commit()
+
+    def rebuild_rating_aggregates(self) -> int:
+        with self._session_cm as scm:
+            scm.session.execute(rating_aggregates_update())
+            review_count = scm.session.execute(select(func.count()).select_from(reviews_table)).scalar()
+            scm.commit()
+        return review_count
+
+    @contextmanager
+    def bulk_loading(self):
+        # All bulk_add_* calls made inside the block share one transaction, committed when the block exits.
+        with self._session_cm as scm:
+            self._bulk_loading = True
+            try:
+                yield self
+                scm.commit()
+            finally:
+                self._bulk_loading = False
+
+    def bulk_add_tracks(self, tracks: Iterable[Track]):
+        track_rows = []
+        track_genre_rows = []
+        for track in tracks:
+            track_rows.append({
+                'track_id': track.track_id,
+                'title': track.title,
+                'video_hyperlink': track.video_hyperlink,
+                'artist_id': track.artist.artist_id if track.artist is not None else None,
+                'album_id': track.album.album_id if track.album is not None else None,
+            })
+            for genre in track.genres:
+                track_genre_rows.append({'track_id': track.track_id, 'genre_id': genre.genre_id})
+        self._bulk_insert(tracks_table, track_rows)
+        self._bulk_insert(track_genres_table, track_genre_rows)
+        if len(track_rows) > 0:
+            # Reviews outlive the catalog (see clear_catalog()), so re-added tracks take their aggregates from them.
+            self._bulk_execute(rating_aggregates_update(row['track_id'] for row in track_rows))
+
+    def bulk_add_artists(self, artists: Iterable[Artist]):
+        self._bulk_insert(artists_table, [
+            {'artist_id': artist.artist_id, 'full_name': artist.full_name} for artist in artists
+        ])
+
+    def bulk_add_albums(self, albums: Iterable[Album]):
+        self._bulk_insert(albums_table, [
+            {'album_id': album.album_id, 'title': album.title, 'album_url': album.album_url,
+             'album_type': album.album_type, 'release_year': album.release_year} for album in albums
+        ])
+
+    def bulk_add_genres(self, genres: Iterable[Genre]):
+        self._bulk_insert(genres_table, [
+            {'genre_id': genre.genre_id, 'name': genre.name} for genre in genres
+        ])
+
+    def _bulk_insert(self, table, rows: List[dict]):
+        # A Core insert executed with a list of parameter sets runs as a single executemany.
+        if len(rows) == 0:
+            return
+        self._bulk_execute(table.insert(), rows)
+
+    def _bulk_execute(self, statement, rows: List[dict] = None):
+        # Inside bulk_loading() the statement joins the shared transaction, otherwise it is committed on its own.
+        if self._bulk_loading:
+            self._session_cm.session.execute(statement, rows)
+        else:
+            with self._session_cm as scm:
+                scm.session.execute(statement, rows)
+                scm.commit()
+
+    def get_ingest_state(self) -> Optional[dict]:
+        """ Returns the source, rows_done and status recorded by the last `flask ingest`, or None if the catalog
+        was never ingested that way.
+        """
+        row = self._session_cm.session.execute(
+            ingest_state_table.select().where(ingest_state_table.c.state_id == 1)
+        ).fetchone()
+        return {'source': row.source, 'rows_done': row.rows_done, 'status': row.status} if row is not None else None
+
+    def save_ingest_state(self, source: str, rows_done: int, status: str):
+        # Inside bulk_loading() the state is committed together with the rows it describes.
+        values = {'state_id': 1, 'source': source, 'rows_done': rows_done, 'status': status}
+        if self._bulk_loading:
+            self._session_cm.session.execute(ingest_state_table.insert().prefix_with('OR REPLACE'), values)
+        else:
+            with self._session_cm as scm:
+                scm.session.execute(ingest_state_table.insert().prefix_with('OR REPLACE'), values)
+                scm.commit()
+
+    def clear_catalog(self):
+        """ Deletes every track, artist, album and genre, keeping users and their reviews. """
+        with self._session_cm as scm:
+            for table in (track_genres_table, track_hashes_table, tracks_table, albums_table, artists_table,
+                          genres_table, ingest_state_table):
+                scm.session.execute(table.delete())
             scm.commit()
-        
\ No newline at end of file
@@ -0,0 +1,65 @@
+from typing import Mapping
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+# 'null' opens a connection per session and closes it afterwards, 'queue' shares up to DATABASE_POOL_SIZE
+# connections between all threads. SQLAlchemy's SingletonThreadPool is left out on purpose: it is meant for tests
+# against in-memory databases, and closes the connections of other threads that are still in use once it holds
+# more than pool_size of them.
+POOLS = {'null': NullPool, 'queue': QueuePool}
+
+JOURNAL_MODES = ('delete', 'truncate', 'persist', 'memory', 'wal', 'off')
+SYNCHRONOUS_MODES = ('off', 'normal', 'full', 'extra')
+
+
+def create_database_engine(config: Mapping, echo: bool = False) -> Engine:
+    """ Creates the engine for config['SQLALCHEMY_DATABASE_URI'] with the pool and SQLite pragmas of the engine
+    profile in config (see config.Config). The defaults give the plain NullPool engine without pragmas.
+    """
+    pool = config.get('DATABASE_POOL') or 'null'
+    if pool not in POOLS:
+        raise ValueError(f'Unknown database pool {pool!r}, expected one of {", ".join(POOLS)}')
+    pool_options = {}
+    if pool != 'null':
+        pool_options['pool_size'] = int(config.get('DATABASE_POOL_SIZE') or 5)
+    database_engine = create_engine(config['SQLALCHEMY_DATABASE_URI'], connect_args={"check_same_thread": False},
+                                    poolclass=POOLS[pool], echo=echo, **pool_options)
+    pragmas = sqlite_pragmas(config)
+    if pragmas and database_engine.dialect.name == 'sqlite':
+        @event.listens_for(database_engine, 'connect')
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+            cursor.close()
+    return database_engine
+
+
+def sqlite_pragmas(config: Mapping):
+    """ Returns the (name, value) pairs of the pragmas set on every new SQLite connection, in the order they are
+    applied. Settings left empty or 0 keep SQLite's default.
+    """
+    pragmas = []
+    # The busy timeout comes first, so that switching the journal mode waits for other connections too.
+    busy_timeout = int(config.get('SQLITE_BUSY_TIMEOUT') or 0)
+    if busy_timeout:
+        pragmas.append(('busy_timeout', busy_timeout))
+    journal_mode = (config.get('SQLITE_JOURNAL_MODE') or '').lower()
+    if journal_mode:
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f'Unknown journal mode {journal_mode!r}, expected one of {", ".join(JOURNAL_MODES)}')
+        pragmas.append(('journal_mode', journal_mode))
+    synchronous = (config.get('SQLITE_SYNCHRONOUS') or '').lower()
+    if synchronous:
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f'Unknown synchronous mode {synchronous!r}, expected one of {", ".join(SYNCHRONOUS_MODES)}')
+        pragmas.append(('synchronous', synchronous))
+    cache_size = int(config.get('SQLITE_CACHE_SIZE') or 0)
+    if cache_size:
+        pragmas.append(('cache_size', cache_size))
+    mmap_size = int(config.get('SQLITE_MMAP_SIZE') or 0)
+    if mmap_size:
+        pragmas.append(('mmap_size', mmap_size))
+    return pragmas
@@ -0,0 +1,68 @@
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class IngestStats:
+    """ Wall time per phase, entities created per type and peak memory of one catalog load. """
+
+    def __init__(self, source: str = 'csv'):
+        # How the catalog was loaded: 'csv', 'snapshot' or 'incremental_sync'.
+        self.source = source
+        # Seconds per phase, in the order the phases were first recorded.
+        self.phases: Dict[str, float] = {}
+        self.entities: Dict[str, int] = {}
+        self.rows = 0
+        self.total_seconds = 0.0
+        self.peak_rss_bytes: Optional[int] = None
+
+    def add_time(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_entities(self, entity_type: str, count: int):
+        self.entities[entity_type] = self.entities.get(entity_type, 0) + count
+
+    @contextmanager
+    def phase(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def finish(self, total_seconds: float):
+        self.total_seconds = total_seconds
+        self.peak_rss_bytes = peak_rss_bytes()
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.total_seconds if self.total_seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'source': self.source,
+            'rows': self.rows,
+            'total_seconds': round(self.total_seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'phases': {phase: round(seconds, 3) for phase, seconds in self.phases.items()},
+            'entities': dict(self.entities),
+            'peak_rss_bytes': self.peak_rss_bytes,
+        }
+
+    def __repr__(self):
+        phases = ', '.join(f'{phase} = {seconds:.2f}s' for phase, seconds in self.phases.items())
+        return (f'<IngestStats {self.source}: {self.rows} rows in {self.total_seconds:.2f}s '
+                f'({self.rows_per_second:.0f} rows/s), {phases}>')
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """ Returns the peak resident set size of this process in bytes, or None where it cannot be measured. """
+    try:
+        import resource
+    except ImportError:
+        # The resource module is not available on Windows.
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    return peak if sys.platform == 'darwin' else peak * 1024
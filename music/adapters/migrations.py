@@ -0,0 +1,34 @@
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
+from music.adapters.database_repository import rating_aggregates_update
+from music.adapters.orm import metadata
+
+
+def upgrade_schema(database_engine):
+    """ Brings the tables of an existing database file up to date with the schema declared in orm.py, without
+    repopulating it: missing tables are created and missing columns and indexes are added to existing tables.
+    Added columns that hold aggregates of other tables are filled in from them.
+    """
+    metadata.create_all(database_engine)  # Conditionally create database tables.
+
+    inspector = inspect(database_engine)
+    with database_engine.begin() as connection:
+        added_columns = set()
+        for table in metadata.sorted_tables:
+            existing_columns = set(column['name'] for column in inspector.get_columns(table.name))
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    # SQLite can only add columns that are nullable or have a default, which every column
+                    # added after the first release of a table must therefore be.
+                    column_ddl = CreateColumn(column).compile(dialect=database_engine.dialect)
+                    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column_ddl}')
+                    added_columns.add(f'{table.name}.{column.name}')
+        if {'tracks.rating_count', 'tracks.rating_sum'} & added_columns:
+            # The tracks may already have reviews.
+            connection.execute(rating_aggregates_update())
+        for table in metadata.sorted_tables:
+            existing_indexes = set(index['name'] for index in inspector.get_indexes(table.name))
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
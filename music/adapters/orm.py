@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Table, MetaData, Column, Integer, String, ForeignKey
+    Table, MetaData, Column, Integer, String, ForeignKey, Index
 )
 from sqlalchemy.orm import mapper, relationship, synonym
 
@@ -32,6 +32,9 @@ tracks_table = Table(
     Column('video_hyperlink', String(255), nullable=False),
     Column('artist_id', ForeignKey('artists.artist_id')),
     Column('album_id', ForeignKey('albums.album_id')),
+    # Running aggregates of the track's reviews, updated together with every inserted review.
+    Column('rating_count', Integer, nullable=False, default=0, server_default='0'),
+    Column('rating_sum', Integer, nullable=False, default=0, server_default='0'),
 )
 
 genres_table = Table(
@@ -50,6 +53,9 @@ albums_table = Table(
     'albums', metadata,
     Column('album_id', Integer, primary_key=True),
     Column('title', String(64), nullable=False),
+    Column('album_url', String(255)),
+    Column('album_type', String(64)),
+    Column('release_year', Integer),
 )
 
 track_genres_table = Table(
@@ -59,6 +65,36 @@ track_genres_table = Table(
     Column('genre_id', ForeignKey('genres.genre_id'))
 )
 
+# Content hash of every track row as last ingested, used by catalog_sync to detect changed rows.
+track_hashes_table = Table(
+    'track_hashes', metadata,
+    Column('track_id', Integer, primary_key=True),
+    Column('content_hash', String(32), nullable=False)
+)
+
+# Progress of the offline `flask ingest` command, kept in a single row with state_id 1. status is 'running' until
+# every row of source has been written, then 'complete'. A catalog populated by application start-up is recorded
+# with status 'startup', so that `flask ingest` can take it over.
+ingest_state_table = Table(
+    'ingest_state', metadata,
+    Column('state_id', Integer, primary_key=True),
+    Column('source', String(255), nullable=False),
+    Column('rows_done', Integer, nullable=False),
+    Column('status', String(16), nullable=False)
+)
+
+# Indexes on the columns the repository filters on. In SQLite every index also holds the rowid, which is track_id for
+# tracks, so (artist_id) serves WHERE artist_id = ? ORDER BY track_id as well. track_genres has its own rowid, so its
+# indexes name track_id explicitly; both cover the queries that only read the two ids.
+Index('ix_tracks_artist_id', tracks_table.c.artist_id)
+Index('ix_tracks_album_id', tracks_table.c.album_id)
+Index('ix_track_genres_genre_id_track_id', track_genres_table.c.genre_id, track_genres_table.c.track_id)
+Index('ix_track_genres_track_id_genre_id', track_genres_table.c.track_id, track_genres_table.c.genre_id)
+Index('ix_reviews_track_id', reviews_table.c.track_id)
+Index('ix_genres_name', genres_table.c.name)
+Index('ix_artists_full_name', artists_table.c.full_name)
+Index('ix_albums_title', albums_table.c.title)
+
 def map_model_to_tables():
     mapper(User, users_table, properties={
         '_User__user_name': users_table.c.user_name,
@@ -72,6 +108,8 @@ def map_model_to_tables():
         '_Track__track_id': tracks_table.c.track_id,
         '_Track__title': tracks_table.c.title,
         '_Track__video_hyperlink': tracks_table.c.video_hyperlink,
+        '_Track__rating_count': tracks_table.c.rating_count,
+        '_Track__rating_sum': tracks_table.c.rating_sum,
         '_Track__reviews': relationship(Review, backref='_Review__track'),
         '_Track__artist': relationship(Artist),
         '_Track__album': relationship(Album),
@@ -88,4 +126,9 @@ def map_model_to_tables():
     mapper(Album, albums_table, properties={
         '_Album__album_id': albums_table.c.album_id,
         '_Album__title': albums_table.c.title,
+        '_Album__album_url': albums_table.c.album_url,
+        '_Album__album_type': albums_table.c.album_type,
+        '_Album__release_year': albums_table.c.release_year,
+        # Tracks are linked to their album through Track.album; this side is only read.
+        '_Album__tracks': relationship(Track, viewonly=True, order_by=tracks_table.c.track_id),
     })
\ No newline at end of file
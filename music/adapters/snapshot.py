@@ -0,0 +1,155 @@
+import gc
+import os
+import pickle
+import struct
+from array import array
+from pathlib import Path
+
+from music.adapters.Repository import AbstractRepository
+from music.adapters.csv_reader import source_files
+from music.domainmodel.artist import Artist
+from music.domainmodel.album import Album
+from music.domainmodel.track import Track
+from music.domainmodel.genre import Genre
+
+# Snapshot files start with MAGIC followed by the format version as an unsigned short.
+MAGIC = b'MUSICSNP'
+SNAPSHOT_VERSION = 2
+_HEADER = struct.Struct('<8sH')
+
+# Stands in for a missing id or duration in the integer columns.
+_NONE = -1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def save_snapshot(repo: AbstractRepository, snapshot_path: Path, data_path: Path = None):
+    """ Writes the catalog held by repo (tracks, artists, albums, genres and their links) to snapshot_path.
+    If data_path is given, the snapshot records which csv files it was built from.
+    """
+    tracks = repo.get_tracks()
+    track_ids = array('q')
+    artist_ids = array('q')
+    album_ids = array('q')
+    durations = array('q')
+    # Genre links are stored CSR-style: the genre ids of track i are genre_ids[genre_offsets[i]:genre_offsets[i+1]].
+    genre_offsets = array('q', [0])
+    genre_ids = array('q')
+    titles, urls, videos = [], [], []
+    for track in tracks:
+        track_ids.append(track.track_id)
+        titles.append(track.title)
+        urls.append(track.track_url)
+        videos.append(track.video_hyperlink)
+        durations.append(track.track_duration if track.track_duration is not None else _NONE)
+        artist_ids.append(track.artist.artist_id if track.artist is not None else _NONE)
+        album_ids.append(track.album.album_id if track.album is not None else _NONE)
+        genre_ids.extend(genre.genre_id for genre in track.genres)
+        genre_offsets.append(len(genre_ids))
+
+    catalog = {
+        'sources': _source_signature(data_path) if data_path is not None else None,
+        'artists': [(artist.artist_id, artist.full_name) for artist in repo.get_artists()],
+        'albums': [
+            (album.album_id, album.title, album.album_url, album.album_type, album.release_year)
+            for album in repo.get_albums()
+        ],
+        'genres': [(genre.genre_id, genre.name) for genre in repo.get_genres()],
+        'tracks': {
+            'track_ids': track_ids, 'titles': titles, 'urls': urls, 'videos': videos, 'durations': durations,
+            'artist_ids': artist_ids, 'album_ids': album_ids,
+            'genre_offsets': genre_offsets, 'genre_ids': genre_ids,
+        },
+    }
+
+    # Write to a temporary file first so a reader never sees a half-written snapshot.
+    snapshot_path = Path(snapshot_path)
+    temporary_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+    with open(temporary_path, 'wb') as snapshot_file:
+        snapshot_file.write(_HEADER.pack(MAGIC, SNAPSHOT_VERSION))
+        pickle.dump(catalog, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, snapshot_path)
+
+
+def load_snapshot(snapshot_path: Path, repo: AbstractRepository, data_path: Path = None):
+    """ Fills repo with the catalog stored in snapshot_path.
+    Raises SnapshotError if the file is not a snapshot, was written by another format version or, when data_path
+    is given, was built from other csv files.
+    """
+    # Loading allocates millions of objects that are never garbage; pausing the cyclic collector meanwhile avoids
+    # repeated full-heap scans.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        _load_snapshot(snapshot_path, repo, data_path)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _load_snapshot(snapshot_path: Path, repo: AbstractRepository, data_path: Path):
+    with open(snapshot_path, 'rb') as snapshot_file:
+        header = snapshot_file.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            raise SnapshotError(f'{snapshot_path} is not a catalog snapshot')
+        magic, version = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise SnapshotError(f'{snapshot_path} is not a catalog snapshot')
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f'{snapshot_path} has snapshot version {version}, expected {SNAPSHOT_VERSION}')
+        try:
+            catalog = pickle.load(snapshot_file)
+        except (pickle.UnpicklingError, EOFError) as e:
+            raise SnapshotError(f'{snapshot_path} is corrupt: {e}')
+    if data_path is not None and catalog['sources'] != _source_signature(data_path):
+        raise SnapshotError(f'{snapshot_path} was not built from the csv files in {data_path}')
+
+    artists = {artist_id: Artist(artist_id, full_name) for artist_id, full_name in catalog['artists']}
+    albums = {}
+    for album_id, title, album_url, album_type, release_year in catalog['albums']:
+        album = Album(album_id, title)
+        album.album_url = album_url
+        album.album_type = album_type
+        album.release_year = release_year
+        albums[album_id] = album
+    genres = {genre_id: Genre(genre_id, name) for genre_id, name in catalog['genres']}
+
+    columns = catalog['tracks']
+    genre_offsets = columns['genre_offsets']
+    genre_ids = columns['genre_ids']
+    tracks = []
+    for i, track_id in enumerate(columns['track_ids']):
+        track = Track(track_id, columns['titles'][i])
+        track.track_url = columns['urls'][i]
+        track.video_hyperlink = columns['videos'][i]
+        if columns['durations'][i] != _NONE:
+            track.track_duration = columns['durations'][i]
+        track.artist = artists.get(columns['artist_ids'][i])
+        track.album = albums.get(columns['album_ids'][i])
+        # Genre links in a snapshot are already unique, so they skip the duplicate check in Track.add_genre().
+        track.genres.extend(genres[genre_id] for genre_id in genre_ids[genre_offsets[i]:genre_offsets[i + 1]])
+        tracks.append(track)
+
+    with repo.bulk_loading():
+        repo.bulk_add_artists(artists.values())
+        repo.bulk_add_albums(albums.values())
+        repo.bulk_add_genres(genres.values())
+        repo.bulk_add_tracks(tracks)
+
+
+def snapshot_is_fresh(snapshot_path: Path, data_path: Path) -> bool:
+    """ Returns True if snapshot_path exists and is newer than every CSV file the catalog is read from. """
+    if not os.path.exists(snapshot_path):
+        return False
+    snapshot_mtime = os.path.getmtime(snapshot_path)
+    return all(
+        os.path.getmtime(source) < snapshot_mtime for source in source_files(data_path) if os.path.exists(source)
+    )
+
+
+def _source_signature(data_path: Path):
+    return [(os.path.abspath(source), os.path.getsize(source)) for source in source_files(data_path)
+            if os.path.exists(source)]
+
@@ -0,0 +1,58 @@
+from bisect import bisect_left, bisect_right
+from heapq import merge
+from typing import List, Optional, Sequence, Tuple
+
+# intersect_sorted() binary-searches a list that is at least this many times longer than the running result.
+_BISECT_RATIO = 32
+
+
+def intersect_sorted(*id_lists: Sequence[int]) -> List[int]:
+    """ Returns the ids that occur in every one of the ascending id_lists, in ascending order. """
+    if len(id_lists) == 0:
+        return []
+    # Start from the shortest list and look its ids up in the longer ones, so the cost follows the smallest list.
+    shortest, *others = sorted(id_lists, key=len)
+    result = list(shortest)
+    for ids in sorted(others, key=len):
+        if len(ids) > _BISECT_RATIO * len(result):
+            # Much longer list: binary search for each id, resuming where the previous search ended.
+            matches = []
+            position = 0
+            for track_id in result:
+                position = bisect_left(ids, track_id, position)
+                if position == len(ids):
+                    break
+                if ids[position] == track_id:
+                    matches.append(track_id)
+            result = matches
+        else:
+            # Lists of similar length: a hash lookup per id is cheaper than the searches.
+            members = set(ids)
+            result = [track_id for track_id in result if track_id in members]
+        if len(result) == 0:
+            break
+    return result
+
+
+def union_sorted(*id_lists: Sequence[int]) -> List[int]:
+    """ Returns the ids that occur in any of the ascending id_lists, in ascending order and without duplicates. """
+    result = []
+    for track_id in merge(*id_lists):
+        if len(result) == 0 or result[-1] != track_id:
+            result.append(track_id)
+    return result
+
+
+def contains_id(ids: Sequence[int], track_id: int) -> bool:
+    """ Returns whether track_id is one of the ascending ids. """
+    position = bisect_left(ids, track_id)
+    return position < len(ids) and ids[position] == track_id
+
+
+def neighbor_ids(ids: Sequence[int], track_id: int) -> Tuple[Optional[int], Optional[int]]:
+    """ Returns the ids just before and just after track_id in the ascending ids, None past either end.
+    track_id itself need not be one of the ids.
+    """
+    start = bisect_left(ids, track_id)
+    end = bisect_right(ids, track_id, start)
+    return ids[start - 1] if start > 0 else None, ids[end] if end < len(ids) else None
@@ -0,0 +1,475 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from copy import copy
+from typing import Dict, List, Optional
+from weakref import WeakValueDictionary
+
+from music.domainmodel.artist import Artist
+from music.domainmodel.album import Album
+from music.domainmodel.track import Track
+from music.domainmodel.genre import Genre
+from music.domainmodel.review import Review
+
+# Stands in for a missing id or duration in the integer columns.
+_NONE = -1
+
+
+class ObjectTrackStore:
+    """ Keeps every Track as a full object, in track id order. """
+
+    def __init__(self):
+        self.__tracks = list()
+        self.__tracks_index = dict()
+        # The ids of __tracks, for binary searches by id.
+        self.__track_ids = array('q')
+
+    def appends(self, track_id: int) -> bool:
+        """ Returns whether add() puts the track with track_id after every stored track. Readers of the store may
+        keep using it while such a track is added: they see it once it is complete.
+        """
+        return len(self.__track_ids) == 0 or self.__track_ids[-1] < track_id
+
+    def add(self, track: Track):
+        replaced = track.track_id in self.__tracks_index
+        # Tracks are usually added in id order (csv files, snapshots), where appending avoids the bisection.
+        if self.appends(track.track_id):
+            # The ids, which binary searches read, are extended last.
+            self.__tracks_index[track.track_id] = track
+            self.__tracks.append(track)
+            self.__track_ids.append(track.track_id)
+        elif replaced:
+            # Adding a track again replaces it.
+            self.__tracks[self.position(track.track_id)] = track
+        else:
+            row = bisect_left(self.__track_ids, track.track_id)
+            self.__tracks.insert(row, track)
+            self.__track_ids.insert(row, track.track_id)
+        self.__tracks_index[track.track_id] = track
+        # Album.add_track() does not check for duplicates, and a replaced track is usually on its album already.
+        if track.album is not None and not (replaced and track in track.album.tracks):
+            track.album.add_track(track)
+
+    def get(self, track_id: int) -> Optional[Track]:
+        return self.__tracks_index.get(track_id)
+
+    def tracks(self) -> List[Track]:
+        return self.__tracks
+
+    def track_ids(self) -> array:
+        """ Returns the ids of the stored tracks in ascending order; the array must not be modified. """
+        return self.__track_ids
+
+    def position(self, track_id: int) -> int:
+        """ Returns the position of the track in track id order; raises ValueError if there is no such track. """
+        if track_id not in self.__tracks_index:
+            raise ValueError
+        return bisect_left(self.__track_ids, track_id)
+
+    def __contains__(self, track_id: int) -> bool:
+        return track_id in self.__tracks_index
+
+    def __copy__(self) -> 'ObjectTrackStore':
+        # An independent store of the same Track objects.
+        store = ObjectTrackStore.__new__(ObjectTrackStore)
+        store.__tracks = list(self.__tracks)
+        store.__tracks_index = dict(self.__tracks_index)
+        store.__track_ids = array('q', self.__track_ids)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.__tracks)
+
+
+class ColumnarTrackStore:
+    """ Keeps the tracks column by column, in track id order, and hands out TrackView objects on demand.
+
+    Ids, durations and artist / album ids live in typed arrays, titles and urls in packed UTF-8 columns, video links
+    in a small table of distinct values, and genre links CSR-style: the genre ids of the track in row i are
+    genre_ids[genre_offsets[i]:genre_offsets[i + 1]]. Reviews are few, so they and the rating aggregates are kept
+    per track id in dicts. Album.tracks is not filled in, as it would keep a Track object per row alive; the
+    repository's album index (get_track_ids_for_album_id) serves that purpose.
+    """
+
+    def __init__(self):
+        # The artists, albums and genres of the stored tracks by id; rows only hold their ids.
+        self.__artists: Dict[int, Artist] = {}
+        self.__albums: Dict[int, Album] = {}
+        self.__genres: Dict[int, Genre] = {}
+
+        self.__track_ids = array('q')
+        self.__titles = StringColumn()
+        self.__urls = StringColumn()
+        self.__videos = array('H')
+        self.__video_values: List[Optional[str]] = []
+        self.__video_numbers: Dict[Optional[str], int] = {}
+        self.__durations = array('l')
+        self.__artist_ids = array('q')
+        self.__album_ids = array('q')
+        self.__genre_offsets = array('q', [0])
+        self.__genre_ids = array('l')
+        self.__reviews: Dict[int, List[Review]] = {}
+        # Rating count and sum of the reviewed tracks by track id.
+        self.__ratings: Dict[int, List[int]] = {}
+        # Views are shared while anything holds on to them, so e.g. a review and a page see the same object.
+        self.__views = WeakValueDictionary()
+
+    def appends(self, track_id: int) -> bool:
+        """ Returns whether add() puts the track with track_id after every stored track. Readers of the store may
+        keep using it while such a track is added: they see it once its row is complete.
+        """
+        return len(self.__track_ids) == 0 or self.__track_ids[-1] < track_id
+
+    def add(self, track: Track):
+        track_id = track.track_id
+        if self.appends(track_id):
+            row = len(self.__track_ids)
+        else:
+            row = bisect_left(self.__track_ids, track_id)
+            if self.__track_ids[row] == track_id:
+                # Adding a track again replaces its row.
+                self.__delete_row(row)
+        # Reviews and rating aggregates are kept by track id, so they are in place before the row that leads to them.
+        for review in track.reviews:
+            self.add_review(track_id, review)
+        if track.rating_count > 0:
+            self.__ratings[track_id] = [track.rating_count, track.rating_sum]
+        else:
+            self.__ratings.pop(track_id, None)
+        self.__insert_row(row, track)
+
+    def get(self, track_id: int) -> Optional[Track]:
+        if track_id not in self:
+            return None
+        return self.view(track_id)
+
+    def tracks(self) -> 'TrackSequence':
+        return TrackSequence(self, self.__track_ids)
+
+    def track_ids(self) -> array:
+        """ Returns the ids of the stored tracks in ascending order; the array must not be modified. """
+        return self.__track_ids
+
+    def position(self, track_id: int) -> int:
+        row = bisect_left(self.__track_ids, track_id)
+        if row == len(self.__track_ids) or self.__track_ids[row] != track_id:
+            raise ValueError
+        return row
+
+    def view(self, track_id: int) -> 'TrackView':
+        view = self.__views.get(track_id)
+        if view is None:
+            view = TrackView(self, track_id)
+            self.__views[track_id] = view
+        return view
+
+    def __contains__(self, track_id: int) -> bool:
+        row = bisect_left(self.__track_ids, track_id)
+        return row != len(self.__track_ids) and self.__track_ids[row] == track_id
+
+    def __len__(self) -> int:
+        return len(self.__track_ids)
+
+    def __copy__(self) -> 'ColumnarTrackStore':
+        # An independent copy of the columns. Reviews and rating aggregates are not part of a row, so the copy
+        # shares them with this store and they stay the same for views of either.
+        store = ColumnarTrackStore.__new__(ColumnarTrackStore)
+        store.__artists = dict(self.__artists)
+        store.__albums = dict(self.__albums)
+        store.__genres = dict(self.__genres)
+        store.__track_ids = copy(self.__track_ids)
+        store.__titles = copy(self.__titles)
+        store.__urls = copy(self.__urls)
+        store.__videos = copy(self.__videos)
+        store.__video_values = list(self.__video_values)
+        store.__video_numbers = dict(self.__video_numbers)
+        store.__durations = copy(self.__durations)
+        store.__artist_ids = copy(self.__artist_ids)
+        store.__album_ids = copy(self.__album_ids)
+        store.__genre_offsets = copy(self.__genre_offsets)
+        store.__genre_ids = copy(self.__genre_ids)
+        store.__reviews = self.__reviews
+        store.__ratings = self.__ratings
+        store.__views = WeakValueDictionary()
+        return store
+
+    def nbytes(self) -> int:
+        """ Returns the number of bytes held by the columns, not counting reviews and views. """
+        arrays = (self.__track_ids, self.__videos, self.__durations, self.__artist_ids, self.__album_ids,
+                  self.__genre_offsets, self.__genre_ids)
+        return (sum(column.itemsize * len(column) for column in arrays)
+                + self.__titles.nbytes() + self.__urls.nbytes())
+
+    # Column access for TrackView.
+
+    def title(self, track_id: int) -> Optional[str]:
+        return self.__titles[self.position(track_id)]
+
+    def track_url(self, track_id: int) -> Optional[str]:
+        return self.__urls[self.position(track_id)]
+
+    def video_hyperlink(self, track_id: int) -> Optional[str]:
+        return self.__video_values[self.__videos[self.position(track_id)]]
+
+    def track_duration(self, track_id: int) -> Optional[int]:
+        duration = self.__durations[self.position(track_id)]
+        return duration if duration != _NONE else None
+
+    def artist(self, track_id: int) -> Optional[Artist]:
+        return self.__artists.get(self.__artist_ids[self.position(track_id)])
+
+    def album(self, track_id: int) -> Optional[Album]:
+        return self.__albums.get(self.__album_ids[self.position(track_id)])
+
+    def genres(self, track_id: int) -> List[Genre]:
+        row = self.position(track_id)
+        genre_ids = self.__genre_ids[self.__genre_offsets[row]:self.__genre_offsets[row + 1]]
+        return [self.__genres[genre_id] for genre_id in genre_ids]
+
+    def add_genre(self, track_id: int, genre: Genre):
+        row = self.position(track_id)
+        end = self.__genre_offsets[row + 1]
+        if genre.genre_id in self.__genre_ids[self.__genre_offsets[row]:end]:
+            return
+        self.__genres.setdefault(genre.genre_id, genre)
+        self.__genre_ids.insert(end, genre.genre_id)
+        for i in range(row + 1, len(self.__genre_offsets)):
+            self.__genre_offsets[i] += 1
+
+    def reviews(self, track_id: int) -> List[Review]:
+        # Tracks without reviews share no list; add_review() creates one on the first review.
+        return self.__reviews.get(track_id, [])
+
+    def add_review(self, track_id: int, review: Review):
+        reviews = self.__reviews.setdefault(track_id, [])
+        if review not in reviews:
+            reviews.append(review)
+
+    def rating_count(self, track_id: int) -> int:
+        return self.__ratings.get(track_id, (0, 0))[0]
+
+    def rating_sum(self, track_id: int) -> int:
+        return self.__ratings.get(track_id, (0, 0))[1]
+
+    def add_rating(self, track_id: int, rating: int):
+        totals = self.__ratings.setdefault(track_id, [0, 0])
+        totals[0] += 1
+        totals[1] += rating
+
+    def clear_ratings(self, track_id: int):
+        self.__ratings.pop(track_id, None)
+
+    def __insert_row(self, row: int, track: Track):
+        if track.artist is not None:
+            self.__artists.setdefault(track.artist.artist_id, track.artist)
+        if track.album is not None:
+            self.__albums.setdefault(track.album.album_id, track.album)
+        for genre in track.genres:
+            self.__genres.setdefault(genre.genre_id, genre)
+        video = track.video_hyperlink
+        if video not in self.__video_numbers:
+            self.__video_numbers[video] = len(self.__video_values)
+            self.__video_values.append(video)
+        genre_ids = [genre.genre_id for genre in track.genres]
+        if row == len(self.__track_ids):
+            # The id column holds the number of rows, so it is extended last.
+            self.__titles.append(track.title)
+            self.__urls.append(track.track_url)
+            self.__videos.append(self.__video_numbers[video])
+            self.__durations.append(track.track_duration if track.track_duration is not None else _NONE)
+            self.__artist_ids.append(track.artist.artist_id if track.artist is not None else _NONE)
+            self.__album_ids.append(track.album.album_id if track.album is not None else _NONE)
+            self.__genre_ids.extend(genre_ids)
+            self.__genre_offsets.append(len(self.__genre_ids))
+            self.__track_ids.append(track.track_id)
+            return
+
+        # Inserting before the last row shifts every later row; this only happens for tracks added out of id order.
+        self.__track_ids.insert(row, track.track_id)
+        self.__titles.insert(row, track.title)
+        self.__urls.insert(row, track.track_url)
+        self.__videos.insert(row, self.__video_numbers[video])
+        self.__durations.insert(row, track.track_duration if track.track_duration is not None else _NONE)
+        self.__artist_ids.insert(row, track.artist.artist_id if track.artist is not None else _NONE)
+        self.__album_ids.insert(row, track.album.album_id if track.album is not None else _NONE)
+        start = self.__genre_offsets[row]
+        self.__genre_ids[start:start] = array('l', genre_ids)
+        self.__genre_offsets.insert(row + 1, start + len(genre_ids))
+        for i in range(row + 2, len(self.__genre_offsets)):
+            self.__genre_offsets[i] += len(genre_ids)
+
+    def __delete_row(self, row: int):
+        for column in (self.__track_ids, self.__titles, self.__urls, self.__videos, self.__durations,
+                       self.__artist_ids, self.__album_ids):
+            del column[row]
+        start, end = self.__genre_offsets[row], self.__genre_offsets[row + 1]
+        del self.__genre_ids[start:end]
+        del self.__genre_offsets[row + 1]
+        for i in range(row + 1, len(self.__genre_offsets)):
+            self.__genre_offsets[i] -= end - start
+
+
+class StringColumn:
+    """ A column of optional strings packed into one UTF-8 buffer.
+    Each value is stored as a marker byte followed by its encoding; None is stored as nothing at all.
+    """
+
+    def __init__(self):
+        self.__data = bytearray()
+        # The buffer offset at which each value ends.
+        self.__ends = array('q')
+
+    def append(self, value: Optional[str]):
+        if value is not None:
+            self.__data += b'\x01'
+            self.__data += value.encode('utf-8')
+        self.__ends.append(len(self.__data))
+
+    def insert(self, index: int, value: Optional[str]):
+        start = self.__ends[index - 1] if index > 0 else 0
+        encoded = b'\x01' + value.encode('utf-8') if value is not None else b''
+        self.__data[start:start] = encoded
+        self.__ends.insert(index, start)
+        for i in range(index, len(self.__ends)):
+            self.__ends[i] += len(encoded)
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        start = self.__ends[index - 1] if index > 0 else 0
+        end = self.__ends[index]
+        if start == end:
+            return None
+        return self.__data[start + 1:end].decode('utf-8')
+
+    def __delitem__(self, index: int):
+        start = self.__ends[index - 1] if index > 0 else 0
+        end = self.__ends[index]
+        del self.__data[start:end]
+        del self.__ends[index]
+        for i in range(index, len(self.__ends)):
+            self.__ends[i] -= end - start
+
+    def __len__(self) -> int:
+        return len(self.__ends)
+
+    def __copy__(self) -> 'StringColumn':
+        column = StringColumn.__new__(StringColumn)
+        column.__data = bytearray(self.__data)
+        column.__ends = array('q', self.__ends)
+        return column
+
+    def nbytes(self) -> int:
+        return len(self.__data) + self.__ends.itemsize * len(self.__ends)
+
+
+class TrackSequence(Sequence):
+    """ A read-only sequence of the tracks of a ColumnarTrackStore, resolved to views as they are accessed. """
+
+    def __init__(self, store: ColumnarTrackStore, track_ids: array):
+        self.__store = store
+        self.__track_ids = track_ids
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.__store.view(track_id) for track_id in self.__track_ids[index]]
+        return self.__store.view(self.__track_ids[index])
+
+    def __len__(self) -> int:
+        return len(self.__track_ids)
+
+    def __iter__(self):
+        view = self.__store.view
+        for track_id in self.__track_ids:
+            yield view(track_id)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f'<TrackSequence of {len(self)} tracks>'
+
+
+class TrackView(Track):
+    """ A Track whose fields are read from its row in a ColumnarTrackStore.
+    Catalog fields are read-only; genres and reviews can still be added and are written to the store. Stored tracks
+    gain genres through the repository's add_track_genre(), which also adds them to its genre index.
+    """
+    __slots__ = ('_store', '_track_id')
+
+    def __init__(self, store: ColumnarTrackStore, track_id: int):
+        # Track.__init__ is not called: the view has no fields of its own.
+        self._store = store
+        self._track_id = track_id
+
+    @property
+    def track_id(self) -> int:
+        return self._track_id
+
+    @property
+    def title(self) -> str:
+        return self._store.title(self._track_id)
+
+    @property
+    def video_hyperlink(self):
+        return self._store.video_hyperlink(self._track_id)
+
+    @property
+    def artist(self) -> Artist:
+        return self._store.artist(self._track_id)
+
+    @property
+    def album(self) -> Album:
+        return self._store.album(self._track_id)
+
+    @property
+    def track_url(self) -> str:
+        return self._store.track_url(self._track_id)
+
+    @property
+    def track_duration(self) -> int:
+        return self._store.track_duration(self._track_id)
+
+    @property
+    def genres(self) -> list:
+        return self._store.genres(self._track_id)
+
+    @property
+    def reviews(self) -> list:
+        return self._store.reviews(self._track_id)
+
+    @property
+    def rating_count(self) -> int:
+        return self._store.rating_count(self._track_id)
+
+    @property
+    def rating_sum(self) -> int:
+        return self._store.rating_sum(self._track_id)
+
+    def add_genre(self, new_genre):
+        if isinstance(new_genre, Genre):
+            self._store.add_genre(self._track_id, new_genre)
+
+    def add_review(self, new_review):
+        self._store.add_review(self._track_id, new_review)
+
+    def add_rating(self, rating: int):
+        self._store.add_rating(self._track_id, rating)
+
+    def clear_ratings(self):
+        self._store.clear_ratings(self._track_id)
+
+    # Views compare equal to the Track objects they were made from, in both directions.
+
+    def __eq__(self, other):
+        if not isinstance(other, Track):
+            return False
+        return self.track_id == other.track_id
+
+    def __lt__(self, other):
+        if not isinstance(other, Track):
+            return True
+        return self.track_id < other.track_id
+
+    def __hash__(self):
+        return hash(self.track_id)
@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from music.adapters.Repository import AbstractRepository, RepositoryException
+from music.domainmodel.review import Review
+from music.domainmodel.user import User
+
+
+class WriteAheadLog:
+    """ An append-only log of the users and reviews added to a MemoryRepository, so that they survive a restart.
+
+    Every record is a line of JSON, written to the operating system before the repository call that added it
+    returns. With fsync_interval 0 each record is also fsynced before the call returns. Otherwise records are
+    group-committed: one fsync every fsync_interval seconds covers all records written since the last one, so a
+    power failure can lose the records of that last interval, while a crash of the process loses none.
+
+    Once the log holds compact_records records it is compacted: its records are merged into the compacted file
+    next to it (log_path + '.compact'), a single JSON document without duplicates, and the log starts afresh.
+    """
+
+    def __init__(self, log_path, fsync_interval: float = 0.0, compact_records: int = 10000):
+        self.__log_path = Path(log_path)
+        self.__compact_path = self.__log_path.with_name(self.__log_path.name + '.compact')
+        self.__fsync_interval = fsync_interval
+        self.__compact_records = compact_records
+        self.__lock = threading.Lock()
+        self.__unsynced = False
+        self.__records = self.__recover()
+        self.__file = open(self.__log_path, 'a', encoding='utf-8')
+        self.__closed = threading.Event()
+        self.__syncer = None
+        if fsync_interval > 0:
+            self.__syncer = threading.Thread(target=self.__sync_periodically, name='wal-sync', daemon=True)
+            self.__syncer.start()
+
+    @property
+    def log_path(self) -> Path:
+        return self.__log_path
+
+    @property
+    def compact_path(self) -> Path:
+        return self.__compact_path
+
+    def replay(self, repo: AbstractRepository) -> int:
+        """ Adds the logged users and reviews to repo, which must hold the catalog already and must not log to
+        this WriteAheadLog yet. Returns the number of records applied; reviews of tracks that are no longer in the
+        catalog are skipped.
+        """
+        applied = 0
+        for record in self.__read_records():
+            if record['type'] == 'user':
+                if repo.get_user(record['user_name']) is None:
+                    repo.add_user(User(record['user_name'], record['password']))
+                    applied += 1
+            elif record['type'] == 'review':
+                track = repo.get_track(record['track_id'])
+                user = repo.get_user(record['user_name'])
+                if track is None or user is None:
+                    continue
+                review = Review(track, user, record['rating'])
+                user.add_review(review)
+                track.add_review(review)
+                try:
+                    repo.add_review(review)
+                    applied += 1
+                except RepositoryException:
+                    pass
+        return applied
+
+    def log_user(self, user: User):
+        self.__append({'type': 'user', 'user_name': user.user_name, 'password': user.password})
+
+    def log_review(self, review: Review):
+        self.__append({'type': 'review', 'track_id': review.track.track_id, 'user_name': review.user.user_name,
+                       'rating': review.rating})
+
+    def sync(self):
+        """ fsyncs the records written since the last sync. """
+        with self.__lock:
+            self.__sync()
+
+    def compact(self):
+        """ Merges the log into the compacted file and empties the log. """
+        with self.__lock:
+            self.__compact()
+
+    def close(self):
+        self.__closed.set()
+        if self.__syncer is not None:
+            self.__syncer.join()
+        with self.__lock:
+            if not self.__file.closed:
+                self.__sync()
+                self.__file.close()
+
+    def __append(self, record: Dict):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self.__lock:
+            self.__file.write(line)
+            self.__file.flush()
+            self.__unsynced = True
+            if self.__fsync_interval == 0:
+                self.__sync()
+            self.__records += 1
+            if self.__records >= self.__compact_records:
+                self.__compact()
+
+    def __sync(self):
+        if self.__unsynced and not self.__file.closed:
+            os.fsync(self.__file.fileno())
+            self.__unsynced = False
+
+    def __sync_periodically(self):
+        while not self.__closed.wait(self.__fsync_interval):
+            self.sync()
+
+    def __compact(self):
+        users: Dict[str, str] = {}
+        reviews: Dict[tuple, int] = {}
+        # The first record of a user or review wins, as it does in the repository.
+        for record in self.__read_records():
+            if record['type'] == 'user':
+                users.setdefault(record['user_name'], record['password'])
+            elif record['type'] == 'review':
+                reviews.setdefault((record['track_id'], record['user_name']), record['rating'])
+        compacted = {
+            'users': [[user_name, password] for user_name, password in users.items()],
+            'reviews': [[track_id, user_name, rating] for (track_id, user_name), rating in reviews.items()],
+        }
+        # The compacted file replaces the old one atomically, and is durable before the log is emptied; records
+        # found in both after a crash in between are merged again by the next replay or compaction.
+        temporary_path = self.__compact_path.with_name(self.__compact_path.name + '.tmp')
+        with open(temporary_path, 'w', encoding='utf-8') as compact_file:
+            json.dump(compacted, compact_file, separators=(',', ':'))
+            compact_file.flush()
+            os.fsync(compact_file.fileno())
+        os.replace(temporary_path, self.__compact_path)
+        self.__file.truncate(0)
+        os.fsync(self.__file.fileno())
+        self.__unsynced = False
+        self.__records = 0
+
+    def __read_records(self) -> Iterator[Dict]:
+        # Records of the compacted file come first, then those of the log.
+        if self.__compact_path.exists():
+            with open(self.__compact_path, encoding='utf-8') as compact_file:
+                compacted = json.load(compact_file)
+            for user_name, password in compacted['users']:
+                yield {'type': 'user', 'user_name': user_name, 'password': password}
+            for track_id, user_name, rating in compacted['reviews']:
+                yield {'type': 'review', 'track_id': track_id, 'user_name': user_name, 'rating': rating}
+        if self.__log_path.exists():
+            with open(self.__log_path, encoding='utf-8') as log_file:
+                for line in log_file:
+                    yield json.loads(line)
+
+    def __recover(self) -> int:
+        """ Cuts off a record that a crash left half-written at the end of the log, and returns the number of
+        complete records.
+        """
+        if not self.__log_path.exists():
+            return 0
+        records = 0
+        good_size = 0
+        with open(self.__log_path, 'rb') as log_file:
+            for line in log_file:
+                if not line.endswith(b'\n') or _parse(line) is None:
+                    break
+                records += 1
+                good_size += len(line)
+        if good_size < self.__log_path.stat().st_size:
+            os.truncate(self.__log_path, good_size)
+        return records
+
+
+def _parse(line: bytes) -> Optional[Dict]:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
@@ -0,0 +1,100 @@
+"""Flask CLI commands."""
+import os
+from pathlib import Path
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+import music.adapters.Repository as repo
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.csv_reader import BULK_BATCH_SIZE, populate
+from music.adapters.engine import create_database_engine
+from music.adapters.migrations import upgrade_schema
+from music.adapters.orm import map_model_to_tables
+
+
+@click.command('ingest')
+@click.option('--source', type=click.Path(exists=True, file_okay=False), default=str(Path('music') / 'adapters' / 'data'),
+              show_default=True, help='Directory holding raw_tracks_excerpt.csv and raw_albums_excerpt.csv.')
+@click.option('--repository', type=click.Choice(['database', 'memory']), default='database', show_default=True,
+              help='database fills SQLALCHEMY_DATABASE_URI, memory writes the snapshot at MEMORY_SNAPSHOT_PATH.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=BULK_BATCH_SIZE, show_default=True,
+              help='Tracks committed per transaction; progress is checkpointed after every batch.')
+@click.option('--workers', type=click.IntRange(min=1), default=None, help='Parsing processes [INGEST_WORKERS].')
+@click.option('--restart', is_flag=True, help='Discard the catalog and any checkpoint, and ingest from the start.')
+@with_appcontext
+def ingest_command(source, repository, batch_size, workers, restart):
+    """ Loads the catalog CSV files offline, outside of application start-up.
+    An interrupted database ingest resumes from its last checkpoint when run again.
+    """
+    if workers is None:
+        workers = int(current_app.config['INGEST_WORKERS'])
+    if repository == 'memory':
+        ingest_snapshot(source, workers)
+    else:
+        ingest_database(source, batch_size, workers, restart)
+
+
+def ingest_snapshot(source: str, workers: int):
+    snapshot_path = current_app.config.get('MEMORY_SNAPSHOT_PATH')
+    if not snapshot_path:
+        raise click.UsageError('MEMORY_SNAPSHOT_PATH must be set to ingest into the memory repository.')
+    memory_repo = MemoryRepository()
+    stats = populate(Path(source), memory_repo, workers)
+    # The snapshot is written atomically, so there is nothing to resume.
+    memory_repo.save_snapshot(snapshot_path, Path(source))
+    click.echo(f'Wrote {stats.rows} tracks to {snapshot_path} in {stats.total_seconds:.1f}s.')
+
+
+def ingest_database(source: str, batch_size: int, workers: int, restart: bool):
+    source = os.path.abspath(source)
+    database_engine = create_database_engine(current_app.config)
+    upgrade_schema(database_engine)
+    clear_mappers()
+    map_model_to_tables()
+    database_repo = SqlAlchemyRepository(sessionmaker(autocommit=False, autoflush=True, bind=database_engine))
+
+    state = database_repo.get_ingest_state()
+    loaded_at_startup = state is not None and state['status'] == 'startup'
+    if loaded_at_startup and state['source'] == source and not restart:
+        # Application start-up already loaded these files; from now on the catalog is managed by this command.
+        database_repo.save_ingest_state(source, state['rows_done'], 'complete')
+        click.echo(f"Adopted the catalog loaded at start-up ({state['rows_done']} rows).")
+        return
+    if state is not None and not loaded_at_startup and not restart:
+        if state['source'] != source:
+            raise click.UsageError(f"The database holds an ingest of {state['source']}; use --restart to replace it.")
+        if state['status'] == 'complete':
+            click.echo(f"The catalog is already ingested ({state['rows_done']} rows).")
+            return
+        skip_rows = state['rows_done']
+        click.echo(f'Resuming after row {skip_rows}.')
+    else:
+        if state is None and database_repo.get_number_of_tracks() > 0 and not restart:
+            raise click.UsageError('The database already holds a catalog that was not ingested by this command; '
+                                   'use --restart to replace it.')
+        database_repo.clear_catalog()
+        database_repo.save_ingest_state(source, 0, 'running')
+        skip_rows = 0
+
+    def checkpoint(rows_done: int):
+        database_repo.save_ingest_state(source, rows_done, 'running')
+        click.echo(f'{rows_done} rows ingested')
+
+    stats = populate(Path(source), database_repo, workers, batch_size=batch_size, checkpoint=checkpoint,
+                     skip_rows=skip_rows)
+    database_repo.save_ingest_state(source, skip_rows + stats.rows, 'complete')
+    click.echo(f'Ingest complete: {skip_rows + stats.rows} rows, {stats.rows_per_second:.0f} rows/s.')
+
+
+@click.command('rebuild-ratings')
+@with_appcontext
+def rebuild_ratings_command():
+    """ Recomputes the rating count and sum of every track from its reviews.
+    add_review keeps them up to date; this repairs them after reviews were changed outside of the application.
+    """
+    review_count = repo.repo_instance.rebuild_rating_aggregates()
+    click.echo(f'Rebuilt the rating aggregates from {review_count} reviews.')
@@ -20,6 +20,9 @@ class Track:
         self.__track_duration: int = None
         self.__genres: list = []
         self.__reviews: list = []
+        # Number and sum of the ratings of the track's reviews, kept up to date by the repositories' add_review().
+        self.__rating_count: int = 0
+        self.__rating_sum: int = 0
         self.__video_hyperlink = None
 
     @property
@@ -100,6 +103,22 @@ class Track:
     def reviews(self) -> list:
         return self.__reviews
 
+    @property
+    def rating_count(self) -> int:
+        return self.__rating_count
+
+    @property
+    def rating_sum(self) -> int:
+        return self.__rating_sum
+
+    def add_rating(self, rating: int):
+        self.__rating_count += 1
+        self.__rating_sum += rating
+
+    def clear_ratings(self):
+        self.__rating_count = 0
+        self.__rating_sum = 0
+
     def add_genre(self, new_genre):
         if not isinstance(new_genre, Genre) or new_genre in self.__genres:
             return
@@ -10,13 +10,11 @@ tracks_blueprint = Blueprint('tracks_bp', __name__)
 
 @tracks_blueprint.route('/all', methods=['GET'])
 def view_all_tracks():
-    try:
-        page_num = int(request.args.get('page_num'))
-    except:
-        page_num = 0
+    page_num = request.args.get('page_num', 0, type=int)
+    track_id = request.args.get('track_id', type=int)
     return render_template(
         'tracks/tracks.html',
-        selected_tracks=utilities.get_all_tracks(page_num),
+        selected_tracks=utilities.get_all_tracks(page_num, track_id),
         genres=utilities.get_genres_and_urls(),
         artists=utilities.get_artists_and_urls(),
         albums=utilities.get_albums_and_urls()
@@ -24,40 +22,20 @@ def view_all_tracks():
 
 @tracks_blueprint.route('/tracks_by_genre', methods=['GET'])
 def tracks_by_genre():
-    try:
-        page_num = int(request.args.get('page_num'))
-        genre_name = request.args.get('genre')
-    except:
-        page_num = 0
-        genre_name = 'African'
-    track_ids = services.get_track_ids_for_genre(genre_name, repo.repo_instance)
-    tracks = services.get_tracks_by_id(track_ids, repo.repo_instance)
-    try:
-        if page_num > len(tracks)-1:
-            page_num = len(tracks)-1
-        response = {
-            "track_data": tracks[page_num],
-            "pagination": {},
-        }
-        if len(tracks)-1 == 0:
-            response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_genre')}?genre={genre_name}&page_num={page_num}"
-            response['pagination']['previous'] = f"{url_for('tracks_bp.tracks_by_genre')}?genre={genre_name}&page_num={page_num}"
-        elif page_num >= len(tracks)-1:
-            response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_genre')}?genre={genre_name}&page_num={page_num}"
-            response['pagination']['previous'] = f"{url_for('tracks_bp.tracks_by_genre')}?genre={genre_name}&page_num={page_num-1}"
-        else:
-            if page_num > 0:
-                response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_genre')}?genre={genre_name}&page_num={page_num+1}"
-                response['pagination']['previous'] = f"{url_for('tracks_bp.tracks_by_genre')}?genre={genre_name}&page_num={page_num-1}"
-            else:
-                response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_genre')}?genre={genre_name}&page_num={page_num+1}"
-                response['pagination']['previous'] = f"{url_for('tracks_bp.tracks_by_genre')}?genre={genre_name}&page_num={page_num}"
-    except:
-        response = {
-            "message": f'Genre: {genre_name} has no tracks.',
-            "pagination": {},
-        }
-    
+    page_num = request.args.get('page_num', 0, type=int)
+    track_id = request.args.get('track_id', type=int)
+    genre_name = request.args.get('genre', 'African')
+    response = utilities.get_track_page(
+        page_num,
+        track_id,
+        lambda: services.get_number_of_tracks_for_genre(genre_name, repo.repo_instance),
+        lambda offset, limit: services.get_tracks_page_for_genre(genre_name, offset, limit, repo.repo_instance),
+        lambda track_id: services.get_neighbor_track_ids_for_genre(genre_name, track_id, repo.repo_instance),
+        f"{url_for('tracks_bp.tracks_by_genre')}?genre={genre_name}&",
+        f'Genre: {genre_name} has no tracks.',
+        lambda track_id: services.has_track_for_genre(genre_name, track_id, repo.repo_instance)
+    )
+
     return render_template(
         'tracks/tracks.html',
         selected_tracks=response,
@@ -68,39 +46,20 @@ def tracks_by_genre():
 
 @tracks_blueprint.route('/tracks_by_artist', methods=['GET'])
 def tracks_by_artist():
-    try:
-        page_num = int(request.args.get('page_num'))
-        artist_name = request.args.get('artist')
-    except:
-        page_num = 0
-        artist_name = 'AWOL'
-    tracks = services.get_tracks_for_artist(artist_name, repo.repo_instance)
-    try:
-        if page_num > len(tracks)-1:
-            page_num = len(tracks)-1
-        response = {
-            "track_data": tracks[page_num],
-            "pagination": {},
-        }
-        if len(tracks)-1 == 0:
-            response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_artist')}?artist={artist_name}&page_num={page_num}"
-            response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_artist')}?artist={artist_name}&page_num={page_num}"
-        elif page_num >= len(tracks)-1:
-            response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_artist')}?artist={artist_name}&page_num={page_num}"
-            response['pagination']['previous'] = f"{url_for('tracks_bp.tracks_by_artist')}?artist={artist_name}&page_num={page_num-1}"
-        else:
-            if page_num > 0:
-                response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_artist')}?artist={artist_name}&page_num={page_num+1}"
-                response['pagination']['previous'] = f"{url_for('tracks_bp.tracks_by_artist')}?artist={artist_name}&page_num={page_num-1}"
-            else:
-                response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_artist')}?artist={artist_name}&page_num={page_num+1}"
-                response['pagination']['previous'] = f"{url_for('tracks_bp.tracks_by_artist')}?artist={artist_name}&page_num={page_num}"
-    except:
-        response = {
-            "message": f'Artist: {artist_name} has no tracks.',
-            "pagination": {},
-        }
-    
+    page_num = request.args.get('page_num', 0, type=int)
+    track_id = request.args.get('track_id', type=int)
+    artist_name = request.args.get('artist', 'AWOL')
+    response = utilities.get_track_page(
+        page_num,
+        track_id,
+        lambda: services.get_number_of_tracks_for_artist(artist_name, repo.repo_instance),
+        lambda offset, limit: services.get_tracks_page_for_artist(artist_name, offset, limit, repo.repo_instance),
+        lambda track_id: services.get_neighbor_track_ids_for_artist(artist_name, track_id, repo.repo_instance),
+        f"{url_for('tracks_bp.tracks_by_artist')}?artist={artist_name}&",
+        f'Artist: {artist_name} has no tracks.',
+        lambda track_id: services.has_track_for_artist(artist_name, track_id, repo.repo_instance)
+    )
+
     return render_template(
         'tracks/tracks.html',
         selected_tracks=response,
@@ -111,39 +70,20 @@ def tracks_by_artist():
 
 @tracks_blueprint.route('/tracks_by_album', methods=['GET'])
 def tracks_by_album():
-    try:
-        page_num = int(request.args.get('page_num'))
-        album_name = request.args.get('album')
-    except:
-        page_num = 0
-        album_name = 'Au'
-    tracks = services.get_tracks_for_album(album_name, repo.repo_instance)
-    try:
-        if page_num > len(tracks)-1:
-            page_num = len(tracks)-1
-        response = {
-            "track_data": tracks[page_num],
-            "pagination": {},
-        }
-        if len(tracks)-1 == 0:
-            response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_album')}?album={album_name}&page_num={page_num}"
-            response['pagination']['previous'] = f"{url_for('tracks_bp.tracks_by_album')}?album={album_name}&page_num={page_num}"
-        elif page_num >= len(tracks)-1:
-            response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_album')}?album={album_name}&page_num={page_num}"
-            response['pagination']['previous'] = f"{url_for('tracks_bp.tracks_by_album')}?album={album_name}&page_num={page_num-1}"
-        else:
-            if page_num > 0:
-                response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_album')}?album={album_name}&page_num={page_num+1}"
-                response['pagination']['previous'] = f"{url_for('tracks_bp.tracks_by_album')}?album={album_name}&page_num={page_num-1}"
-            else:
-                response['pagination']['next'] = f"{url_for('tracks_bp.tracks_by_album')}?album={album_name}&page_num={page_num+1}"
-                response['pagination']['previous'] = f"{url_for('tracks_bp.tracks_by_album')}?album={album_name}&page_num={page_num}"
-    except:
-        response = {
-            "message": f'Album: {album_name} has no tracks.',
-            "pagination": {},
-        }
-    
+    page_num = request.args.get('page_num', 0, type=int)
+    track_id = request.args.get('track_id', type=int)
+    album_name = request.args.get('album', 'Au')
+    response = utilities.get_track_page(
+        page_num,
+        track_id,
+        lambda: services.get_number_of_tracks_for_album(album_name, repo.repo_instance),
+        lambda offset, limit: services.get_tracks_page_for_album(album_name, offset, limit, repo.repo_instance),
+        lambda track_id: services.get_neighbor_track_ids_for_album(album_name, track_id, repo.repo_instance),
+        f"{url_for('tracks_bp.tracks_by_album')}?album={album_name}&",
+        f'Album: {album_name} has no tracks.',
+        lambda track_id: services.has_track_for_album(album_name, track_id, repo.repo_instance)
+    )
+
     return render_template(
         'tracks/tracks.html',
         selected_tracks=response,
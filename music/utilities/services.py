@@ -103,6 +103,59 @@ def get_tracks_by_id(id_list, repo: AbstractRepository):
     tracks_dict = tracks_to_dict(tracks)
     return tracks_dict
 
+def get_number_of_tracks(repo: AbstractRepository):
+    return repo.get_number_of_tracks()
+
+def get_tracks_page(offset, limit, repo: AbstractRepository):
+    tracks = repo.get_tracks_page(offset, limit)
+    return tracks_to_dict(tracks)
+
+def get_number_of_tracks_for_artist(artist_name, repo: AbstractRepository):
+    return repo.get_number_of_tracks_by_artist(artist_name)
+
+def get_tracks_page_for_artist(artist_name, offset, limit, repo: AbstractRepository):
+    tracks = repo.get_tracks_page_by_artist(artist_name, offset, limit)
+    return tracks_to_dict(tracks)
+
+def get_number_of_tracks_for_album(album_name, repo: AbstractRepository):
+    return repo.get_number_of_tracks_by_album(album_name)
+
+def get_tracks_page_for_album(album_name, offset, limit, repo: AbstractRepository):
+    tracks = repo.get_tracks_page_by_album(album_name, offset, limit)
+    return tracks_to_dict(tracks)
+
+def get_number_of_tracks_for_genre(genre_name, repo: AbstractRepository):
+    return repo.get_number_of_tracks_by_genre(genre_name)
+
+def get_tracks_page_for_genre(genre_name, offset, limit, repo: AbstractRepository):
+    tracks = repo.get_tracks_page_by_genre(genre_name, offset, limit)
+    return tracks_to_dict(tracks)
+
+def get_track(track_id, repo: AbstractRepository):
+    track = repo.get_track(track_id)
+    return track_to_dict(track) if track is not None else None
+
+def get_neighbor_track_ids(track_id, repo: AbstractRepository):
+    return repo.get_neighbor_track_ids(track_id)
+
+def get_neighbor_track_ids_for_artist(artist_name, track_id, repo: AbstractRepository):
+    return repo.get_neighbor_track_ids_by_artist(artist_name, track_id)
+
+def get_neighbor_track_ids_for_album(album_name, track_id, repo: AbstractRepository):
+    return repo.get_neighbor_track_ids_by_album(album_name, track_id)
+
+def get_neighbor_track_ids_for_genre(genre_name, track_id, repo: AbstractRepository):
+    return repo.get_neighbor_track_ids_by_genre(genre_name, track_id)
+
+def has_track_for_artist(artist_name, track_id, repo: AbstractRepository):
+    return repo.has_track_by_artist(artist_name, track_id)
+
+def has_track_for_album(album_name, track_id, repo: AbstractRepository):
+    return repo.has_track_by_album(album_name, track_id)
+
+def has_track_for_genre(genre_name, track_id, repo: AbstractRepository):
+    return repo.has_track_by_genre(genre_name, track_id)
+
 def add_review(track_id, rating, user_name, repo: AbstractRepository):
     track = repo.get_track(track_id)
     if track is None:
@@ -135,7 +188,7 @@ def track_to_dict(track: Track):
         'artist': track.artist,
         'album': track.album,
         'genres': track.genres,
-        'rating':int(sum([review.rating for review in track.reviews])/len(track.reviews)) if len(track.reviews) > 0 else 0,
+        'rating': int(track.rating_sum / track.rating_count) if track.rating_count > 0 else 0,
         'video': track.video_hyperlink
     }
     return track_dict
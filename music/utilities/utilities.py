@@ -1,4 +1,4 @@
-from flask import Blueprint, url_for
+from flask import Blueprint, request, url_for
 
 import music.adapters.Repository as repo
 import music.utilities.services as services
@@ -21,29 +21,46 @@ def get_albums_and_urls():
     albums = services.get_album_names_and_urls(repo.repo_instance)
     return albums
 
-def get_all_tracks(page_num):
-    tracks = services.get_all_tracks(repo.repo_instance)
-    try:
-        response = {
-            "track_data": tracks[page_num],
-            "pagination": {},
-        }
-    except:
-        response = {
-            "track_data": tracks[len(tracks)-1],
-            "pagination": {},
-        }
-    if page_num >= len(tracks)-1:
-        response['pagination']['next'] = f"{url_for('tracks_bp.view_all_tracks')}?page_num={page_num}"
-        response['pagination']['previous'] = f"{url_for('tracks_bp.view_all_tracks')}?page_num={page_num-1}"
-    else:
-        if page_num > 0:
-            response['pagination']['next'] = f"{url_for('tracks_bp.view_all_tracks')}?page_num={page_num+1}"
-            response['pagination']['previous'] = f"{url_for('tracks_bp.view_all_tracks')}?page_num={page_num-1}"
-        else:
-            response['pagination']['next'] = f"{url_for('tracks_bp.view_all_tracks')}?page_num={page_num+1}"
-            response['pagination']['previous'] = f"{url_for('tracks_bp.view_all_tracks')}?page_num={page_num}"
+def get_track_page(page_num, track_id, get_number_of_tracks, get_page, get_neighbor_ids, page_url,
+                   empty_message=None, has_track=None):
+    """ Returns the response for one track of a listing that is shown one track per page.
+    The track is the one with track_id, the cursor that the next / previous links carry, or else the one at
+    position page_num. get_page(offset, limit) returns the track dicts of a page of the listing and
+    get_neighbor_ids(track_id) the ids of the tracks around a track; page_url is the url of the listing up to its
+    cursor parameter. has_track(track_id) tells whether a track belongs to a filtered listing: a track_id that does
+    not is ignored. Only the shown track is fetched.
+    """
+    track = None
+    if track_id is not None and (has_track is None or has_track(track_id)):
+        track = services.get_track(track_id, repo.repo_instance)
+    if track is None:
+        number_of_tracks = get_number_of_tracks()
+        if number_of_tracks == 0:
+            return {
+                "message": empty_message,
+                "pagination": {},
+            }
+        # Pages past either end show the first or the last track.
+        page_num = min(max(page_num, 0), number_of_tracks - 1)
+        track = get_page(page_num, 1)[0]
+    previous_id, next_id = get_neighbor_ids(track['track_id'])
+    response = {
+        "track_data": track,
+        "pagination": {},
+    }
+    # At either end the link leads to the page itself, which the template shows as disabled.
+    response['pagination']['next'] = f"{page_url}track_id={next_id}" if next_id is not None else request.full_path
+    response['pagination']['previous'] = \
+        f"{page_url}track_id={previous_id}" if previous_id is not None else request.full_path
     return response
 
-    
-
+def get_all_tracks(page_num, track_id=None):
+    return get_track_page(
+        page_num,
+        track_id,
+        lambda: services.get_number_of_tracks(repo.repo_instance),
+        lambda offset, limit: services.get_tracks_page(offset, limit, repo.repo_instance),
+        lambda track_id: services.get_neighbor_track_ids(track_id, repo.repo_instance),
+        f"{url_for('tracks_bp.view_all_tracks')}?",
+        'There are no tracks.'
+    )
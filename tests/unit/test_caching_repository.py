@@ -0,0 +1,195 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import music.adapters.Repository as repo
+from music import create_app
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.caching_repository import CachingRepository, unwrap
+from music.adapters.csv_reader import populate
+from music.domainmodel.album import Album
+from music.domainmodel.artist import Artist
+from music.domainmodel.genre import Genre
+from music.domainmodel.track import Track
+from music.domainmodel.user import User
+from music.utilities.services import make_review
+from tests.conftest import TEST_DATA_PATH_DATABASE_LIMITED
+
+
+class CountingRepository(MemoryRepository):
+    """ Counts the calls of each method that reach the repository behind the cache. """
+
+    def __init__(self):
+        super().__init__()
+        self.calls = {}
+
+    def __getattribute__(self, name):
+        if name.startswith('get_'):
+            calls = super().__getattribute__('calls')
+            calls[name] = calls.get(name, 0) + 1
+        return super().__getattribute__(name)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def memory_repo():
+    counting_repo = CountingRepository()
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, counting_repo)
+    counting_repo.calls.clear()
+    return counting_repo
+
+
+def test_repeated_reads_are_served_from_the_cache(memory_repo):
+    cache = CachingRepository(memory_repo)
+
+    for _ in range(3):
+        assert cache.get_genres() == memory_repo.get_genres()
+        assert [track.track_id for track in cache.get_tracks_page_by_genre('Rock', 10, 5)] == \
+               memory_repo.get_track_ids_for_genre('Rock')[10:15]
+
+    assert memory_repo.calls['get_tracks_page_by_genre'] == 1
+    assert cache.stats()['hits'] == 4
+    assert cache.stats()['misses'] == 2
+    assert cache.stats()['entries'] == 2
+
+
+def test_users_and_tracks_by_id_are_not_cached(memory_repo):
+    cache = CachingRepository(memory_repo)
+    cache.get_track(2)
+    cache.get_track(2)
+    cache.get_user('nobody')
+
+    assert memory_repo.calls['get_track'] == 2
+    assert cache.stats()['entries'] == 0
+
+
+def test_results_expire_after_the_ttl_of_their_method(memory_repo):
+    clock = FakeClock()
+    cache = CachingRepository(memory_repo, ttls={'get_genres': 300.0, 'get_number_of_tracks': 60.0}, clock=clock)
+    cache.get_genres()
+    cache.get_number_of_tracks()
+
+    clock.now = 100.0
+    cache.get_genres()
+    cache.get_number_of_tracks()
+
+    assert memory_repo.calls['get_genres'] == 1
+    assert memory_repo.calls['get_number_of_tracks'] == 2
+    assert cache.stats()['expirations'] == 1
+
+
+def test_the_least_recently_used_result_is_evicted(memory_repo):
+    cache = CachingRepository(memory_repo, max_entries=2)
+    cache.get_genres()
+    cache.get_artists()
+    cache.get_genres()
+    cache.get_albums()
+
+    cache.get_genres()
+    cache.get_artists()
+
+    assert memory_repo.calls['get_genres'] == 1
+    assert memory_repo.calls['get_artists'] == 2
+    assert cache.stats()['evictions'] == 2
+
+
+def test_a_review_invalidates_only_the_results_holding_its_track(memory_repo):
+    cache = CachingRepository(memory_repo)
+    first_page = cache.get_tracks_page(0, 2)
+    other_page = cache.get_tracks_page(2, 2)
+    cache.get_number_of_tracks()
+    user = User('dave', 'password123')
+    cache.add_user(user)
+
+    cache.add_review(make_review(first_page[0], user, 4))
+
+    assert cache.get_tracks_page(0, 2)[0].rating_count == 1
+    assert cache.get_tracks_page(2, 2) == other_page
+    cache.get_number_of_tracks()
+    assert memory_repo.calls['get_tracks_page'] == 3
+    assert memory_repo.calls['get_number_of_tracks'] == 1
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_a_new_track_invalidates_the_listings_it_joins(memory_repo):
+    cache = CachingRepository(memory_repo)
+    number_of_rock_tracks = cache.get_number_of_tracks_by_genre('Rock')
+    cache.get_number_of_tracks_by_genre('Pop')
+    cache.get_number_of_tracks_by_artist('AWOL')
+    number_of_tracks = cache.get_number_of_tracks()
+
+    track = Track(999999, 'New')
+    track.artist = Artist(999999, 'Someone New')
+    track.add_genre(next(genre for genre in cache.get_genres() if genre.name == 'Rock'))
+    cache.add_track(track)
+
+    assert cache.get_number_of_tracks_by_genre('Rock') == number_of_rock_tracks + 1
+    assert cache.get_number_of_tracks() == number_of_tracks + 1
+    cache.get_number_of_tracks_by_genre('Pop')
+    cache.get_number_of_tracks_by_artist('AWOL')
+    assert memory_repo.calls['get_number_of_tracks_by_genre'] == 3
+    assert memory_repo.calls['get_number_of_tracks_by_artist'] == 1
+
+
+def test_a_new_track_invalidates_listings_whose_names_hold_underscores(memory_repo):
+    cache = CachingRepository(memory_repo)
+    assert cache.get_number_of_tracks_by_artist('DJ_Snake') == 0
+    assert cache.get_number_of_tracks_by_album('Greatest_Hits') == 0
+
+    track = Track(999999, 'New')
+    track.artist = Artist(999999, 'DJ_Snake')
+    track.album = Album(999999, 'Greatest_Hits')
+    cache.add_track(track)
+
+    assert cache.get_number_of_tracks_by_artist('DJ_Snake') == memory_repo.get_number_of_tracks_by_artist('DJ_Snake') == 1
+    assert cache.get_number_of_tracks_by_album('Greatest_Hits') == 1
+
+
+def test_catalog_lists_are_invalidated_by_their_own_writes(memory_repo):
+    cache = CachingRepository(memory_repo)
+    cache.get_artists()
+    number_of_genres = len(cache.get_genres())
+
+    cache.add_genre(Genre(999999, 'Brand New Genre'))
+
+    assert len(cache.get_genres()) == number_of_genres + 1
+    cache.get_artists()
+    assert memory_repo.calls['get_artists'] == 1
+
+
+def test_create_app_puts_the_cache_in_front_of_the_database(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'database',
+        'TEST_DATA_PATH': TEST_DATA_PATH_DATABASE_LIMITED,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'music.db'}",
+        'WTF_CSRF_ENABLED': False,
+        'REPOSITORY_CACHE_SIZE': 100,
+    })
+    client = app.test_client()
+    assert isinstance(repo.repo_instance, CachingRepository)
+    assert app.extensions['repository_cache'] is repo.repo_instance
+
+    statements = []
+    count = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(Engine, 'before_cursor_execute', count)
+    try:
+        first = client.get('/tracks_by_genre?genre=Rock&page_num=3')
+        queries_of_first = len(statements)
+        # Served from objects cached by an earlier request, whose session has been closed since.
+        second = client.get('/tracks_by_genre?genre=Rock&page_num=3')
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count)
+
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    assert len(statements) == queries_of_first
+    assert repo.repo_instance.stats()['hits'] > 0
+    assert unwrap(repo.repo_instance) is repo.repo_instance.repository
@@ -0,0 +1,105 @@
+import shutil
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from music.adapters.catalog_sync import sync_catalog
+from music.adapters.database_repository import rating_aggregates_update
+from music.adapters.orm import (
+    metadata, artists_table, albums_table, genres_table, tracks_table, track_genres_table, users_table, reviews_table
+)
+from tests.conftest import TEST_DATA_PATH_DATABASE_LIMITED
+
+TEST_TRACKS_FILE = TEST_DATA_PATH_DATABASE_LIMITED / 'raw_tracks_test.csv'
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    shutil.copy(TEST_TRACKS_FILE, tmp_path / 'raw_tracks_excerpt.csv')
+    return tmp_path
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    return engine
+
+
+def track_titles(engine):
+    return dict(engine.execute(select(tracks_table.c.track_id, tracks_table.c.title)).fetchall())
+
+
+def test_first_sync_adds_every_track(data_path, engine):
+    report = sync_catalog(data_path, engine)
+
+    assert (report.added, report.changed, report.removed, report.unchanged) == (10, 0, 0, 0)
+    assert len(track_titles(engine)) == 10
+    assert engine.execute(select(track_genres_table)).fetchall() != []
+
+
+def test_sync_without_csv_changes_writes_nothing(data_path, engine):
+    sync_catalog(data_path, engine)
+    report = sync_catalog(data_path, engine)
+
+    assert (report.added, report.changed, report.removed, report.unchanged) == (0, 0, 0, 10)
+    assert report.batches == 0
+
+
+def test_sync_applies_only_added_changed_and_removed_rows(data_path, engine):
+    sync_catalog(data_path, engine)
+    engine.execute(users_table.insert(), {'user_name': 'dave', 'password': '123456789'})
+
+    track_file = data_path / 'raw_tracks_excerpt.csv'
+    lines = track_file.read_bytes().splitlines(keepends=True)
+    # Rename track 3, drop track 5 and add a copy of track 10 as track 11.
+    lines[2] = lines[2].replace(b',Electric Ave,', b',Electric Avenue,')
+    new_track = b'11' + lines[4][len(b'10'):]
+    del lines[3]
+    track_file.write_bytes(b''.join(lines) + new_track)
+
+    report = sync_catalog(data_path, engine)
+
+    assert (report.added, report.changed, report.removed, report.unchanged) == (1, 1, 1, 8)
+    titles = track_titles(engine)
+    assert titles[3] == 'Electric Avenue'
+    assert 5 not in titles and 11 in titles
+    assert engine.execute(select(users_table.c.user_name)).fetchall() == [('dave',)]
+
+
+def test_a_track_removed_and_added_again_gets_back_the_aggregates_of_its_reviews(data_path, engine):
+    sync_catalog(data_path, engine)
+    engine.execute(users_table.insert(), {'user_name': 'dave', 'password': '123456789'})
+    engine.execute(reviews_table.insert(), {'user_name': 'dave', 'track_id': 5, 'rating': 3})
+    engine.execute(rating_aggregates_update())
+    track_file = data_path / 'raw_tracks_excerpt.csv'
+    original = track_file.read_bytes()
+    lines = original.splitlines(keepends=True)
+    del lines[3]
+    track_file.write_bytes(b''.join(lines))
+    assert sync_catalog(data_path, engine).removed == 1
+
+    track_file.write_bytes(original)
+    assert sync_catalog(data_path, engine).added == 1
+
+    assert engine.execute(select(tracks_table.c.rating_count, tracks_table.c.rating_sum).where(
+        tracks_table.c.track_id == 5)).fetchone() == (1, 3)
+
+
+def test_removing_the_last_track_of_an_artist_removes_its_artist_album_and_genre(data_path, engine):
+    sync_catalog(data_path, engine)
+    track_file = data_path / 'raw_tracks_excerpt.csv'
+    lines = track_file.read_bytes().splitlines(keepends=True)
+    # Track 10 is the only track of artist 6, album 6 and genre 10.
+    del lines[4]
+    track_file.write_bytes(b''.join(lines))
+
+    assert sync_catalog(data_path, engine).removed == 1
+
+    artist_ids = [row[0] for row in engine.execute(select(artists_table.c.artist_id))]
+    album_ids = [row[0] for row in engine.execute(select(albums_table.c.album_id))]
+    genre_ids = [row[0] for row in engine.execute(select(genres_table.c.genre_id))]
+    assert 6 not in artist_ids and 6 not in album_ids and 10 not in genre_ids
+    assert sorted(artist_ids) == [1, 4, 53, 54]
+    assert sorted(album_ids) == [1, 4, 59, 60]
+    assert 21 in genre_ids
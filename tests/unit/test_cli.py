@@ -0,0 +1,154 @@
+import pytest
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import clear_mappers
+
+from music import create_app
+from music.adapters.database_repository import SqlAlchemyRepository, rating_aggregates_update
+from music.adapters.orm import (
+    tracks_table, artists_table, albums_table, genres_table, track_genres_table, users_table, reviews_table
+)
+from tests.conftest import TEST_DATA_PATH_DATABASE_LIMITED
+
+
+@pytest.fixture
+def cli_app(tmp_path):
+    database_uri = f"sqlite:///{tmp_path / 'ingest.db'}"
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'memory',
+        'TEST_DATA_PATH': TEST_DATA_PATH_DATABASE_LIMITED,
+        'MEMORY_SNAPSHOT_PATH': '',
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+    })
+    yield app
+    create_engine(database_uri).dispose()
+
+
+@pytest.fixture
+def database_app(tmp_path):
+    # Start-up populates the fresh database file, as it does with the default CATALOG_INGEST = 'startup'.
+    database_uri = f"sqlite:///{tmp_path / 'startup.db'}"
+    app = create_app({
+        'TESTING': False,
+        'REPOSITORY': 'database',
+        'TEST_DATA_PATH': TEST_DATA_PATH_DATABASE_LIMITED,
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'CATALOG_INGEST': 'startup',
+    })
+    yield app
+    create_engine(database_uri).dispose()
+
+
+def ingest(app, *args):
+    return app.test_cli_runner().invoke(args=['ingest', '--source', str(TEST_DATA_PATH_DATABASE_LIMITED), *args])
+
+
+def table_counts(app):
+    engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    with engine.connect() as connection:
+        return {
+            table.name: connection.execute(select(func.count()).select_from(table)).scalar()
+            for table in (tracks_table, artists_table, albums_table, genres_table, track_genres_table)
+        }
+
+
+def test_ingest_builds_the_database_in_batches(cli_app):
+    result = ingest(cli_app, '--batch-size', '500')
+
+    assert result.exit_code == 0, result.output
+    assert '500 rows ingested' in result.output
+    # The last batch is full, so no empty batch is checkpointed after it.
+    assert result.output.count('2000 rows ingested') == 1
+    assert 'Ingest complete: 2000 rows' in result.output
+    assert table_counts(cli_app)['tracks'] == 2000
+
+    result = ingest(cli_app)
+    assert 'already ingested' in result.output
+
+
+def test_interrupted_ingest_resumes_from_its_checkpoint(cli_app, tmp_path, monkeypatch):
+    result = ingest(cli_app, '--batch-size', '500')
+    assert result.exit_code == 0, result.output
+    expected_counts = table_counts(cli_app)
+
+    # Fail while writing the third batch; the first two batches and their checkpoint stay committed.
+    original_bulk_add_tracks = SqlAlchemyRepository.bulk_add_tracks
+    batches = []
+
+    def failing_bulk_add_tracks(self, tracks):
+        batches.append(len(tracks))
+        if len(batches) == 3:
+            raise RuntimeError('interrupted')
+        original_bulk_add_tracks(self, tracks)
+
+    monkeypatch.setattr(SqlAlchemyRepository, 'bulk_add_tracks', failing_bulk_add_tracks)
+    result = ingest(cli_app, '--batch-size', '500', '--restart')
+    assert result.exit_code != 0
+    assert table_counts(cli_app)['tracks'] == 1000
+
+    monkeypatch.setattr(SqlAlchemyRepository, 'bulk_add_tracks', original_bulk_add_tracks)
+    result = ingest(cli_app, '--batch-size', '500')
+    assert result.exit_code == 0, result.output
+    assert 'Resuming after row 1000' in result.output
+    assert table_counts(cli_app) == expected_counts
+
+
+def test_create_app_skips_population_of_an_ingested_database(cli_app):
+    ingest(cli_app, '--batch-size', '1000')
+
+    clear_mappers()
+    app = create_app({
+        'TESTING': False,
+        'REPOSITORY': 'database',
+        'TEST_DATA_PATH': TEST_DATA_PATH_DATABASE_LIMITED,
+        'SQLALCHEMY_DATABASE_URI': cli_app.config['SQLALCHEMY_DATABASE_URI'],
+        'CATALOG_SYNC': 'incremental',
+    })
+
+    assert 'ingest_stats' not in app.extensions
+
+
+def test_ingest_adopts_the_catalog_that_start_up_loaded_from_the_same_files(database_app):
+    assert table_counts(database_app)['tracks'] == 2000
+
+    result = ingest(database_app)
+
+    assert result.exit_code == 0, result.output
+    assert 'Adopted the catalog loaded at start-up (2000 rows)' in result.output
+    assert 'already ingested' in ingest(database_app).output
+
+
+def test_ingest_replaces_a_catalog_that_start_up_loaded_from_other_files(database_app, tmp_path):
+    source = tmp_path / 'other'
+    source.mkdir()
+    for name in ('raw_albums_excerpt.csv', 'raw_tracks_excerpt.csv'):
+        (source / name).write_bytes((TEST_DATA_PATH_DATABASE_LIMITED / name).read_bytes())
+
+    result = database_app.test_cli_runner().invoke(args=['ingest', '--source', str(source), '--batch-size', '500'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Ingest complete: 2000 rows' in result.output
+    assert table_counts(database_app)['tracks'] == 2000
+
+
+def test_rebuild_ratings_reports_the_reviews_it_counted(cli_app):
+    result = cli_app.test_cli_runner().invoke(args=['rebuild-ratings'])
+
+    assert result.exit_code == 0, result.output
+    assert 'from 0 reviews' in result.output
+
+
+def test_a_restarted_ingest_keeps_the_rating_aggregates_of_reviewed_tracks(cli_app):
+    ingest(cli_app, '--batch-size', '500')
+    engine = create_engine(cli_app.config['SQLALCHEMY_DATABASE_URI'])
+    engine.execute(users_table.insert(), {'user_name': 'dave', 'password': '123456789'})
+    engine.execute(reviews_table.insert(), {'user_name': 'dave', 'track_id': 2, 'rating': 4})
+    engine.execute(rating_aggregates_update())
+
+    result = ingest(cli_app, '--batch-size', '500', '--restart')
+
+    assert result.exit_code == 0, result.output
+    assert engine.execute(select(tracks_table.c.rating_count, tracks_table.c.rating_sum).where(
+        tracks_table.c.track_id == 2)).fetchone() == (1, 4)
+    assert engine.execute(select(func.sum(tracks_table.c.rating_count))).scalar() == 1
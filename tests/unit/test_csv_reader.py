@@ -0,0 +1,108 @@
+import io
+
+import pytest
+
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.csv_reader import (
+    parse_genres_field, extract_genres, populate, read_track_records, split_tracks_file, parse_tracks_chunk,
+    tracks_file_path, read_projected_rows, project_rows
+)
+from tests.conftest import TEST_DATA_PATH_DATABASE_LIMITED
+
+
+def test_parse_genres_field_reads_genre_ids_and_titles():
+    raw = ("[{'genre_id': '21', 'genre_title': 'Hip-Hop', 'genre_url': 'http://freemusicarchive.org/genre/Hip-Hop/'}, "
+           "{'genre_id': '76', 'genre_title': 'Experimental Pop', 'genre_url': 'http://freemusicarchive.org/genre/x/'}]")
+    assert parse_genres_field(raw) == (('21', 'Hip-Hop'), ('76', 'Experimental Pop'))
+
+
+def test_parse_genres_field_handles_double_quoted_titles():
+    raw = "[{'genre_id': '5', 'genre_title': \"Children's\", 'genre_url': 'http://freemusicarchive.org/genre/Kids/'}]"
+    assert parse_genres_field(raw) == (('5', "Children's"),)
+
+
+def test_parse_genres_field_falls_back_for_other_layouts():
+    raw = "[{'genre_title': 'Rock', 'genre_id': '12'}]"
+    assert parse_genres_field(raw) == (('12', 'Rock'),)
+
+
+def test_parse_genres_field_returns_the_same_result_for_repeated_values():
+    raw = "[{'genre_id': '12', 'genre_title': 'Rock', 'genre_url': 'http://freemusicarchive.org/genre/Rock/'}]"
+    assert parse_genres_field(raw) is parse_genres_field(raw)
+
+
+def test_extract_genres_ignores_empty_and_malformed_values():
+    assert extract_genres({'track_genres': ''}) == ()
+    assert extract_genres({'track_genres': "[{'genre_id': '12'"}) == ()
+
+
+def test_projected_rows_hold_the_columns_in_the_order_asked_for():
+    csv_file = io.StringIO('a,b,c\n1,2,3\n4,5,6\n')
+    assert list(read_projected_rows(csv_file, ['c', 'a'])) == [('3', '1'), ('6', '4')]
+
+
+def test_projected_rows_pad_short_rows_with_none():
+    rows = [['1', '2', '3'], ['4'], ['7', '8']]
+    assert list(project_rows(rows, ['a', 'b', 'c'], ['a', 'c'])) == [('1', '3'), ('4', None), ('7', None)]
+
+
+def test_projected_rows_skip_blank_lines():
+    csv_file = io.StringIO('a,b\n1,2\n\n3,4\n')
+    assert list(read_projected_rows(csv_file, ['a', 'b'])) == [('1', '2'), ('3', '4')]
+
+
+def test_a_projected_column_missing_from_the_header_raises_value_error():
+    with pytest.raises(ValueError):
+        list(read_projected_rows(io.StringIO('a,b\n1,2\n'), ['a', 'missing']))
+
+
+def test_a_one_column_projection_yields_one_value_tuples():
+    csv_file = io.StringIO('a,b\n1,2\n3\n')
+    assert list(read_projected_rows(csv_file, ['b'])) == [('2',), (None,)]
+    assert list(read_projected_rows(io.StringIO(''), ['b'])) == []
+
+
+def test_split_tracks_file_cuts_chunks_on_row_boundaries():
+    track_file = tracks_file_path(TEST_DATA_PATH_DATABASE_LIMITED)
+    fieldnames, chunks = split_tracks_file(track_file, 64 * 1024)
+
+    assert fieldnames[0] == 'track_id'
+    assert len(chunks) > 1
+    rows = [row for start, end in chunks for row in parse_tracks_chunk(track_file, fieldnames, start, end)]
+    assert len(rows) == 2000
+
+
+def test_parallel_records_match_the_serial_path():
+    serial = list(read_track_records(TEST_DATA_PATH_DATABASE_LIMITED))
+    parallel = list(read_track_records(TEST_DATA_PATH_DATABASE_LIMITED, workers=2, chunk_bytes=64 * 1024))
+
+    assert parallel == serial
+
+
+def test_parallel_populate_builds_the_same_catalog():
+    serial_repo = MemoryRepository()
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, serial_repo)
+    parallel_repo = MemoryRepository()
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, parallel_repo, workers=2)
+
+    def catalog(repo):
+        return [
+            (track.track_id, track.title, track.artist, track.album, track.genres) for track in repo.get_tracks()
+        ]
+
+    assert catalog(parallel_repo) == catalog(serial_repo)
+    assert parallel_repo.get_artists() == serial_repo.get_artists()
+    assert parallel_repo.get_genres() == serial_repo.get_genres()
+
+
+def test_populate_joins_tracks_to_the_albums_file_by_album_id():
+    repo = MemoryRepository()
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, repo)
+    albums = {album.album_id: album for album in repo.get_albums()}
+
+    album = albums[1]
+    assert (album.title, album.release_year, album.album_type) == ('AWOL - A Way Of Life', 2009, 'Album')
+    assert [track.track_id for track in album.tracks][:3] == [2, 3, 5]
+    assert all(track.album is album for track in album.tracks)
+    # Albums that share a title are kept apart.
+    assert albums[58].title == albums[250].title == 'mp3'
@@ -1,21 +1,27 @@
 from typing import List
 
 import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
 from music.adapters.Repository import RepositoryException
+from music.adapters.csv_reader import populate
+from music.adapters.database_repository import SqlAlchemyRepository
+from music.adapters.orm import metadata, map_model_to_tables, tracks_table
 
 from music.domainmodel.user import User
 from music.domainmodel.track import Track
 from music.domainmodel.genre import Genre
 from music.domainmodel.review import Review
-from music.utilities.services import make_review
-from tests.conftest import session_factory
+from music.utilities.services import make_review, tracks_to_dict
+from tests.conftest import session_factory, TEST_DATABASE_URI_IN_MEMORY, TEST_DATA_PATH_DATABASE_LIMITED
 
 repo = session_factory()
 
 def test_read_csv_files():
     assert repo.get_number_of_tracks() == 2000
     assert len(repo.get_artists()) == 263
-    assert len(repo.get_albums()) == 428
+    assert len(repo.get_albums()) == 431
     assert len(repo.get_genres()) == 60
 
 
@@ -56,6 +62,15 @@ def test_repository_can_retrieve_track():
     assert track.album.album_id == 1
 
 
+def test_repository_loads_album_details_and_tracks():
+    album = repo.get_track(2).album
+
+    assert album.release_year == 2009
+    assert album.album_type == 'Album'
+    assert album.album_url == 'http://freemusicarchive.org/music/AWOL/AWOL_-_A_Way_Of_Life/'
+    assert [track.track_id for track in album.tracks][:3] == [2, 3, 5]
+
+
 def test_repository_does_not_retrieve_a_non_existent_track():
     track = repo.get_track(101)
     assert track is None
@@ -82,6 +97,163 @@ def test_repository_can_get_first_genre():
     assert track.track_id == 2
 
 
+def test_repository_can_get_artists_and_genres_by_id():
+    track = repo.get_track(2)
+
+    assert repo.get_artist(track.artist.artist_id) is track.artist
+    assert repo.get_genre(track.genres[0].genre_id) is track.genres[0]
+    assert repo.get_artist(-1) is None
+    assert repo.get_genre(-1) is None
+
+
+def test_repository_returns_pages_of_the_full_listings():
+    tracks = repo.get_tracks_page(0, repo.get_number_of_tracks())
+    assert [track.track_id for track in tracks] == sorted(track.track_id for track in repo.get_tracks())
+    assert repo.get_tracks_page(5, 3) == tracks[5:8]
+
+    by_artist = repo.get_tracks_by_artist('AWOL')
+    assert repo.get_number_of_tracks_by_artist('AWOL') == len(by_artist) == 4
+    assert repo.get_tracks_page_by_artist('AWOL', 2, 5) == sorted(by_artist)[2:]
+    by_album = repo.get_tracks_by_album('AWOL_-_A_Way_Of_Life')
+    assert repo.get_number_of_tracks_by_album('AWOL_-_A_Way_Of_Life') == len(by_album)
+    assert repo.get_tracks_page_by_album('AWOL_-_A_Way_Of_Life', 0, 2) == by_album[:2]
+    rock_ids = repo.get_track_ids_for_genre('Rock')
+    assert repo.get_number_of_tracks_by_genre('Rock') == len(rock_ids)
+    assert [track.track_id for track in repo.get_tracks_page_by_genre('Rock', 10, 5)] == rock_ids[10:15]
+    assert repo.get_number_of_tracks_by_genre('No such genre') == 0
+    assert repo.get_tracks_page_by_artist('No_such_artist', 0, 5) == []
+
+
+def count_queries(function):
+    statements = []
+    engine = repo._session_cm.session.get_bind()
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        function()
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return len(statements)
+
+
+@pytest.mark.parametrize('size', [1, 50, 500])
+def test_rendering_a_page_of_tracks_takes_the_same_number_of_queries_whatever_its_size(size):
+    repo.reset_session()
+    # One query for the tracks with their artists and albums joined in, one for the genres of all of them.
+    assert count_queries(lambda: tracks_to_dict(repo.get_tracks_page(0, size))) == 2
+    repo.reset_session()
+    assert count_queries(lambda: tracks_to_dict(repo.get_tracks_page_by_genre('Rock', 0, size))) == 2
+
+
+def test_relationships_left_out_of_the_track_loading_are_loaded_per_track():
+    lazy_repo = SqlAlchemyRepository(repo._session_cm.session.session_factory, track_loading={})
+    lazy_repo.reset_session()
+    assert count_queries(lambda: tracks_to_dict(lazy_repo.get_tracks_page(0, 50))) > 50
+    lazy_repo.close_session()
+
+
+def query_plans(function):
+    """ Runs function and returns the EXPLAIN QUERY PLAN details of every statement it executed. """
+    executed = []
+    engine = repo._session_cm.session.get_bind()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        function()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    with engine.connect() as connection:
+        return [
+            [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+            for statement, parameters in executed
+        ]
+
+
+@pytest.mark.parametrize('lookup', [
+    lambda: repo.get_tracks_page_by_artist('AWOL', 1, 2),
+    lambda: repo.get_number_of_tracks_by_artist('AWOL'),
+    lambda: repo.get_neighbor_track_ids_by_artist('AWOL', 3),
+    lambda: repo.get_tracks_by_album('AWOL_-_A_Way_Of_Life'),
+    lambda: repo.get_tracks_page_by_album('AWOL_-_A_Way_Of_Life', 0, 2),
+    lambda: repo.get_neighbor_track_ids_by_album('AWOL_-_A_Way_Of_Life', 3),
+    lambda: repo.get_track_ids_for_genre('Rock'),
+    lambda: repo.get_tracks_page_by_genre('Rock', 10, 5),
+    lambda: repo.get_number_of_tracks_by_genre('Rock'),
+    lambda: repo.get_neighbor_track_ids_by_genre('Rock', 500),
+    lambda: tracks_to_dict(repo.get_tracks_by_id([2, 3, 5])),
+], ids=['artist_page', 'artist_count', 'artist_neighbors', 'album_tracks', 'album_page', 'album_neighbors',
+        'genre_ids', 'genre_page', 'genre_count', 'genre_neighbors', 'tracks_by_id_with_relationships'])
+def test_filtered_lookups_search_indexes_instead_of_scanning_tables(lookup):
+    repo.reset_session()
+    plans = query_plans(lookup)
+
+    assert plans
+    for plan in plans:
+        # Every table is reached through an index search, never by a full scan of the table or of an index.
+        assert not [detail for detail in plan if detail.startswith('SCAN')], plan
+    repo.reset_session()
+
+
+def test_the_genre_listing_reads_only_the_covering_index():
+    plans = query_plans(lambda: repo.get_track_ids_for_genre('Rock'))
+
+    assert any('USING COVERING INDEX ix_track_genres_genre_id_track_id' in detail for detail in plans[-1])
+
+
+@pytest.mark.parametrize('lookup', [
+    lambda: repo.get_number_of_tracks_by_genre('Rock'),
+    lambda: repo.get_neighbor_track_ids_by_genre('Rock', 500),
+], ids=['genre_count', 'genre_neighbors'])
+def test_genre_counts_and_neighbors_are_answered_from_the_genre_index_alone(lookup):
+    for plan in query_plans(lookup):
+        assert not [detail for detail in plan if 'tracks' in detail.split() or 'INTEGER PRIMARY KEY' in detail], plan
+
+
+def test_a_page_reads_only_its_own_tracks_from_the_tracks_table():
+    repo.reset_session()
+    plans = query_plans(lambda: repo.get_tracks_page_by_genre('Rock', 100, 2))
+
+    # The offset is applied to the ids from the index; the tracks are then fetched by primary key.
+    assert plans[0][:3] == [
+        'SEARCH tracks USING INTEGER PRIMARY KEY (rowid=?)',
+        'LIST SUBQUERY 2',
+        'SEARCH track_genres USING COVERING INDEX ix_track_genres_genre_id_track_id (genre_id=?)',
+    ]
+    repo.reset_session()
+
+
+def test_repository_returns_the_neighbors_of_a_track_in_each_listing():
+    ids = [track.track_id for track in repo.get_tracks_page(0, 3)]
+    assert repo.get_neighbor_track_ids(ids[1]) == (ids[0], ids[2])
+    assert repo.get_neighbor_track_ids(ids[0]) == (None, ids[1])
+
+    artist_ids = sorted(track.track_id for track in repo.get_tracks_by_artist('AWOL'))
+    assert repo.get_neighbor_track_ids_by_artist('AWOL', artist_ids[1]) == (artist_ids[0], artist_ids[2])
+    assert repo.get_neighbor_track_ids_by_artist('AWOL', artist_ids[-1]) == (artist_ids[-2], None)
+    album_ids = [track.track_id for track in repo.get_tracks_by_album('AWOL_-_A_Way_Of_Life')]
+    assert repo.get_neighbor_track_ids_by_album('AWOL_-_A_Way_Of_Life', album_ids[0]) == (None, album_ids[1])
+    rock_ids = repo.get_track_ids_for_genre('Rock')
+    assert repo.get_neighbor_track_ids_by_genre('Rock', rock_ids[4]) == (rock_ids[3], rock_ids[5])
+    assert repo.get_neighbor_track_ids_by_genre('No such genre', rock_ids[4]) == (None, None)
+
+
+def test_repository_tells_whether_a_track_belongs_to_a_listing():
+    artist_ids = [track.track_id for track in repo.get_tracks_by_artist('AWOL')]
+    other_id = next(track.track_id for track in repo.get_tracks_page(0, 100) if track.track_id not in artist_ids)
+    assert repo.has_track_by_artist('AWOL', artist_ids[0])
+    assert not repo.has_track_by_artist('AWOL', other_id)
+    assert repo.has_track_by_album('AWOL_-_A_Way_Of_Life', artist_ids[0])
+    assert not repo.has_track_by_album('AWOL_-_A_Way_Of_Life', other_id)
+    rock_ids = repo.get_track_ids_for_genre('Rock')
+    assert repo.has_track_by_genre('Rock', rock_ids[4])
+    assert not repo.has_track_by_genre('Rock', 999999)
+    assert not repo.has_track_by_genre('No such genre', rock_ids[4])
+
+
 def test_repository_can_get_tracks_by_ids():
     tracks = repo.get_tracks_by_id([2, 3, 5])
 
@@ -109,6 +281,20 @@ def test_repository_returns_an_empty_list_for_non_existent_genre():
     assert len(track_ids) == 0
 
 
+def test_repository_bulk_load_links_tracks_to_genres():
+    track = repo.get_track(2)
+    assert [genre.name for genre in track.genres] == ['Hip-Hop']
+    assert 2 in repo.get_track_ids_for_genre('Hip-Hop')
+
+
+def test_repository_can_combine_genres():
+    hip_hop = set(repo.get_track_ids_for_genre('Hip-Hop'))
+    rock = set(repo.get_track_ids_for_genre('Rock'))
+
+    assert repo.get_track_ids_for_genres(['Hip-Hop', 'Rock'], match_all=False) == sorted(hip_hop | rock)
+    assert repo.get_track_ids_for_genres(['Hip-Hop', 'Rock']) == sorted(hip_hop & rock)
+
+
 def test_repository_can_add_a_genre():
     genre = Genre(985,'Motoring')
     repo.add_genre(genre)
@@ -116,6 +302,17 @@ def test_repository_can_add_a_genre():
     assert genre in repo.get_genres()
 
 
+def test_a_stored_track_tagged_with_a_genre_joins_its_listing():
+    repo.add_track_genre(2, Genre(986, 'Tagged Later'))
+    repo.add_track_genre(3, Genre(986, 'Tagged Later'))
+
+    assert repo.get_track_ids_for_genre('Tagged Later') == [2, 3]
+    assert repo.get_number_of_tracks_by_genre('Tagged Later') == 2
+    assert Genre(986, 'Tagged Later') in repo.get_track(3).genres
+    with pytest.raises(RepositoryException):
+        repo.add_track_genre(999999, Genre(986, 'Tagged Later'))
+
+
 def test_repository_can_add_a_comment():
     user = User('123','12345678')
     repo.add_user(user)
@@ -128,9 +325,48 @@ def test_repository_can_add_a_comment():
     assert review in repo.get_reviews()
 
 
+def test_adding_a_review_updates_the_rating_aggregates_of_its_track():
+    track = repo.get_track(3)
+    count, total = track.rating_count, track.rating_sum
+    user = User('ratings', '12345678')
+    repo.add_user(user)
+
+    repo.add_review(make_review(track, user, 4))
+
+    track = repo.get_track(3)
+    assert (track.rating_count, track.rating_sum) == (count + 1, total + 4)
+
+
+def test_rating_aggregates_can_be_rebuilt_from_the_reviews():
+    with repo._session_cm as scm:
+        scm.session.execute(tracks_table.update().values(rating_count=0, rating_sum=0))
+        scm.commit()
+
+    assert repo.rebuild_rating_aggregates() == len(repo.get_reviews())
+    for review in repo.get_reviews():
+        track = repo.get_track(review.track.track_id)
+        assert track.rating_count == len(track.reviews)
+        assert track.rating_sum == sum(review.rating for review in track.reviews)
+
+
 def test_repository_does_not_add_a_comment_without_a_user():
     track = repo.get_track(2)
     review = Review(track, None, 3)
 
     with pytest.raises(RepositoryException):
-        repo.add_review(review)
\ No newline at end of file
+        repo.add_review(review)
+
+def test_populate_commits_the_catalog_in_a_single_transaction():
+    clear_mappers()
+    engine = create_engine(TEST_DATABASE_URI_IN_MEMORY)
+    metadata.create_all(engine)
+    map_model_to_tables()
+    bulk_repo = SqlAlchemyRepository(sessionmaker(autocommit=False, autoflush=True, bind=engine))
+
+    commits = []
+    event.listen(engine, 'commit', lambda conn: commits.append(conn))
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, bulk_repo)
+
+    assert len(commits) == 1
+    assert bulk_repo.get_number_of_tracks() == 2000
+    assert len(bulk_repo.get_genres()) == 60
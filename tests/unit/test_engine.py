@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+from sqlalchemy.pool import NullPool, QueuePool
+
+from music.adapters.engine import create_database_engine
+
+
+def pragma(engine, name):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+
+
+def test_the_default_profile_is_a_null_pool_without_pragmas(tmp_path):
+    engine = create_database_engine({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'music.db'}"})
+
+    assert isinstance(engine.pool, NullPool)
+    assert pragma(engine, 'journal_mode') == 'delete'
+    assert pragma(engine, 'mmap_size') == 0
+
+
+def test_the_tuned_profile_sets_its_pragmas_on_every_connection(tmp_path):
+    engine = create_database_engine({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'music.db'}",
+        'DATABASE_POOL': 'queue',
+        'DATABASE_POOL_SIZE': 4,
+        'SQLITE_JOURNAL_MODE': 'WAL',
+        'SQLITE_SYNCHRONOUS': 'normal',
+        'SQLITE_CACHE_SIZE': -16384,
+        'SQLITE_MMAP_SIZE': 1 << 26,
+        'SQLITE_BUSY_TIMEOUT': 2500,
+    })
+
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 4
+    # Connections opened by other threads are set up the same way.
+    results = []
+    thread = threading.Thread(target=lambda: results.append(pragma(engine, 'busy_timeout')))
+    thread.start()
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() == 2500
+        assert pragma(engine, 'journal_mode') == 'wal'
+    thread.join()
+    assert results == [2500]
+    assert pragma(engine, 'synchronous') == 1
+    assert pragma(engine, 'cache_size') == -16384
+    assert pragma(engine, 'mmap_size') == 1 << 26
+
+
+@pytest.mark.parametrize('setting, value', [
+    ('DATABASE_POOL', 'static'), ('DATABASE_POOL', 'thread'), ('SQLITE_JOURNAL_MODE', 'journal'), ('SQLITE_SYNCHRONOUS', 'sometimes'),
+])
+def test_unknown_settings_are_rejected(setting, value):
+    with pytest.raises(ValueError):
+        create_database_engine({'SQLALCHEMY_DATABASE_URI': 'sqlite://', setting: value})
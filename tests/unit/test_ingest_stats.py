@@ -0,0 +1,46 @@
+import json
+
+from music import create_app
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.csv_reader import populate
+from tests.conftest import TEST_DATA_PATH_DATABASE_LIMITED
+
+
+def test_populate_reports_phases_and_entities():
+    repo = MemoryRepository()
+    stats = populate(TEST_DATA_PATH_DATABASE_LIMITED, repo)
+
+    assert stats.rows == len(repo.get_tracks())
+    assert stats.entities['tracks'] == len(repo.get_tracks())
+    assert stats.entities['artists'] == len(repo.get_artists())
+    assert stats.entities['albums'] == len(repo.get_albums())
+    assert stats.entities['genres'] == len(repo.get_genres())
+    for phase in ('csv_decode', 'genre_parse', 'track_build', 'linking', 'repository_write'):
+        assert stats.phases[phase] >= 0
+    assert sum(stats.phases.values()) <= stats.total_seconds
+    assert stats.rows_per_second > 0
+
+
+def test_parallel_populate_reports_the_same_entities():
+    serial = populate(TEST_DATA_PATH_DATABASE_LIMITED, MemoryRepository())
+    parallel = populate(TEST_DATA_PATH_DATABASE_LIMITED, MemoryRepository(), workers=2)
+
+    assert parallel.entities == serial.entities
+    assert 'csv_decode' in parallel.phases
+
+
+def test_create_app_keeps_and_dumps_the_ingest_stats(tmp_path):
+    stats_path = tmp_path / 'ingest.json'
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'memory',
+        'TEST_DATA_PATH': TEST_DATA_PATH_DATABASE_LIMITED,
+        'MEMORY_SNAPSHOT_PATH': '',
+        'INGEST_STATS_PATH': str(stats_path),
+    })
+
+    ingest_stats = app.extensions['ingest_stats']
+    assert ingest_stats['source'] == 'csv'
+    assert ingest_stats['entities']['tracks'] == ingest_stats['rows'] > 0
+    with open(stats_path) as stats_file:
+        assert json.load(stats_file) == ingest_stats
@@ -0,0 +1,400 @@
+import threading
+
+import pytest
+from sqlalchemy.orm import clear_mappers
+
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.Repository import RepositoryException
+from music.adapters.csv_reader import populate
+from music.adapters.orm import map_model_to_tables
+from music.domainmodel.artist import Artist
+from music.domainmodel.album import Album
+from music.domainmodel.genre import Genre
+from music.domainmodel.track import Track
+from music.domainmodel.user import User
+from music.utilities.services import make_review
+from tests.conftest import TEST_DATA_PATH_DATABASE_LIMITED
+
+
+@pytest.fixture(params=['objects', 'columnar'])
+def populated_repo(request):
+    repo = MemoryRepository(request.param)
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, repo)
+    return repo
+
+
+def make_track(track_id, artist, album):
+    track = Track(track_id, f'Track {track_id}')
+    track.artist = artist
+    track.album = album
+    return track
+
+
+def test_artist_and_album_lookups_match_a_scan_of_every_track(populated_repo):
+    tracks = populated_repo.get_tracks()
+    for artist in populated_repo.get_artists()[:50]:
+        url_name = artist.full_name.replace(" ", "_")
+        expected = [track for track in tracks if track.artist.full_name == artist.full_name]
+        assert populated_repo.get_tracks_by_artist(url_name) == expected
+    for album in populated_repo.get_albums()[:50]:
+        url_title = album.title.replace(" ", "_")
+        expected = [track for track in tracks if track.album is not None and track.album.title == album.title]
+        assert populated_repo.get_tracks_by_album(url_title) == expected
+
+
+def test_lookups_of_unknown_names_return_an_empty_list(populated_repo):
+    assert populated_repo.get_tracks_by_artist('No_such_artist') == []
+    assert populated_repo.get_tracks_by_album('No_such_album') == []
+    assert populated_repo.get_track_ids_for_artist_id(-1) == []
+
+
+@pytest.mark.parametrize('storage', ['objects', 'columnar'])
+def test_indexes_keep_track_id_order_when_tracks_arrive_out_of_order(storage):
+    repo = MemoryRepository(storage)
+    artist = Artist(1, 'Some Artist')
+    album = Album(10, 'Some Album')
+    repo.add_artist(artist)
+    repo.add_album(album)
+    for track_id in (5, 2, 9, 2, 7):
+        repo.add_track(make_track(track_id, artist, album))
+
+    assert [track.track_id for track in repo.get_tracks_by_artist('Some_Artist')] == [2, 5, 7, 9]
+    assert [track.track_id for track in repo.get_tracks_by_album('Some Album')] == [2, 5, 7, 9]
+    assert repo.get_track_ids_for_artist_id(1) == [2, 5, 7, 9]
+    assert repo.get_track_ids_for_album_id(10) == [2, 5, 7, 9]
+    assert [track.track_id for track in repo.get_tracks()] == [2, 5, 7, 9]
+
+
+@pytest.mark.parametrize('concurrency', ['none', 'copy_on_write'])
+def test_adding_an_artist_or_album_indexes_the_stored_tracks_linked_to_it(concurrency):
+    repo = MemoryRepository(concurrency=concurrency)
+    for track_id in (3, 1):
+        repo.add_track(Track(track_id, f'Track {track_id}'))
+    artist = Artist(1, 'Late Artist')
+    album = Album(10, 'Late Album')
+    for track_id in (3, 1, 4):
+        # Track 4 is never added to the repository, so it stays out of the indexes.
+        track = repo.get_track(track_id) or Track(track_id, f'Track {track_id}')
+        artist.add_track(track)
+        album.add_track(track)
+
+    repo.add_artist(artist)
+    repo.add_album(album)
+
+    assert [track.track_id for track in repo.get_tracks_by_artist('Late_Artist')] == [1, 3]
+    assert [track.track_id for track in repo.get_tracks_by_album('Late Album')] == [1, 3]
+    assert repo.get_track_ids_for_artist_id(1) == [1, 3]
+    assert repo.get_track_ids_for_album_id(10) == [1, 3]
+
+
+@pytest.mark.parametrize('concurrency', ['none', 'copy_on_write'])
+def test_adding_a_track_again_links_it_to_its_album_once(concurrency):
+    repo = MemoryRepository(concurrency=concurrency)
+    album = Album(10, 'Some Album')
+    repo.add_album(album)
+    for track_id in (2, 3):
+        repo.add_track(make_track(track_id, None, album))
+
+    repo.add_track(make_track(2, None, album))
+    repo.add_track(repo.get_track(3))
+
+    assert [track.track_id for track in album.tracks] == [2, 3]
+    assert repo.get_number_of_tracks_by_album('Some Album') == 2
+
+
+def test_albums_are_a_list_without_duplicates(populated_repo):
+    albums = populated_repo.get_albums()
+    populated_repo.add_album(albums[0])
+
+    assert len(populated_repo.get_albums()) == len(albums) == len(set(album.album_id for album in albums))
+
+
+def test_genre_posting_lists_match_a_scan_of_every_track(populated_repo):
+    tracks = populated_repo.get_tracks()
+    for genre in populated_repo.get_genres():
+        expected = [track.track_id for track in tracks if genre in track.genres]
+        assert populated_repo.get_track_ids_for_genre(genre.name) == expected
+    assert populated_repo.get_track_ids_for_genre('No such genre') == []
+
+
+def test_multi_genre_queries_intersect_or_unite_the_posting_lists(populated_repo):
+    rock = set(populated_repo.get_track_ids_for_genre('Rock'))
+    punk = set(populated_repo.get_track_ids_for_genre('Punk'))
+
+    assert populated_repo.get_track_ids_for_genres(['Rock', 'Punk']) == sorted(rock & punk)
+    assert populated_repo.get_track_ids_for_genres(['Rock', 'Punk'], match_all=False) == sorted(rock | punk)
+    assert populated_repo.get_track_ids_for_genres(['Rock', 'No such genre']) == []
+    assert populated_repo.get_track_ids_for_genres([]) == []
+
+
+def test_users_are_found_by_their_normalized_name():
+    repo = MemoryRepository()
+    user = User('Dave', '123456789')
+    repo.add_user(user)
+
+    assert repo.get_user('dave') is user
+    assert repo.get_user(' DAVE ') is user
+    assert repo.get_user('prince') is None
+
+
+def test_adding_a_user_with_a_taken_name_raises_an_exception():
+    repo = MemoryRepository()
+    repo.add_user(User('dave', '123456789'))
+
+    with pytest.raises(RepositoryException):
+        repo.add_user(User(' Dave', '987654321'))
+
+
+def test_artists_and_genres_are_found_by_id_and_added_once(populated_repo):
+    artists = list(populated_repo.get_artists())
+    genres = list(populated_repo.get_genres())
+    for artist in artists:
+        populated_repo.add_artist(artist)
+        assert populated_repo.get_artist(artist.artist_id) is artist
+    for genre in genres:
+        populated_repo.add_genre(genre)
+        assert populated_repo.get_genre(genre.genre_id) is genre
+
+    assert populated_repo.get_artists() == artists
+    assert populated_repo.get_genres() == genres
+    assert populated_repo.get_artist(-1) is None
+    assert populated_repo.get_genre(-1) is None
+
+
+def catalog(repo):
+    return [
+        (track.track_id, track.title, track.track_url, track.track_duration, track.video_hyperlink,
+         track.artist, track.album, track.genres)
+        for track in repo.get_tracks()
+    ]
+
+
+def test_columnar_storage_holds_the_same_catalog():
+    object_repo = MemoryRepository('objects')
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, object_repo)
+    columnar_repo = MemoryRepository('columnar')
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, columnar_repo)
+
+    # Video links are picked at random during population.
+    assert [row[:4] + row[5:] for row in catalog(columnar_repo)] == \
+           [row[:4] + row[5:] for row in catalog(object_repo)]
+    assert columnar_repo.get_tracks() == object_repo.get_tracks()
+    assert columnar_repo.get_first_track() == object_repo.get_first_track()
+    assert columnar_repo.get_last_track() == object_repo.get_last_track()
+    assert columnar_repo.track_index(columnar_repo.get_track(5)) == object_repo.track_index(object_repo.get_track(5))
+
+
+@pytest.fixture
+def unmapped_model():
+    # With the domain model mapped, the ORM would track the links of a Review to its track, and it does not know
+    # about track views; the memory repository runs unmapped in the app.
+    clear_mappers()
+    yield
+    map_model_to_tables()
+
+
+def test_columnar_track_views_are_shared_and_keep_their_reviews(unmapped_model):
+    repo = MemoryRepository('columnar')
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, repo)
+    user = User('dave', '123456789')
+    repo.add_user(user)
+
+    track = repo.get_track(2)
+    assert repo.get_track(2) is track
+    assert repo.get_track(1) is None
+    review = make_review(track, user, 4)
+    repo.add_review(review)
+    del track
+
+    assert repo.get_track(2).reviews == [review]
+    assert review.track == repo.get_track(2) and repo.get_track(2) == review.track
+
+
+def test_columnar_track_views_are_read_only():
+    repo = MemoryRepository('columnar')
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, repo)
+
+    with pytest.raises(AttributeError):
+        repo.get_track(2).title = 'Another title'
+
+
+def test_unknown_storage_is_rejected():
+    with pytest.raises(ValueError):
+        MemoryRepository('compressed')
+
+
+@pytest.mark.parametrize('storage', ['objects', 'columnar'])
+def test_rating_aggregates_follow_the_added_reviews(storage, unmapped_model):
+    repo = MemoryRepository(storage)
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, repo)
+    dave, fmercury = User('dave', '123456789'), User('fmercury', '123456789')
+    track = repo.get_track(2)
+    repo.add_review(make_review(track, dave, 4))
+    review = make_review(track, fmercury, 1)
+    repo.add_review(review)
+    repo.add_review(review)
+
+    assert (track.rating_count, track.rating_sum) == (2, 5)
+    assert repo.get_track(3).rating_count == 0
+
+    track.clear_ratings()
+    assert repo.rebuild_rating_aggregates() == 2
+    assert (repo.get_track(2).rating_count, repo.get_track(2).rating_sum) == (2, 5)
+
+
+def test_pages_are_slices_of_the_full_listings(populated_repo):
+    tracks = list(populated_repo.get_tracks())
+    assert populated_repo.get_tracks_page(0, 3) == tracks[:3]
+    assert populated_repo.get_tracks_page(len(tracks) - 2, 5) == tracks[-2:]
+    assert populated_repo.get_tracks_page(len(tracks), 5) == []
+
+    by_artist = populated_repo.get_tracks_by_artist('AWOL')
+    assert populated_repo.get_number_of_tracks_by_artist('AWOL') == len(by_artist)
+    assert populated_repo.get_tracks_page_by_artist('AWOL', 1, 2) == by_artist[1:3]
+    by_album = populated_repo.get_tracks_by_album('AWOL_-_A_Way_Of_Life')
+    assert populated_repo.get_number_of_tracks_by_album('AWOL_-_A_Way_Of_Life') == len(by_album)
+    assert populated_repo.get_tracks_page_by_album('AWOL_-_A_Way_Of_Life', 0, 2) == by_album[:2]
+    rock_ids = populated_repo.get_track_ids_for_genre('Rock')
+    assert populated_repo.get_number_of_tracks_by_genre('Rock') == len(rock_ids)
+    assert [track.track_id for track in populated_repo.get_tracks_page_by_genre('Rock', 10, 5)] == rock_ids[10:15]
+    assert populated_repo.get_number_of_tracks_by_genre('No such genre') == 0
+
+
+def test_neighbor_track_ids_follow_each_listing(populated_repo):
+    ids = [track.track_id for track in populated_repo.get_tracks()]
+    assert populated_repo.get_neighbor_track_ids(ids[1]) == (ids[0], ids[2])
+    assert populated_repo.get_neighbor_track_ids(ids[0]) == (None, ids[1])
+    assert populated_repo.get_neighbor_track_ids(ids[-1]) == (ids[-2], None)
+
+    artist_ids = [track.track_id for track in populated_repo.get_tracks_by_artist('AWOL')]
+    assert populated_repo.get_neighbor_track_ids_by_artist('AWOL', artist_ids[1]) == (artist_ids[0], artist_ids[2])
+    album_ids = [track.track_id for track in populated_repo.get_tracks_by_album('AWOL_-_A_Way_Of_Life')]
+    assert populated_repo.get_neighbor_track_ids_by_album('AWOL_-_A_Way_Of_Life', album_ids[0]) == (None, album_ids[1])
+    rock_ids = populated_repo.get_track_ids_for_genre('Rock')
+    assert populated_repo.get_neighbor_track_ids_by_genre('Rock', rock_ids[4]) == (rock_ids[3], rock_ids[5])
+    assert populated_repo.get_neighbor_track_ids_by_genre('No such genre', rock_ids[4]) == (None, None)
+
+
+def test_listing_membership_follows_each_listing(populated_repo):
+    artist_ids = [track.track_id for track in populated_repo.get_tracks_by_artist('AWOL')]
+    other_id = next(track.track_id for track in populated_repo.get_tracks() if track.track_id not in artist_ids)
+    assert populated_repo.has_track_by_artist('AWOL', artist_ids[0])
+    assert not populated_repo.has_track_by_artist('AWOL', other_id)
+    assert populated_repo.has_track_by_album('AWOL_-_A_Way_Of_Life', artist_ids[0])
+    assert not populated_repo.has_track_by_album('AWOL_-_A_Way_Of_Life', other_id)
+    rock_ids = populated_repo.get_track_ids_for_genre('Rock')
+    assert populated_repo.has_track_by_genre('Rock', rock_ids[0])
+    assert not populated_repo.has_track_by_genre('Rock', 999999)
+    assert not populated_repo.has_track_by_genre('No such genre', rock_ids[0])
+
+
+@pytest.mark.parametrize('storage', ['objects', 'columnar'])
+@pytest.mark.parametrize('concurrency', ['none', 'copy_on_write'])
+def test_a_genre_gained_after_a_track_was_added_is_indexed(storage, concurrency, unmapped_model):
+    repo = MemoryRepository(storage, concurrency)
+    for track_id in (5, 7):
+        repo.add_track(Track(track_id, f'Track {track_id}'))
+    rock = Genre(1, 'Rock')
+
+    repo.add_track_genre(7, rock)
+    repo.add_track_genre(5, rock)
+    repo.add_track_genre(5, rock)
+
+    assert repo.get_track_ids_for_genre('Rock') == [5, 7]
+    assert repo.get_number_of_tracks_by_genre('Rock') == 2
+    assert repo.get_track(5).genres == [rock]
+    assert repo.get_genres() == [rock]
+    with pytest.raises(RepositoryException):
+        repo.add_track_genre(6, rock)
+
+
+def test_copy_on_write_publishes_new_versions_and_leaves_old_ones_alone(unmapped_model):
+    repo = MemoryRepository(concurrency='copy_on_write')
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, repo)
+    tracks = repo.get_tracks()
+    reviews = repo.get_reviews()
+    artist, album = repo.get_artists()[0], repo.get_albums()[0]
+    user = User('dave', '123456789')
+    repo.add_user(user)
+
+    repo.add_track(make_track(1, artist, album))
+    repo.add_review(make_review(repo.get_track(2), user, 4))
+
+    assert len(tracks) == 2000 and len(repo.get_tracks()) == 2001
+    assert reviews == [] and len(repo.get_reviews()) == 1
+    assert 1 in repo.get_track_ids_for_artist_id(artist.artist_id)
+    assert repo.get_neighbor_track_ids(2) == (1, 3)
+
+
+@pytest.mark.parametrize('storage', ['objects', 'columnar'])
+def test_copy_on_write_grows_structures_at_their_end_without_changing_earlier_reads(storage, unmapped_model):
+    repo = MemoryRepository(storage, 'copy_on_write')
+    artist, album, genre = Artist(1, 'Some Artist'), Album(10, 'Some Album'), Genre(1, 'Rock')
+    repo.add_genre(genre)
+    for track_id in (2, 3):
+        track = make_track(track_id, artist, album)
+        track.add_genre(genre)
+        repo.add_track(track)
+    page = repo.get_tracks_page(0, 2)
+    reviews = repo.get_reviews()
+    genre_ids = repo.get_track_ids_for_genre('Rock')
+
+    user = User('dave', '123456789')
+    repo.add_user(user)
+    repo.add_review(make_review(repo.get_track(2), user, 4))
+    track = make_track(5, artist, album)
+    track.add_genre(genre)
+    repo.add_track(track)
+
+    assert [track.track_id for track in page] == [2, 3] and genre_ids == [2, 3]
+    assert reviews == [] and len(repo.get_reviews()) == 1
+    assert repo.get_user('Dave') is user
+    assert repo.get_neighbor_track_ids(3) == (2, 5)
+    assert repo.get_track_ids_for_genre('Rock') == [2, 3, 5]
+    assert repo.get_track_ids_for_artist_id(1) == [2, 3, 5]
+    assert [track.track_id for track in repo.get_tracks_by_album('Some_Album')] == [2, 3, 5]
+
+
+def test_copy_on_write_repository_stays_consistent_under_concurrent_use(unmapped_model):
+    repo = MemoryRepository(concurrency='copy_on_write')
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, repo)
+    tracks = repo.get_tracks_page(0, 20)
+    writers, reviews_per_writer = 4, 150
+    writing = threading.Event()
+    writing.set()
+    errors = []
+
+    def write(writer):
+        for i in range(reviews_per_writer):
+            user = User(f'user{writer}x{i}', 'password123')
+            repo.add_user(user)
+            repo.add_review(make_review(tracks[i % len(tracks)], user, 1 + i % 5))
+
+    def read():
+        try:
+            while writing.is_set():
+                reviews = repo.get_reviews()
+                assert all(review.user is repo.get_user(review.user.user_name) for review in reviews)
+                assert len(repo.get_tracks_page_by_genre('Rock', 0, 50)) == 50
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    writer_threads = [threading.Thread(target=write, args=(writer,)) for writer in range(writers)]
+    for thread in readers + writer_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    writing.clear()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    assert len(repo.get_reviews()) == writers * reviews_per_writer
+    assert sum(track.rating_count for track in tracks) == writers * reviews_per_writer
+    assert sum(track.rating_sum for track in tracks) == sum(review.rating for review in repo.get_reviews())
+
+
+def test_unknown_concurrency_mode_is_rejected():
+    with pytest.raises(ValueError):
+        MemoryRepository(concurrency='optimistic')
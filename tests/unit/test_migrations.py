@@ -0,0 +1,85 @@
+from sqlalchemy import create_engine, inspect
+
+import music.adapters.Repository as repo
+from music import create_app
+from music.adapters.migrations import upgrade_schema
+from tests.conftest import TEST_DATA_PATH_DATABASE_LIMITED
+
+
+def test_upgrade_schema_adds_missing_tables_and_columns():
+    engine = create_engine('sqlite://')
+    engine.execute('CREATE TABLE albums (album_id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(64) NOT NULL)')
+    engine.execute("INSERT INTO albums (album_id, title) VALUES (1, 'AWOL - A Way Of Life')")
+
+    upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    assert {'album_url', 'album_type', 'release_year'} <= set(c['name'] for c in inspector.get_columns('albums'))
+    assert 'tracks' in inspector.get_table_names()
+    assert engine.execute('SELECT title, release_year FROM albums').fetchall() == [('AWOL - A Way Of Life', None)]
+
+
+def test_upgrade_schema_fills_in_the_rating_aggregates_of_existing_tracks():
+    engine = create_engine('sqlite://')
+    engine.execute('CREATE TABLE tracks (track_id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(255) NOT NULL, '
+                   'video_hyperlink VARCHAR(255) NOT NULL, artist_id INTEGER, album_id INTEGER)')
+    engine.execute("INSERT INTO tracks (track_id, title, video_hyperlink) VALUES (2, 'Food', ''), (3, 'Electric', '')")
+    engine.execute('CREATE TABLE reviews (user_name VARCHAR(255), track_id INTEGER, rating INTEGER NOT NULL)')
+    engine.execute("INSERT INTO reviews VALUES ('dave', 2, 4), ('fmercury', 2, 1)")
+
+    upgrade_schema(engine)
+
+    assert engine.execute('SELECT track_id, rating_count, rating_sum FROM tracks ORDER BY track_id').fetchall() == \
+           [(2, 2, 5), (3, 0, 0)]
+
+
+def test_upgrade_schema_adds_missing_indexes_to_existing_tables():
+    engine = create_engine('sqlite://')
+    engine.execute('CREATE TABLE track_genres (id INTEGER NOT NULL PRIMARY KEY, track_id INTEGER, genre_id INTEGER)')
+    engine.execute('INSERT INTO track_genres (track_id, genre_id) VALUES (2, 21), (3, 21)')
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    assert {index['name']: index['column_names'] for index in inspector.get_indexes('track_genres')} == {
+        'ix_track_genres_genre_id_track_id': ['genre_id', 'track_id'],
+        'ix_track_genres_track_id_genre_id': ['track_id', 'genre_id'],
+    }
+    assert 'ix_tracks_artist_id' in set(index['name'] for index in inspector.get_indexes('tracks'))
+
+
+BASELINE_SCHEMA = [
+    'CREATE TABLE users (user_name VARCHAR(255) NOT NULL PRIMARY KEY, password VARCHAR(255) NOT NULL)',
+    'CREATE TABLE artists (artist_id INTEGER NOT NULL PRIMARY KEY, full_name VARCHAR(64) NOT NULL)',
+    'CREATE TABLE albums (album_id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(64) NOT NULL)',
+    'CREATE TABLE genres (genre_id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(64) NOT NULL)',
+    'CREATE TABLE tracks (track_id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(255) NOT NULL, '
+    'video_hyperlink VARCHAR(255) NOT NULL, artist_id INTEGER REFERENCES artists (artist_id), '
+    'album_id INTEGER REFERENCES albums (album_id))',
+    'CREATE TABLE reviews (user_name VARCHAR(255) NOT NULL REFERENCES users (user_name), '
+    'track_id INTEGER NOT NULL REFERENCES tracks (track_id), rating INTEGER NOT NULL, PRIMARY KEY (user_name, track_id))',
+    'CREATE TABLE track_genres (id INTEGER NOT NULL PRIMARY KEY, track_id INTEGER REFERENCES tracks (track_id), '
+    'genre_id INTEGER REFERENCES genres (genre_id))',
+]
+
+
+def test_the_app_repopulates_a_database_file_with_the_first_release_schema(tmp_path):
+    database_uri = f"sqlite:///{tmp_path / 'baseline.db'}"
+    engine = create_engine(database_uri)
+    for statement in BASELINE_SCHEMA:
+        engine.execute(statement)
+    engine.dispose()
+
+    app = create_app({
+        'TESTING': 'True',
+        'REPOSITORY': 'database',
+        'TEST_DATA_PATH': TEST_DATA_PATH_DATABASE_LIMITED,
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+    })
+
+    assert repo.repo_instance.get_number_of_tracks() == 2000
+    assert {'album_url', 'album_type', 'release_year'} <= set(c['name'] for c in inspect(engine).get_columns('albums'))
+    track = repo.repo_instance.get_track(2)
+    assert (track.rating_count, track.rating_sum) == (0, 0)
+    assert app.test_client().get('/all').status_code == 200
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.csv_reader import populate
+from music.adapters.snapshot import SnapshotError, snapshot_is_fresh, save_snapshot
+from tests.conftest import TEST_DATA_PATH_DATABASE_LIMITED, TEST_DATA_PATH_DATABASE_FULL
+
+
+@pytest.fixture
+def populated_repo():
+    repo = MemoryRepository()
+    populate(TEST_DATA_PATH_DATABASE_LIMITED, repo)
+    return repo
+
+
+def catalog(repo):
+    return [
+        (track.track_id, track.title, track.track_url, track.track_duration, track.video_hyperlink,
+         track.artist, track.album, track.genres)
+        for track in repo.get_tracks()
+    ]
+
+
+def test_snapshot_round_trip_restores_the_catalog(populated_repo, tmp_path):
+    snapshot_path = tmp_path / 'catalog.snapshot'
+    populated_repo.save_snapshot(snapshot_path, TEST_DATA_PATH_DATABASE_LIMITED)
+
+    loaded_repo = MemoryRepository.from_snapshot(snapshot_path, TEST_DATA_PATH_DATABASE_LIMITED)
+
+    assert catalog(loaded_repo) == catalog(populated_repo)
+    assert loaded_repo.get_artists() == populated_repo.get_artists()
+    assert loaded_repo.get_genres() == populated_repo.get_genres()
+    assert loaded_repo.get_albums() == populated_repo.get_albums()
+    assert [artist.full_name for artist in loaded_repo.get_artists()] == \
+           [artist.full_name for artist in populated_repo.get_artists()]
+
+
+def test_snapshot_rejects_other_file_formats(tmp_path):
+    snapshot_path = tmp_path / 'catalog.snapshot'
+    snapshot_path.write_bytes(b'track_id,album_id\n')
+
+    with pytest.raises(SnapshotError):
+        MemoryRepository.from_snapshot(snapshot_path)
+
+
+def test_snapshot_rejects_other_versions(populated_repo, tmp_path, monkeypatch):
+    snapshot_path = tmp_path / 'catalog.snapshot'
+    monkeypatch.setattr('music.adapters.snapshot.SNAPSHOT_VERSION', 0)
+    save_snapshot(populated_repo, snapshot_path)
+    monkeypatch.undo()
+
+    with pytest.raises(SnapshotError):
+        MemoryRepository.from_snapshot(snapshot_path)
+
+
+def test_snapshot_rejects_other_sources(populated_repo, tmp_path):
+    snapshot_path = tmp_path / 'catalog.snapshot'
+    populated_repo.save_snapshot(snapshot_path, TEST_DATA_PATH_DATABASE_LIMITED)
+
+    with pytest.raises(SnapshotError):
+        MemoryRepository.from_snapshot(snapshot_path, tmp_path)
+
+
+def test_snapshot_is_fresh_only_when_newer_than_the_csv_files(populated_repo, tmp_path):
+    snapshot_path = tmp_path / 'catalog.snapshot'
+    assert not snapshot_is_fresh(snapshot_path, TEST_DATA_PATH_DATABASE_FULL)
+
+    populated_repo.save_snapshot(snapshot_path)
+    assert snapshot_is_fresh(snapshot_path, TEST_DATA_PATH_DATABASE_FULL)
+
+    os.utime(snapshot_path, (0, 0))
+    assert not snapshot_is_fresh(snapshot_path, TEST_DATA_PATH_DATABASE_FULL)
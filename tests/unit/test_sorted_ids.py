@@ -0,0 +1,27 @@
+from array import array
+
+from music.adapters.sorted_ids import intersect_sorted, neighbor_ids, union_sorted
+
+
+def test_intersect_sorted():
+    assert intersect_sorted([1, 3, 5, 7, 9], array('q', [3, 4, 5, 9, 10]), [0, 5, 9]) == [5, 9]
+    assert intersect_sorted([1, 2], [3, 4]) == []
+    # Lists much longer than the running result are binary-searched.
+    assert intersect_sorted([50, 51, 500], list(range(0, 400, 2))) == [50]
+    assert intersect_sorted([2, 4]) == [2, 4]
+    assert intersect_sorted() == []
+
+
+def test_union_sorted():
+    assert union_sorted([1, 3, 5], array('q', [2, 3, 6]), []) == [1, 2, 3, 5, 6]
+    assert union_sorted() == []
+
+
+def test_neighbor_ids_are_found_around_members_and_gaps():
+    ids = [2, 5, 9]
+
+    assert neighbor_ids(ids, 5) == (2, 9)
+    assert neighbor_ids(ids, 6) == (5, 9)
+    assert neighbor_ids(ids, 2) == (None, 5)
+    assert neighbor_ids(ids, 9) == (5, None)
+    assert neighbor_ids([], 9) == (None, None)
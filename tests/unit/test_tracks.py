@@ -0,0 +1,66 @@
+import re
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from music import create_app
+from tests.conftest import TEST_DATA_PATH_DATABASE_LIMITED
+
+
+@pytest.fixture(scope='module')
+def database_client(tmp_path_factory):
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'database',
+        'TEST_DATA_PATH': TEST_DATA_PATH_DATABASE_LIMITED,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path_factory.mktemp('tracks') / 'music.db'}",
+        'WTF_CSRF_ENABLED': False,
+    })
+    return app.test_client()
+
+
+def count_queries(client, url):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(Engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    return len(statements)
+
+
+# Every listing page runs: the genre, artist and album lists of the navigation (3), the track with its artist and
+# album (1) and its genres (1), the ids of its neighbors (2), and the size of the listing unless the track is picked
+# by id (1). A track picked by id from a filtered listing is first checked to be in it (1).
+@pytest.mark.parametrize('url, queries', [
+    ('/all', 8),
+    ('/all?page_num=1500', 8),
+    ('/all?track_id=2', 7),
+    ('/tracks_by_artist?artist=AWOL&track_id=2', 8),
+    ('/tracks_by_genre?genre=Rock&page_num=20', 8),
+    ('/tracks_by_artist?artist=AWOL&page_num=2', 8),
+    ('/tracks_by_album?album=AWOL_-_A_Way_Of_Life', 8),
+])
+def test_listing_pages_run_a_fixed_number_of_queries(database_client, url, queries):
+    assert count_queries(database_client, url) == queries
+
+
+def shown_track_id(response):
+    # The rating stars of the shown track carry its id.
+    return int(re.search(rb'id="(\d+)_1"', response.data).group(1))
+
+
+def test_a_track_id_from_another_listing_falls_back_to_the_page_number(database_client):
+    by_page = database_client.get('/tracks_by_genre?genre=Rock&page_num=3')
+    # Track 2 is not tagged Rock, so its id is no cursor into the Rock listing.
+    by_foreign_id = database_client.get('/tracks_by_genre?genre=Rock&page_num=3&track_id=2')
+    by_own_id = database_client.get(f'/tracks_by_genre?genre=Rock&track_id={shown_track_id(by_page)}')
+
+    assert by_foreign_id.status_code == 200
+    assert shown_track_id(by_foreign_id) == shown_track_id(by_page) != 2
+    assert shown_track_id(by_own_id) == shown_track_id(by_page)
@@ -0,0 +1,93 @@
+import pytest
+
+import music.adapters.wal as wal
+from music.adapters.MemoryRepository import MemoryRepository
+from music.adapters.wal import WriteAheadLog
+from music.domainmodel.track import Track
+from music.domainmodel.user import User
+from music.utilities.services import make_review
+
+
+def make_repo():
+    repo = MemoryRepository()
+    for track_id in (2, 3, 5):
+        repo.add_track(Track(track_id, f'Track {track_id}'))
+    return repo
+
+
+def restart(log_path, **kwargs):
+    repo = make_repo()
+    write_ahead_log = WriteAheadLog(log_path, **kwargs)
+    applied = write_ahead_log.replay(repo)
+    repo.attach_write_ahead_log(write_ahead_log)
+    return repo, write_ahead_log, applied
+
+
+def add_users_and_reviews(repo, count):
+    for i in range(count):
+        user = User(f'user{i}', 'password123')
+        repo.add_user(user)
+        repo.add_review(make_review(repo.get_track(2), user, 1 + i % 5))
+
+
+def test_users_and_reviews_survive_a_restart(tmp_path):
+    repo, write_ahead_log, applied = restart(tmp_path / 'repo.wal')
+    assert applied == 0
+    add_users_and_reviews(repo, 3)
+    write_ahead_log.close()
+
+    repo, write_ahead_log, applied = restart(tmp_path / 'repo.wal')
+
+    assert applied == 6
+    assert repo.get_user('user1').password == 'password123'
+    assert len(repo.get_reviews()) == 3
+    track = repo.get_track(2)
+    assert (track.rating_count, track.rating_sum) == (3, 6)
+    assert [review.user.user_name for review in track.reviews] == ['user0', 'user1', 'user2']
+    write_ahead_log.close()
+
+
+def test_a_half_written_last_record_is_cut_off(tmp_path):
+    log_path = tmp_path / 'repo.wal'
+    repo, write_ahead_log, _ = restart(log_path)
+    add_users_and_reviews(repo, 1)
+    write_ahead_log.close()
+    with open(log_path, 'a') as log_file:
+        log_file.write('{"type":"user","user_na')
+
+    repo, write_ahead_log, _ = restart(log_path)
+    repo.add_user(User('dave', 'password123'))
+    write_ahead_log.close()
+
+    repo, write_ahead_log, applied = restart(log_path)
+    assert applied == 3
+    assert repo.get_user('dave') is not None
+    write_ahead_log.close()
+
+
+def test_the_log_is_compacted_once_it_holds_enough_records(tmp_path):
+    log_path = tmp_path / 'repo.wal'
+    repo, write_ahead_log, _ = restart(log_path, compact_records=4)
+    add_users_and_reviews(repo, 3)
+    write_ahead_log.close()
+
+    assert write_ahead_log.compact_path.exists()
+    assert len(log_path.read_text().splitlines()) == 2
+    repo, write_ahead_log, applied = restart(log_path)
+    assert applied == 6
+    write_ahead_log.close()
+
+
+@pytest.mark.parametrize('fsync_interval, fsyncs_while_writing, fsyncs_after_close', [(0, 100, 100), (60, 0, 1)])
+def test_group_commit_covers_many_records_with_one_fsync(tmp_path, monkeypatch, fsync_interval,
+                                                         fsyncs_while_writing, fsyncs_after_close):
+    fsyncs = []
+    monkeypatch.setattr(wal.os, 'fsync', lambda fd: fsyncs.append(fd))
+    repo, write_ahead_log, _ = restart(tmp_path / 'repo.wal', fsync_interval=fsync_interval)
+    for i in range(100):
+        repo.add_user(User(f'user{i}', 'password123'))
+
+    assert len(fsyncs) == fsyncs_while_writing
+    # Closing syncs what the interval has not synced yet.
+    write_ahead_log.close()
+    assert len(fsyncs) == fsyncs_after_close